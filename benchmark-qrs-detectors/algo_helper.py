@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""This script provides the list of available qrs detectors and method to use one of them on a given sampled signal."""
+"""This script provides the list of available qrs detectors and method to use one of them on a given sampled signal.
+Each detector is wrapped in an adapter, set up once for each sampling frequency, and new detectors can be added to the
+registry with register_detector. Signals can be given as physical values in float64 or float32, or as digital samples
+with their calibration, and are converted to a dtype taken by the detector."""
 
-from ecgdetectors import Detectors
+from ecgdetectors import Detectors, panPeakDetect
+from scipy import signal as sp_signal
 import biosppy.signals.ecg as bsp_ecg
 import biosppy.signals.tools as bsp_tools
 import mne.preprocessing.ecg as mne_ecg
@@ -10,7 +14,17 @@ import heartpy.peakdetection as hp_pkdetection
 from heartpy.datautils import rolling_mean
 from wfdb import processing
 import numpy
-from typing import List
+from resampling_helper import resample_signals, frames_to_original
+from cache_helper import SignalCalibration, digital_array_to_physical
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+try:
+    from importlib.metadata import version
+except ImportError:  # python < 3.8
+    from pkg_resources import get_distribution
+
+    def version(distribution_name: str) -> str:
+        return get_distribution(distribution_name).version
 
 # list of algorithms
 algorithms_list = ['Pan-Tompkins-ecg-detector', 'Hamilton-ecg-detector', 'Christov-ecg-detector',
@@ -18,10 +32,388 @@ algorithms_list = ['Pan-Tompkins-ecg-detector', 'Hamilton-ecg-detector', 'Christ
                    'Two-average-ecg-detector', 'Hamilton-biosppy', 'Christov-biosppy',
                    'Engelse-Zeelenberg-biosppy', 'Gamboa-biosppy', 'mne-ecg', 'heartpy', 'gqrs-wfdb', 'xqrs-wfdb']
 
+# library providing each algorithm (name of the installed distribution)
+algorithms_libraries = {
+    'Pan-Tompkins-ecg-detector': 'py-ecg-detectors',
+    'Hamilton-ecg-detector': 'py-ecg-detectors',
+    'Christov-ecg-detector': 'py-ecg-detectors',
+    'Engelse-Zeelenberg-ecg-detector': 'py-ecg-detectors',
+    'SWT-ecg-detector': 'py-ecg-detectors',
+    'Matched-filter-ecg-detector': 'py-ecg-detectors',
+    'Two-average-ecg-detector': 'py-ecg-detectors',
+    'Hamilton-biosppy': 'biosppy',
+    'Christov-biosppy': 'biosppy',
+    'Engelse-Zeelenberg-biosppy': 'biosppy',
+    'Gamboa-biosppy': 'biosppy',
+    'mne-ecg': 'mne',
+    'heartpy': 'heartpy',
+    'gqrs-wfdb': 'wfdb',
+    'xqrs-wfdb': 'wfdb'
+}
+
+# parameters given by run_algo to algorithms (durations in seconds, frequencies in Hz), algorithms which are not listed
+# are used with the default parameters of their library
+biosppy_segmenter_params = {
+    'filter_order': 0.3,
+    'filter_band': [3, 45],
+    'correction_tolerance': 0.05,
+    'before': 0.2,
+    'after': 0.4
+}
+algorithms_params = {
+    'Matched-filter-ecg-detector': {'templates': {250: 'templates/template_250hz.csv',
+                                                  360: 'templates/template_360hz.csv'}},
+    'Christov-biosppy': biosppy_segmenter_params,
+    'Engelse-Zeelenberg-biosppy': biosppy_segmenter_params,
+    'Gamboa-biosppy': biosppy_segmenter_params,
+    'heartpy': {'windowsize': 0.75, 'ma_perc': 20}
+}
+
+# sampling frequencies at which algorithms can run, algorithms which are not listed run at any frequency
+algorithms_frequencies = {
+    'Matched-filter-ecg-detector': sorted(algorithms_params['Matched-filter-ecg-detector']['templates'])
+}
+
+# dtypes of physical values which algorithms take as they are, other signals being converted to float64 (digital
+# samples are always converted), algorithms which are not listed only take float64 (mne only filters float64 signals)
+algorithms_dtypes = {algorithm: ['float64', 'float32'] for algorithm in algorithms_list if algorithm != 'mne-ecg'}
+
+
+def get_algo_params(algorithm: str) -> Dict:
+    """
+    get the parameters given by run_algo to an algorithm.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :return: parameters of the algorithm (empty if it is used with its default parameters)
+    :rtype: dict
+    """
+    return algorithms_params.get(algorithm, {})
+
+
+def get_detection_frequency(algorithm: str, freq_sampling: int, target_frequency: Optional[int] = None) -> int:
+    """
+    get the sampling frequency at which an algorithm runs on signals sampled at freq_sampling: target_frequency (or
+    freq_sampling if None) if the algorithm can run at this frequency, otherwise the lowest frequency of the algorithm
+    above it (or its highest frequency).
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param freq_sampling: value of sampling frequency of signals
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency at which signals should be resampled (None to keep
+    freq_sampling when possible)
+    :type target_frequency: int
+    :return: value of sampling frequency of the detection
+    :rtype: int
+    """
+    detection_frequency = freq_sampling if target_frequency is None else target_frequency
+    frequencies = algorithms_frequencies.get(algorithm)
+    if frequencies is None or detection_frequency in frequencies:
+        return detection_frequency
+    higher_frequencies = [frequency for frequency in frequencies if frequency >= detection_frequency]
+    return min(higher_frequencies) if len(higher_frequencies) > 0 else max(frequencies)
+
+
+def get_detection_signals(algorithm: str, sigs: numpy.ndarray,
+                          calibration: Optional[SignalCalibration] = None) -> numpy.ndarray:
+    """
+    get signals in a dtype taken by an algorithm (see algorithms_dtypes): physical values are given as they are if the
+    algorithm takes their dtype and converted to float64 otherwise, digital samples are converted to physical values in
+    float64 with their calibration, so that detections are the same as on signals read in float64.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param sigs: values of the sampled signal (or one column per channel)
+    :type sigs: ndarray
+    :param calibration: calibration of the signal (or of each column), required for digital samples
+    :type calibration: SignalCalibration
+    :return: values of the sampled signal in a dtype taken by the algorithm (or one column per channel)
+    :rtype: ndarray
+    """
+    if numpy.issubdtype(sigs.dtype, numpy.integer):
+        if calibration is None:
+            raise ValueError(f'Sorry... digital samples ({sigs.dtype}) can only be processed with their calibration')
+        return digital_array_to_physical(sigs, calibration)
+    if sigs.dtype.name in algorithms_dtypes.get(algorithm, ['float64']):
+        return sigs
+    return sigs.astype(numpy.float64)
+
+
+def get_algo_version(algorithm: str) -> str:
+    """
+    get the installed version of the library providing an algorithm.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :return: name and version of the library
+    :rtype: str
+    """
+    library = algorithms_libraries[algorithm]
+    return f'{library}=={version(library)}'
+
+
+def moving_window_integration(sigs: numpy.ndarray, window_size: int) -> numpy.ndarray:
+    """
+    compute the moving average of each column of a 2-D array over window_size samples, as MWA_cumulative of
+    py-ecg-detectors does on one signal (the first samples are averaged over the available samples).
+
+    :param sigs: values of sampled signals (one column per channel)
+    :type sigs: ndarray
+    :param window_size: number of samples of the moving window
+    :type window_size: int
+    :return: moving averages of the signals (one column per channel)
+    :rtype: ndarray
+    """
+    mwa = numpy.cumsum(sigs, axis=0, dtype=float)
+    mwa[window_size:] = mwa[window_size:] - mwa[:-window_size]
+    mwa[:window_size - 1] /= numpy.arange(1, window_size)[:, numpy.newaxis]
+    mwa[window_size - 1:] /= window_size
+    return mwa
+
+
+class DetectorAdapter:
+    """
+    adapter of a qrs detector to a uniform interface. The constructor is the setup of the detector for one sampling
+    frequency (filter coefficients, templates...), done once and kept by get_detector, and detect runs the detector on a
+    signal sampled at this frequency.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict):
+        self.freq_sampling = freq_sampling
+        self.params = params
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        """
+        run the qrs detector on a signal.
+
+        :param sig: values of the sampled signal to study
+        :type sig: ndarray
+        :return: localisations of qrs detections
+        :rtype: iterable(int)
+        """
+        raise NotImplementedError
+
+    def detect_multichannel(self, sigs: numpy.ndarray) -> List[List[int]]:
+        """
+        run the qrs detector on every channel of a record, one channel after the other.
+
+        :param sigs: values of sampled signals to study (one column per channel)
+        :type sigs: ndarray
+        :return: localisations of qrs detections for each channel, in the order of the columns
+        :rtype: list(list(int))
+        """
+        return [[int(element) for element in self.detect(sigs[:, id_sig])] for id_sig in range(sigs.shape[1])]
+
+
+class EcgDetectorsAdapter(DetectorAdapter):
+    """
+    adapter of a detector of py-ecg-detectors given by the name of its method in Detectors.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict, method: str):
+        super().__init__(freq_sampling, params)
+        self.method = getattr(Detectors(freq_sampling), method)
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return self.method(sig)
+
+
+class PanTompkinsAdapter(DetectorAdapter):
+    """
+    adapter of the Pan-Tompkins detector of py-ecg-detectors, whose bandpass filter is computed once. The filtering
+    stages (bandpass, derivative, squaring, moving window integration) are computed on every channel in one pass along
+    the samples axis, and only the adaptive thresholding of peaks is done channel by channel.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict):
+        super().__init__(freq_sampling, params)
+        self.b, self.a = sp_signal.butter(1, [5 / freq_sampling * 2, 15 / freq_sampling * 2], btype='bandpass')
+        self.window_size = int(0.150 * freq_sampling)
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return self.detect_multichannel(sig[:, numpy.newaxis])[0]
+
+    def detect_multichannel(self, sigs: numpy.ndarray) -> List[List[int]]:
+        filtered = sp_signal.lfilter(self.b, self.a, sigs, axis=0)
+        diff = numpy.diff(filtered, axis=0)
+        squared = diff * diff
+        detection = moving_window_integration(squared, self.window_size)
+        detection[:int(0.150 * self.freq_sampling * 2)] = 0
+        return [[int(element) for element in panPeakDetect(detection[:, id_sig], self.freq_sampling)]
+                for id_sig in range(sigs.shape[1])]
+
+
+class MatchedFilterAdapter(DetectorAdapter):
+    """
+    adapter of the matched filter detector of py-ecg-detectors, whose template (read from the file given in
+    algorithms_params for the sampling frequency) and prefilter are loaded once. The filtering stages are computed on
+    every channel in one pass along the samples axis, as for PanTompkinsAdapter.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict):
+        super().__init__(freq_sampling, params)
+        if freq_sampling not in params['templates']:
+            raise ValueError(f'Sorry... no template for Matched-filter-ecg-detector at {freq_sampling} Hz. Please '
+                             f'choose a frequency among {list(params["templates"])}')
+        self.template = numpy.loadtxt(params['templates'][freq_sampling])
+        self.b, self.a = sp_signal.butter(4, [0.1 / freq_sampling * 2, 48 / freq_sampling * 2], btype='bandpass')
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return self.detect_multichannel(sig[:, numpy.newaxis])[0]
+
+    def detect_multichannel(self, sigs: numpy.ndarray) -> List[List[int]]:
+        prefiltered = sp_signal.lfilter(self.b, self.a, sigs, axis=0)
+        matched = sp_signal.lfilter(self.template[::-1], 1, prefiltered, axis=0)
+        detection = matched * matched
+        detection[:len(self.template)] = 0
+        return [[int(element) for element in panPeakDetect(detection[:, id_sig], self.freq_sampling)]
+                for id_sig in range(sigs.shape[1])]
+
+
+class BiosppyAdapter(DetectorAdapter):
+    """
+    adapter of the whole ecg pipeline of biosppy (filtering, Hamilton segmenter and correction of rpeaks).
+    """
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return bsp_ecg.ecg(signal=sig, sampling_rate=self.freq_sampling, show=False)[2]
+
 
-def run_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int) -> List[int]:
+class BiosppySegmenterAdapter(DetectorAdapter):
     """
-    run a qrs detector on a signal
+    adapter of a segmenter of biosppy applied on the signal filtered by a FIR bandpass filter, whose coefficients are
+    computed once. Rpeaks are then corrected and kept if a whole heartbeat can be extracted around them.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict, segmenter: Callable):
+        super().__init__(freq_sampling, params)
+        self.segmenter = segmenter
+        order = int(params['filter_order'] * freq_sampling)
+        self.b, self.a = bsp_tools.get_filter(ftype='FIR', band='bandpass', order=order,
+                                              frequency=params['filter_band'], sampling_rate=freq_sampling)
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        filtered = sp_signal.filtfilt(self.b, self.a, sig)
+        rpeaks, = self.segmenter(signal=filtered, sampling_rate=self.freq_sampling)
+        rpeaks, = bsp_ecg.correct_rpeaks(signal=filtered, rpeaks=rpeaks, sampling_rate=self.freq_sampling,
+                                         tol=self.params['correction_tolerance'])
+        _, qrs_detections = bsp_ecg.extract_heartbeats(signal=filtered, rpeaks=rpeaks,
+                                                       sampling_rate=self.freq_sampling, before=self.params['before'],
+                                                       after=self.params['after'])
+        return qrs_detections
+
+
+class MneAdapter(DetectorAdapter):
+    """
+    adapter of the qrs detector of mne.
+    """
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return mne_ecg.qrs_detector(self.freq_sampling, sig)
+
+
+class HeartpyAdapter(DetectorAdapter):
+    """
+    adapter of the peak detection of heartpy on the rolling mean of the signal.
+    """
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        rol_mean = rolling_mean(sig, windowsize=self.params['windowsize'], sample_rate=self.freq_sampling)
+        return hp_pkdetection.detect_peaks(sig, rol_mean, ma_perc=self.params['ma_perc'],
+                                           sample_rate=self.freq_sampling)['peaklist']
+
+
+class WfdbAdapter(DetectorAdapter):
+    """
+    adapter of a qrs detector of wfdb given by its function.
+    """
+
+    def __init__(self, freq_sampling: int, params: Dict, detector: Callable):
+        super().__init__(freq_sampling, params)
+        self.detector = detector
+
+    def detect(self, sig: numpy.ndarray) -> Iterable[int]:
+        return self.detector(sig=sig, fs=self.freq_sampling)
+
+
+# registry of algorithms: function building the adapter of each algorithm from a sampling frequency and parameters
+detector_adapters = {
+    'Pan-Tompkins-ecg-detector': PanTompkinsAdapter,
+    'Hamilton-ecg-detector': partial(EcgDetectorsAdapter, method='hamilton_detector'),
+    'Christov-ecg-detector': partial(EcgDetectorsAdapter, method='christov_detector'),
+    'Engelse-Zeelenberg-ecg-detector': partial(EcgDetectorsAdapter, method='engzee_detector'),
+    'SWT-ecg-detector': partial(EcgDetectorsAdapter, method='swt_detector'),
+    'Matched-filter-ecg-detector': MatchedFilterAdapter,
+    'Two-average-ecg-detector': partial(EcgDetectorsAdapter, method='two_average_detector'),
+    'Hamilton-biosppy': BiosppyAdapter,
+    'Christov-biosppy': partial(BiosppySegmenterAdapter, segmenter=bsp_ecg.christov_segmenter),
+    'Engelse-Zeelenberg-biosppy': partial(BiosppySegmenterAdapter, segmenter=bsp_ecg.engzee_segmenter),
+    'Gamboa-biosppy': partial(BiosppySegmenterAdapter, segmenter=bsp_ecg.gamboa_segmenter),
+    'mne-ecg': MneAdapter,
+    'heartpy': HeartpyAdapter,
+    'gqrs-wfdb': partial(WfdbAdapter, detector=processing.qrs.gqrs_detect),
+    'xqrs-wfdb': partial(WfdbAdapter, detector=processing.xqrs_detect)
+}
+
+
+def register_detector(algorithm: str, adapter: Callable[..., DetectorAdapter], library: str,
+                      params: Optional[Dict] = None, frequencies: Optional[List[int]] = None,
+                      dtypes: Optional[List[str]] = None) -> None:
+    """
+    add a qrs detector to the list of available algorithms, so that it can be used by run_algo and every script.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param adapter: function building the adapter of the detector from a sampling frequency and parameters, such as a
+    subclass of DetectorAdapter
+    :type adapter: callable
+    :param library: name of the installed distribution providing the detector (to get its version)
+    :type library: str
+    :param params: parameters given to the detector (default parameters of its library if None)
+    :type params: dict
+    :param frequencies: sampling frequencies at which the detector can run (any frequency if None)
+    :type frequencies: list(int)
+    :param dtypes: dtypes of physical values which the detector takes as they are (only float64 if None)
+    :type dtypes: list(str)
+    """
+    if algorithm not in algorithms_list:
+        algorithms_list.append(algorithm)
+    algorithms_libraries[algorithm] = library
+    if params is not None:
+        algorithms_params[algorithm] = params
+    if frequencies is not None:
+        algorithms_frequencies[algorithm] = sorted(frequencies)
+    if dtypes is not None:
+        algorithms_dtypes[algorithm] = list(dtypes)
+    detector_adapters[algorithm] = adapter
+    get_detector.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_detector(algorithm: str, freq_sampling: int) -> DetectorAdapter:
+    """
+    get the adapter of a qrs detector set up for a sampling frequency. The setup is done at the first call for each
+    algorithm and frequency, and the adapter is then kept for the next calls.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param freq_sampling: value of sampling frequency of signals
+    :type freq_sampling: int
+    :return: adapter of the qrs detector
+    :rtype: DetectorAdapter
+    """
+    if algorithm not in detector_adapters:
+        raise ValueError(f'Sorry... unknown algorithm. Please check the list {algorithms_list}')
+    return detector_adapters[algorithm](freq_sampling, get_algo_params(algorithm))
+
+
+def run_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int, target_frequency: Optional[int] = None,
+             calibration: Optional[SignalCalibration] = None) -> List[int]:
+    """
+    run a qrs detector on a signal, converted to a dtype taken by the detector (see get_detection_signals). If the
+    detector runs at another sampling frequency (see get_detection_frequency), the signal is resampled and detections
+    are mapped back to samples of the original signal.
 
     :param algorithm: name of the qrs detector to use
     :type algorithm: str
@@ -29,74 +421,128 @@ def run_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int) -> List[int
     :type sig: ndarray
     :param freq_sampling: value of sampling frequency of the signal
     :type freq_sampling: int
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (None
+    to keep freq_sampling when the detector can run at this frequency)
+    :type target_frequency: int
+    :param calibration: calibration of the signal (of one channel), required if sig holds digital samples
+    :type calibration: SignalCalibration
     :return: localisations of qrs detections
     :rtype: list(int)
     """
-    detectors = Detectors(freq_sampling)
-    if algorithm == 'Pan-Tompkins-ecg-detector':
-        qrs_detections = detectors.pan_tompkins_detector(sig)
-    elif algorithm == 'Hamilton-ecg-detector':
-        qrs_detections = detectors.hamilton_detector(sig)
-    elif algorithm == 'Christov-ecg-detector':
-        qrs_detections = detectors.christov_detector(sig)
-    elif algorithm == 'Engelse-Zeelenberg-ecg-detector':
-        qrs_detections = detectors.engzee_detector(sig)
-    elif algorithm == 'SWT-ecg-detector':
-        qrs_detections = detectors.swt_detector(sig)
-    elif algorithm == 'Matched-filter-ecg-detector' and freq_sampling == 360:
-        qrs_detections = detectors.matched_filter_detector(sig, 'templates/template_360hz.csv')
-    elif algorithm == 'Matched-filter-ecg-detector' and freq_sampling == 250:
-        qrs_detections = detectors.matched_filter_detector(sig, 'templates/template_250hz.csv')
-    elif algorithm == 'Two-average-ecg-detector':
-        qrs_detections = detectors.two_average_detector(sig)
-    elif algorithm == 'Hamilton-biosppy':
-        qrs_detections = bsp_ecg.ecg(signal=sig, sampling_rate=freq_sampling, show=False)[2]
-    elif algorithm == 'Christov-biosppy':
-        order = int(0.3 * freq_sampling)
-        filtered, _, _ = bsp_tools.filter_signal(signal=sig,
-                                                 ftype='FIR',
-                                                 band='bandpass',
-                                                 order=order,
-                                                 frequency=[3, 45],
-                                                 sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.christov_segmenter(signal=filtered, sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.correct_rpeaks(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling, tol=0.05)
-        _, qrs_detections = bsp_ecg.extract_heartbeats(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling,
-                                                       before=0.2, after=0.4)
-    elif algorithm == 'Engelse-Zeelenberg-biosppy':
-        order = int(0.3 * freq_sampling)
-        filtered, _, _ = bsp_tools.filter_signal(signal=sig,
-                                                 ftype='FIR',
-                                                 band='bandpass',
-                                                 order=order,
-                                                 frequency=[3, 45],
-                                                 sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.engzee_segmenter(signal=filtered, sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.correct_rpeaks(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling, tol=0.05)
-        _, qrs_detections = bsp_ecg.extract_heartbeats(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling,
-                                                       before=0.2, after=0.4)
-    elif algorithm == 'Gamboa-biosppy':
-        order = int(0.3 * freq_sampling)
-        filtered, _, _ = bsp_tools.filter_signal(signal=sig,
-                                                 ftype='FIR',
-                                                 band='bandpass',
-                                                 order=order,
-                                                 frequency=[3, 45],
-                                                 sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.gamboa_segmenter(signal=filtered, sampling_rate=freq_sampling)
-        rpeaks, = bsp_ecg.correct_rpeaks(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling, tol=0.05)
-        _, qrs_detections = bsp_ecg.extract_heartbeats(signal=filtered, rpeaks=rpeaks, sampling_rate=freq_sampling,
-                                                       before=0.2, after=0.4)
-    elif algorithm == 'mne-ecg':
-        qrs_detections = mne_ecg.qrs_detector(freq_sampling, sig)
-    elif algorithm == 'heartpy':
-        rol_mean = rolling_mean(sig, windowsize=0.75, sample_rate=100.0)
-        qrs_detections = hp_pkdetection.detect_peaks(sig, rol_mean, ma_perc=20, sample_rate=100.0)['peaklist']
-    elif algorithm == 'gqrs-wfdb':
-        qrs_detections = processing.qrs.gqrs_detect(sig=sig, fs=freq_sampling)
-    elif algorithm == 'xqrs-wfdb':
-        qrs_detections = processing.xqrs_detect(sig=sig, fs=freq_sampling)
-    else:
-        raise ValueError(f'Sorry... unknown algorithm. Please check the list {algorithms_list}')
+    sig = get_detection_signals(algorithm, sig, calibration)
+    detection_frequency = get_detection_frequency(algorithm, freq_sampling, target_frequency)
+    if detection_frequency != freq_sampling:
+        qrs_detections = run_algo(algorithm, resample_signals(sig, freq_sampling, detection_frequency),
+                                  detection_frequency)
+        return frames_to_original(qrs_detections, detection_frequency, freq_sampling, len(sig))
+    qrs_detections = get_detector(algorithm, freq_sampling).detect(sig)
     cast_qrs_detections = [int(element) for element in qrs_detections]
     return cast_qrs_detections
+
+
+def run_algo_multichannel(algorithm: str, sigs: numpy.ndarray, freq_sampling: int,
+                          target_frequency: Optional[int] = None,
+                          calibration: Optional[SignalCalibration] = None) -> List[List[int]]:
+    """
+    run a qrs detector on every channel of a record at once. For Pan-Tompkins and matched filter detectors, the
+    filtering stages are computed on every channel in one pass (see PanTompkinsAdapter), the other detectors are run on
+    each channel one after the other. Signals are resampled all together if the detector runs at another sampling
+    frequency, and converted to a dtype taken by the detector, as with run_algo.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sigs: values of sampled signals to study, such as the p_signal of wfdb (one column per channel)
+    :type sigs: ndarray
+    :param freq_sampling: value of sampling frequency of the signals
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency at which signals are resampled before the detection (None
+    to keep freq_sampling when the detector can run at this frequency)
+    :type target_frequency: int
+    :param calibration: calibration of each column, required if sigs holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections for each channel, in the order of the columns
+    :rtype: list(list(int))
+    """
+    sigs = get_detection_signals(algorithm, sigs, calibration)
+    detection_frequency = get_detection_frequency(algorithm, freq_sampling, target_frequency)
+    if detection_frequency != freq_sampling:
+        detections = run_algo_multichannel(algorithm, resample_signals(sigs, freq_sampling, detection_frequency),
+                                           detection_frequency)
+        return [frames_to_original(qrs_detections, detection_frequency, freq_sampling, sigs.shape[0])
+                for qrs_detections in detections]
+    return get_detector(algorithm, freq_sampling).detect_multichannel(sigs)
+
+
+def run_algo_windows(algorithm: str, windows: Iterable[Tuple[int, numpy.ndarray]], freq_sampling: int, overlap: int,
+                     merge_tolerance: int, calibration: Optional[SignalCalibration] = None) -> List[int]:
+    """
+    run a qrs detector on a signal given by successive overlapping windows (for example read in streaming). Each
+    window is processed alone. The seam between two windows is placed in the middle of their overlap: the previous
+    window keeps its detections before the seam and the next one its detections from the seam, so that both have
+    overlap / 2 samples of warm-up around it. A detection of the next window closer than merge_tolerance to the last
+    kept detection of the previous one is a duplicate of the same beat and is removed. A window contained in the
+    previous one (such as a last window shorter than the overlap) is skipped, since the previous window already covers
+    it with more context.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param windows: index of the first sample and values of each window, in the order of the signal
+    :type windows: iterable(tuple(int, ndarray))
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param overlap: number of samples shared by two consecutive windows
+    :type overlap: int
+    :param merge_tolerance: minimal number of frames between two detections on both sides of a seam
+    :type merge_tolerance: int
+    :param calibration: calibration of the signal, required if windows hold digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections in the whole signal
+    :rtype: list(int)
+    """
+    qrs_detections = []
+    previous_detections = None
+    previous_end = None
+    for start, window in windows:
+        if previous_end is not None and start + len(window) <= previous_end:
+            continue
+        window_detections = [start + frame for frame in run_algo(algorithm, window, freq_sampling,
+                                                                       calibration=calibration)]
+        if previous_detections is not None:
+            seam = start + overlap // 2
+            qrs_detections.extend(frame for frame in previous_detections if frame < seam)
+            window_detections = [frame for frame in window_detections if frame >= seam and
+                                 (len(qrs_detections) == 0 or frame - qrs_detections[-1] > merge_tolerance)]
+        previous_detections = window_detections
+        previous_end = start + len(window)
+    if previous_detections is not None:
+        qrs_detections.extend(previous_detections)
+    return qrs_detections
+
+
+def run_algo_windowed(algorithm: str, sig: numpy.ndarray, freq_sampling: int, window_size: int, overlap: int,
+                      merge_tolerance: int, calibration: Optional[SignalCalibration] = None) -> List[int]:
+    """
+    run a qrs detector on a signal split in overlapping windows of fixed size (see run_algo_windows).
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sig: values of the sampled signal to study
+    :type sig: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param window_size: number of samples of each window
+    :type window_size: int
+    :param overlap: number of samples shared by two consecutive windows (lower than window_size)
+    :type overlap: int
+    :param merge_tolerance: minimal number of frames between two detections on both sides of a seam
+    :type merge_tolerance: int
+    :param calibration: calibration of the signal, required if sig holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections in the whole signal
+    :rtype: list(int)
+    """
+    if not 0 <= overlap < window_size:
+        raise ValueError(f'overlap ({overlap}) must be positive and lower than window_size ({window_size})')
+    windows = ((start, sig[start:start + window_size])
+               for start in range(0, max(len(sig) - overlap, 1), window_size - overlap))
+    return run_algo_windows(algorithm, windows, freq_sampling, overlap, merge_tolerance, calibration)
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script measures the raw speed of QRS detectors, independently of reading datasets. Each algorithm is run on
+synthetic ECG and on segments of real records of increasing durations (10 s to 24 h) at several sampling frequencies.
+Signals are built before timings, a warm-up run is performed first and each timing is repeated. Sampling frequencies
+at which an algorithm cannot run (see get_detection_frequency) are skipped, so that no timing includes a resampling.
+For each algorithm, the slope of the time in function of the number of samples on a log-log scale is fitted, and
+algorithms whose time grows faster than linearly are flagged. Timings can be saved as a baseline (json) with versions of
+libraries, so that later runs report regressions, for example after an update of a library."""
+
+import os
+import json
+import time
+import click
+import numpy
+from scipy import signal as sp_signal
+from dataset_helper import *
+from algo_helper import *
+from run_benchmark import expand_patterns
+
+speed_path = 'output/speed'
+baseline_file = f'{speed_path}/baseline.json'
+
+# datasets whose records are used as real segments for each sampling frequency
+real_datasets = {
+    128: 'mit-bih-long-term-ecg',
+    250: 'european-stt',
+    360: 'mit-bih-arrhythmia'
+}
+
+# durations of segments by default (in s): 10 s, 1 min, 10 min, 1 h, 6 h and 24 h
+default_durations = [10, 60, 600, 3600, 6 * 3600, 24 * 3600]
+
+
+def generate_synthetic_ecg(duration: float, freq_sampling: int, seed: int = 0) -> numpy.ndarray:
+    """
+    generate a synthetic ECG (in mV) as a sum of gaussian waves P, QRS and T for each beat, with a heart rate around
+    70 bpm varying from beat to beat, baseline wander and white noise. The same seed always gives the same signal.
+
+    :param duration: duration of the signal in seconds
+    :type duration: float
+    :param freq_sampling: sampling frequency of the signal
+    :type freq_sampling: int
+    :param seed: seed of the random generator
+    :type seed: int
+    :return: values of the sampled signal
+    :rtype: ndarray
+    """
+    generator = numpy.random.default_rng(seed)
+    nb_samples = int(duration * freq_sampling)
+    rr_intervals = generator.normal(60 / 70, 0.05, size=int(duration * 2) + 2).clip(0.4, 1.5)
+    beats = numpy.cumsum(rr_intervals)
+    beats = beats[beats < duration]
+    impulses = numpy.zeros(nb_samples)
+    impulses[(beats * freq_sampling).astype(int)] = 1
+    # offset (s), width (s) and amplitude (mV) of P, Q, R, S and T waves relatively to the R peak
+    waves = [(-0.2, 0.025, 0.15), (-0.03, 0.01, -0.1), (0, 0.01, 1.2), (0.03, 0.01, -0.25), (0.3, 0.06, 0.3)]
+    half_width = int(0.5 * freq_sampling)
+    kernel_time = numpy.arange(-half_width, half_width + 1) / freq_sampling
+    kernel = sum(amplitude * numpy.exp(-(kernel_time - offset) ** 2 / (2 * width ** 2))
+                 for offset, width, amplitude in waves)
+    sig = sp_signal.oaconvolve(impulses, kernel, mode='same')
+    sig += 0.1 * numpy.sin(2 * numpy.pi * 0.3 * numpy.arange(nb_samples) / freq_sampling)
+    sig += generator.normal(0, 0.02, size=nb_samples)
+    return sig
+
+
+def get_real_segment(duration: float, freq_sampling: int) -> Optional[numpy.ndarray]:
+    """
+    get a segment of a real record at a sampling frequency: the first channel of the first record of the dataset
+    chosen in real_datasets, repeated if the record is shorter than the segment.
+
+    :param duration: duration of the segment in seconds
+    :type duration: float
+    :param freq_sampling: sampling frequency of the segment
+    :type freq_sampling: int
+    :return: values of the sampled signal (None if no dataset is available at this frequency)
+    :rtype: ndarray
+    """
+    dataset = real_datasets.get(freq_sampling)
+    if dataset is None or not os.path.exists(f'{data_path}/{database_folders[dataset]}/RECORDS'):
+        return None
+    record_id = get_record_ids(dataset)[0]
+    sig = read_record_channel(dataset, record_id, records[dataset][record_id][0])
+    return numpy.resize(numpy.nan_to_num(sig), int(duration * freq_sampling))
+
+
+def get_segments(source: str, freq_sampling: int, durations: List[int]) -> Optional[Dict[int, numpy.ndarray]]:
+    """
+    get segments of several durations from a source. Only the longest segment is built, shorter ones are its first
+    samples (views without copy), so that memory is bounded by the longest one.
+
+    :param source: 'synthetic' for synthetic ECG or 'real' for real records
+    :type source: str
+    :param freq_sampling: sampling frequency of the segments
+    :type freq_sampling: int
+    :param durations: durations of the segments in seconds
+    :type durations: list(int)
+    :return: values of the sampled signal for each duration (None if no real record is available at this frequency)
+    :rtype: dict(int, ndarray)
+    """
+    longest = generate_synthetic_ecg(max(durations), freq_sampling) if source == 'synthetic' \
+        else get_real_segment(max(durations), freq_sampling)
+    if longest is None:
+        return None
+    return {duration: longest[:int(duration * freq_sampling)] for duration in sorted(durations)}
+
+
+def time_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int, repeats: int) -> List[float]:
+    """
+    measure the wall time of the detection of an algorithm on a signal several times.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param sig: values of the sampled signal
+    :type sig: ndarray
+    :param freq_sampling: sampling frequency of the signal
+    :type freq_sampling: int
+    :param repeats: number of timings
+    :type repeats: int
+    :return: wall time of each run in seconds
+    :rtype: list(float)
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run_algo(algorithm, sig, freq_sampling)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def get_scaling_slope(samples: List[int], timings: List[float]) -> Optional[float]:
+    """
+    fit the exponent of the time in function of the number of samples (time ~ samples ** slope), by a linear regression
+    on a log-log scale. The slope is 1 for a linear algorithm. Timings of segments shorter than one minute are dominated
+    by fixed costs and should not be given.
+
+    :param samples: numbers of samples of the segments
+    :type samples: list(int)
+    :param timings: times of the detection on each segment in seconds
+    :type timings: list(float)
+    :return: slope of the log-log curve (None with less than two segments)
+    :rtype: float
+    """
+    if len(samples) < 2:
+        return None
+    slope, _ = numpy.polyfit(numpy.log(samples), numpy.log(timings), 1)
+    return float(slope)
+
+
+def benchmark_algo(algorithm: str, source: str, freq_sampling: int, segments: Dict[int, numpy.ndarray], repeats: int,
+                   max_time: float) -> List[Dict]:
+    """
+    time an algorithm on segments of a source from the shortest to the longest, after a warm-up run on the shortest.
+    When the time expected for the next duration (last time scaled linearly by the number of samples) exceeds
+    max_time, longer segments are skipped.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param source: 'synthetic' for synthetic ECG or 'real' for real records
+    :type source: str
+    :param freq_sampling: sampling frequency of the segments
+    :type freq_sampling: int
+    :param segments: values of the sampled signal for each duration in seconds, given by get_segments
+    :type segments: dict(int, ndarray)
+    :param repeats: number of timings of each segment
+    :type repeats: int
+    :param max_time: maximal expected time of one run in seconds
+    :type max_time: float
+    :return: timings of each segment (algorithm, source, fs, duration, samples, min, median and samples/s)
+    :rtype: list(dict)
+    """
+    results = []
+    durations = sorted(segments)
+    # warm-up, to load libraries and fill their caches before timings
+    run_algo(algorithm, segments[durations[0]], freq_sampling)
+    for id_duration, duration in enumerate(durations):
+        timings = time_algo(algorithm, segments[duration], freq_sampling, repeats)
+        median_time = float(numpy.median(timings))
+        results.append({'algorithm': algorithm, 'source': source, 'fs': freq_sampling, 'duration': duration,
+                        'samples': len(segments[duration]), 'min': min(timings), 'median': median_time,
+                        'samples/s': len(segments[duration]) / median_time})
+        print(f'{algorithm} {source} {freq_sampling}Hz {duration}s: {median_time:.3f}s')
+        if id_duration + 1 < len(durations):
+            expected_time = median_time * durations[id_duration + 1] / duration
+            if expected_time > max_time:
+                print(f'{algorithm} {source} {freq_sampling}Hz: segments from {durations[id_duration + 1]}s are '
+                      f'skipped (expected {expected_time:.0f}s)')
+                break
+    return results
+
+
+def get_scaling(speed_df: pd.DataFrame, min_duration: int, superlinear_slope: float) -> pd.DataFrame:
+    """
+    compute the scaling slope of each algorithm for each source and sampling frequency, and flag super-linear ones.
+
+    :param speed_df: timings of each segment, given by benchmark_algo
+    :type speed_df: DataFrame
+    :param min_duration: minimal duration of segments used to fit slopes (in s)
+    :type min_duration: int
+    :param superlinear_slope: slope above which an algorithm is flagged as super-linear
+    :type superlinear_slope: float
+    :return: slope and flag for each algorithm, source and sampling frequency
+    :rtype: DataFrame
+    """
+    scaling = []
+    for (algorithm, source, freq_sampling), timings_df in speed_df.groupby(['algorithm', 'source', 'fs'], sort=False):
+        fitted_df = timings_df[timings_df['duration'] >= min_duration]
+        slope = get_scaling_slope(fitted_df['samples'].tolist(), fitted_df['median'].tolist())
+        scaling.append({'algorithm': algorithm, 'source': source, 'fs': freq_sampling, 'slope': slope,
+                        'superlinear': slope is not None and slope > superlinear_slope})
+    return pd.DataFrame(scaling, columns=['algorithm', 'source', 'fs', 'slope', 'superlinear'])
+
+
+def write_baseline(speed_df: pd.DataFrame) -> None:
+    """
+    save median timings of each algorithm as the baseline of next runs, with the versions and parameters of the
+    algorithms. Algorithms which were not benchmarked keep their previous baseline, and timings of segments which were
+    not benchmarked (other sources, sampling frequencies or durations) are kept as long as the version and the
+    parameters of the algorithm are unchanged.
+
+    :param speed_df: timings of each segment, given by benchmark_algo
+    :type speed_df: DataFrame
+    """
+    baseline = read_baseline()
+    for algorithm, timings_df in speed_df.groupby('algorithm', sort=False):
+        version = get_algo_version(algorithm)
+        # parameters as read back from json (tuples become lists)
+        params = json.loads(json.dumps(get_algo_params(algorithm)))
+        previous = baseline.get(algorithm, {})
+        timings = previous.get('timings', {}) \
+            if previous.get('version') == version and previous.get('params') == params else {}
+        timings.update({f'{source}_{freq_sampling}_{duration}': median_time for source, freq_sampling, duration,
+                        median_time in timings_df[['source', 'fs', 'duration', 'median']].itertuples(index=False)})
+        baseline[algorithm] = {'version': version, 'params': params, 'timings': timings}
+    os.makedirs(speed_path, exist_ok=True)
+    with open(baseline_file, 'w') as outfile:
+        json.dump(baseline, outfile, indent=2)
+
+
+def read_baseline() -> Dict:
+    """
+    read the baseline of timings saved by write_baseline.
+
+    :return: versions, parameters and median timings for each algorithm (empty without baseline)
+    :rtype: dict
+    """
+    if not os.path.exists(baseline_file):
+        return {}
+    with open(baseline_file) as baseline_json:
+        return json.load(baseline_json)
+
+
+def compare_to_baseline(speed_df: pd.DataFrame, baseline: Dict, regression_ratio: float) -> pd.DataFrame:
+    """
+    compare median timings with those of the baseline. A segment is a regression when its time is more than
+    regression_ratio times its time in the baseline.
+
+    :param speed_df: timings of each segment, given by benchmark_algo
+    :type speed_df: DataFrame
+    :param baseline: baseline given by read_baseline
+    :type baseline: dict
+    :param regression_ratio: ratio of times above which a segment is a regression
+    :type regression_ratio: float
+    :return: timings with the ratio to the baseline, the regression flag and the versions of libraries (current and
+    baseline)
+    :rtype: DataFrame
+    """
+    comparison_df = speed_df.copy()
+    baseline_times = [baseline.get(algorithm, {}).get('timings', {}).get(f'{source}_{freq_sampling}_{duration}')
+                      for algorithm, source, freq_sampling, duration
+                      in speed_df[['algorithm', 'source', 'fs', 'duration']].itertuples(index=False)]
+    comparison_df['baseline'] = pd.to_numeric(pd.Series(baseline_times, index=speed_df.index, dtype=object))
+    comparison_df['ratio'] = comparison_df['median'] / comparison_df['baseline']
+    comparison_df['regression'] = comparison_df['ratio'] > regression_ratio
+    comparison_df['version'] = [get_algo_version(algorithm) for algorithm in speed_df['algorithm']]
+    comparison_df['baseline version'] = [baseline.get(algorithm, {}).get('version')
+                                         for algorithm in speed_df['algorithm']]
+    return comparison_df
+
+
+# parse arguments
+@click.command()
+@click.option('--algo', multiple=True, default=['*'],
+              help=f'algorithm(s) or glob pattern(s) among {algorithms_list} (every algorithm if omitted), option '
+                   f'can be repeated')
+@click.option('--fs', 'frequencies', multiple=True, default=[128, 250, 360], type=click.IntRange(1, None),
+              help='sampling frequencies of segments (in Hz), option can be repeated, type=int')
+@click.option('--duration', 'durations', multiple=True, default=default_durations, type=click.IntRange(1, None),
+              help='durations of segments (in s), option can be repeated, type=int')
+@click.option('--source', 'sources', multiple=True, default=['synthetic', 'real'],
+              type=click.Choice(['synthetic', 'real']),
+              help='synthetic ECG or segments of real records (skipped if the dataset is not downloaded), option can '
+                   'be repeated')
+@click.option('--repeats', default=3, type=click.IntRange(1, None), help='number of timings of each segment, type=int')
+@click.option('--max-time', default=600, type=click.FloatRange(0, None),
+              help='longer segments are skipped once one run is expected to exceed this time (in s), type=float')
+@click.option('--min-duration', default=60, type=click.IntRange(1, None),
+              help='minimal duration of segments used to fit scaling slopes (in s), type=int')
+@click.option('--superlinear-slope', default=1.15, type=click.FloatRange(0, None),
+              help='log-log slope above which an algorithm is flagged as super-linear, type=float')
+@click.option('--regression-ratio', default=1.25, type=click.FloatRange(1, None),
+              help='ratio of time to the baseline above which a segment is a regression, type=float')
+@click.option('--save-baseline', is_flag=True, help='save timings of this run as the baseline')
+def main(algo: Tuple[str], frequencies: Tuple[int], durations: Tuple[int], sources: Tuple[str], repeats: int,
+         max_time: float, min_duration: int, superlinear_slope: float, regression_ratio: float,
+         save_baseline: bool) -> None:
+    algorithms = expand_patterns(list(algo), algorithms_list)
+    print(f'Speed benchmark of {len(algorithms)} algorithm(s) is running....')
+    results = []
+    failed_units = []
+    for source in sources:
+        for freq_sampling in frequencies:
+            segments = get_segments(source, freq_sampling, list(set(durations)))
+            if segments is None:
+                print(f'No real record at {freq_sampling}Hz, {source} segments are skipped....')
+                continue
+            for counter, algorithm in enumerate(algorithms, start=1):
+                print(f'{counter}/{len(algorithms)} {algorithm} on {source} segments at {freq_sampling}Hz')
+                # timings would include the resampling and mix the numbers of samples of two frequencies
+                detection_frequency = get_detection_frequency(algorithm, freq_sampling)
+                if detection_frequency != freq_sampling:
+                    print(f'{algorithm} runs at {detection_frequency}Hz, {source} segments at {freq_sampling}Hz are '
+                          f'skipped....')
+                    continue
+                try:
+                    results.extend(benchmark_algo(algorithm, source, freq_sampling, segments, repeats, max_time))
+                except Exception as error:
+                    failed_units.append(f'{algorithm}/{source}/{freq_sampling}Hz ({type(error).__name__}: {error})')
+            del segments
+    speed_df = pd.DataFrame(results, columns=['algorithm', 'source', 'fs', 'duration', 'samples', 'min', 'median',
+                                              'samples/s'])
+    scaling_df = get_scaling(speed_df, min_duration, superlinear_slope)
+    comparison_df = compare_to_baseline(speed_df, read_baseline(), regression_ratio)
+
+    os.makedirs(speed_path, exist_ok=True)
+    comparison_df.to_csv(f'{speed_path}/speed.csv', sep=',', index=False)
+    scaling_df.to_csv(f'{speed_path}/scaling.csv', sep=',', index=False)
+    for algorithm, source, freq_sampling, slope in \
+            scaling_df[scaling_df['superlinear']][['algorithm', 'source', 'fs', 'slope']].itertuples(index=False):
+        print(f'Super-linear: {algorithm} on {source} segments at {freq_sampling}Hz (log-log slope {slope:.2f})')
+    for algorithm, source, freq_sampling, duration, ratio, current_version, baseline_version in \
+            comparison_df[comparison_df['regression']][['algorithm', 'source', 'fs', 'duration', 'ratio', 'version',
+                                                        'baseline version']].itertuples(index=False):
+        print(f'Regression: {algorithm} on {source} segments at {freq_sampling}Hz of {duration}s is {ratio:.2f} '
+              f'times slower than the baseline ({baseline_version} -> {current_version})')
+    if save_baseline:
+        write_baseline(speed_df)
+    if len(failed_units) > 0:
+        raise click.ClickException(f'Speed benchmark failed for units: {", ".join(failed_units)} (results of other '
+                                   f'units are saved in {speed_path})')
+    print(f'Speed benchmark was successful, results are saved in {speed_path}....')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a persistent cache of decoded signals. The first time a record is read, its digital samples are
+decoded from the WFDB files by wfdb and saved as one .npy file per channel, with the gains and baselines of the
+channels in a json header. Next readings load the .npy files by memory mapping and convert them to physical units,
+without WFDB decoding (or give them as they are with their calibration, in a quarter of the memory of float64 values).
+A cached record is identified by its database, its ID and the modification times and sizes of its WFDB files, so that
+any change of the files invalidates it."""
+
+import os
+import json
+import shutil
+import hashlib
+import wfdb
+import numpy
+from typing import Dict, Generator, List, NamedTuple, Optional, Tuple
+
+data_path = 'data'
+cache_path = 'cache/signals'
+# number of samples decoded at once when a record is cached
+chunk_size = 2 ** 20
+
+# dtypes of signals given by readers: physical values in float64 (as the p_signal of wfdb) or in float32, or digital
+# samples as they are cached (int16 for formats of 16 bits or less), whose calibration is given by
+# read_record_calibration
+signal_dtypes = ['float64', 'float32', 'digital']
+
+# digital values used by WFDB formats to store missing samples (NaN)
+invalid_sample_values = {
+    '80': -2 ** 7,
+    '310': -2 ** 9,
+    '311': -2 ** 9,
+    '212': -2 ** 11,
+    '16': -2 ** 15,
+    '61': -2 ** 15,
+    '160': -2 ** 15,
+    '24': -2 ** 23,
+    '32': -2 ** 31
+}
+
+
+class SignalCalibration(NamedTuple):
+    """
+    calibration of digital samples of channels, in the order of the columns: gain, baseline and WFDB format (which gives
+    the digital value of missing samples) of each channel.
+    """
+    adc_gain: List[float]
+    baseline: List[int]
+    fmt: List[str]
+
+    def select(self, columns: List[int]) -> 'SignalCalibration':
+        """
+        get the calibration of some columns only.
+
+        :param columns: indexes of the columns to keep
+        :type columns: list(int)
+        :return: calibration of the selected columns, in the given order
+        :rtype: SignalCalibration
+        """
+        return SignalCalibration(*[[values[column] for column in columns] for values in self])
+
+
+def get_record_key(database: str, record_id: str) -> str:
+    """
+    compute the key of a record from the modification times and sizes of its header and signal files.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :return: key of the current version of the record's files
+    :rtype: str
+    """
+    record_path = f'{data_path}/{database}/{record_id}'
+    header = wfdb.rdheader(record_path)
+    files = [f'{record_path}.hea'] + [f'{data_path}/{database}/{file_name}'
+                                      for file_name in sorted(set(header.file_name))]
+    files_stats = [(os.path.basename(file), os.stat(file).st_mtime_ns, os.stat(file).st_size) for file in files]
+    return hashlib.sha1(json.dumps([database, str(record_id), files_stats]).encode()).hexdigest()[:16]
+
+
+def get_record_cache_dir(database: str, record_id: str, key: str) -> str:
+    """
+    get the folder where a version of a record is cached.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param key: key of the version of the record's files
+    :type key: str
+    :return: path of the folder
+    :rtype: str
+    """
+    return f'{cache_path}/{database}/{record_id}-{key}'
+
+
+def write_record_cache(database: str, record_id: str, key: str) -> str:
+    """
+    decode digital samples of a record with wfdb and save them in the cache, one .npy file per channel. The record is
+    decoded by chunks of chunk_size samples written in memory mapped files, so that memory does not grow with the
+    length of the record. The folder is written under a temporary name and then renamed, so that concurrent readers
+    never see a partial cache. Older versions of the record are removed.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param key: key of the current version of the record's files
+    :type key: str
+    :return: path of the folder of the cached record
+    :rtype: str
+    """
+    record_cache_dir = get_record_cache_dir(database, record_id, key)
+    tmp_dir = f'{record_cache_dir}.tmp-{os.getpid()}'
+    record_path = f'{data_path}/{database}/{record_id}'
+    header = wfdb.rdheader(record_path)
+    os.makedirs(tmp_dir, exist_ok=True)
+    dtypes = [numpy.int16 if fmt in ['80', '310', '311', '212', '16', '61'] else numpy.int32 for fmt in header.fmt]
+    channels = [numpy.lib.format.open_memmap(f'{tmp_dir}/{id_sig}.npy', mode='w+', dtype=dtypes[id_sig],
+                                             shape=(header.sig_len,)) for id_sig in range(header.n_sig)]
+    for sampfrom in range(0, header.sig_len, chunk_size):
+        sampto = min(sampfrom + chunk_size, header.sig_len)
+        record = wfdb.rdrecord(record_path, sampfrom=sampfrom, sampto=sampto, physical=False)
+        for id_sig in range(header.n_sig):
+            channels[id_sig][sampfrom:sampto] = record.d_signal[:, id_sig]
+    for channel in channels:
+        channel.flush()
+    del channels
+    cache_header = {
+        'key': key,
+        'fs': header.fs,
+        'sig_len': header.sig_len,
+        'sig_name': header.sig_name,
+        'fmt': header.fmt,
+        'adc_gain': header.adc_gain,
+        'baseline': header.baseline,
+        'units': header.units,
+        'dtype': [numpy.dtype(dtype).name for dtype in dtypes]
+    }
+    with open(f'{tmp_dir}/header.json', 'w') as outfile:
+        json.dump(cache_header, outfile)
+    try:
+        os.rename(tmp_dir, record_cache_dir)
+    except OSError:
+        # another process cached the same version of the record meanwhile
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    for cache_dir in os.listdir(f'{cache_path}/{database}'):
+        if cache_dir.startswith(f'{record_id}-') and cache_dir != os.path.basename(record_cache_dir) \
+                and '.tmp-' not in cache_dir:
+            shutil.rmtree(f'{cache_path}/{database}/{cache_dir}', ignore_errors=True)
+    return record_cache_dir
+
+
+def get_record_cache(database: str, record_id: str) -> str:
+    """
+    get the folder of the cached record, and cache the record first if it is missing or outdated.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :return: path of the folder of the cached record
+    :rtype: str
+    """
+    key = get_record_key(database, record_id)
+    record_cache_dir = get_record_cache_dir(database, record_id, key)
+    if not os.path.exists(f'{record_cache_dir}/header.json'):
+        record_cache_dir = write_record_cache(database, record_id, key)
+    return record_cache_dir
+
+
+def read_record_header(database: str, record_id: str) -> Dict:
+    """
+    read the header of a cached record (sampling frequency, length, names, formats, gains and baselines of channels).
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :return: header of the cached record
+    :rtype: dict
+    """
+    with open(f'{get_record_cache(database, record_id)}/header.json') as header_json:
+        return json.load(header_json)
+
+
+def read_digital_channel(database: str, record_id: str, id_sig: int) -> numpy.ndarray:
+    """
+    memory map the digital samples of one channel of a cached record.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param id_sig: index of the channel in the record
+    :type id_sig: int
+    :return: digital samples of the channel (read-only memory map)
+    :rtype: ndarray
+    """
+    return numpy.load(f'{get_record_cache(database, record_id)}/{id_sig}.npy', mmap_mode='r')
+
+
+def digital_to_physical(d_signal: numpy.ndarray, adc_gain: float, baseline: int, fmt: str,
+                        out: Optional[numpy.ndarray] = None, dtype: str = 'float64') -> numpy.ndarray:
+    """
+    convert digital samples to physical units as wfdb does: (d_signal - baseline) / adc_gain, with NaN for the digital
+    value which marks missing samples in the format.
+
+    :param d_signal: digital samples of a channel
+    :type d_signal: ndarray
+    :param adc_gain: gain of the channel
+    :type adc_gain: float
+    :param baseline: baseline of the channel
+    :type baseline: int
+    :param fmt: WFDB format of the channel
+    :type fmt: str
+    :param out: float array of the same length where physical values are written (a new array if None)
+    :type out: ndarray
+    :param dtype: float dtype of the new array of physical values (ignored if out is given)
+    :type dtype: str
+    :return: physical values of the channel
+    :rtype: ndarray
+    """
+    if out is None:
+        p_signal = d_signal.astype(dtype)
+    else:
+        p_signal = out
+        p_signal[:] = d_signal
+    numpy.subtract(p_signal, baseline, p_signal)
+    numpy.divide(p_signal, adc_gain, p_signal)
+    if fmt in invalid_sample_values:
+        p_signal[d_signal == invalid_sample_values[fmt]] = numpy.nan
+    return p_signal
+
+
+def digital_array_to_physical(d_signals: numpy.ndarray, calibration: SignalCalibration,
+                              dtype: str = 'float64') -> numpy.ndarray:
+    """
+    convert digital samples of a signal, or of every column of a 2-D array (samples x channels), to physical units
+    with their calibration (see digital_to_physical).
+
+    :param d_signals: digital samples of the signal (or one column per channel)
+    :type d_signals: ndarray
+    :param calibration: calibration of the signal (or of each column)
+    :type calibration: SignalCalibration
+    :param dtype: float dtype of physical values
+    :type dtype: str
+    :return: physical values of the signal (or one column per channel, in Fortran order)
+    :rtype: ndarray
+    """
+    p_signals = numpy.empty(d_signals.shape, dtype=dtype, order='F')
+    d_columns = d_signals.reshape(d_signals.shape[0], -1)
+    p_columns = p_signals.reshape(p_signals.shape[0], -1, order='F')
+    for column in range(d_columns.shape[1]):
+        digital_to_physical(d_columns[:, column], calibration.adc_gain[column], calibration.baseline[column],
+                            calibration.fmt[column], out=p_columns[:, column])
+    return p_signals
+
+
+def read_record_calibration(database: str, record_id: str, channels: Optional[List[int]] = None) \
+        -> SignalCalibration:
+    """
+    read the calibration of the channels of a cached record, to convert their digital samples to physical units.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param channels: indexes of the channels (every channel if None)
+    :type channels: list(int)
+    :return: calibration of the channels, in the given order
+    :rtype: SignalCalibration
+    """
+    header = read_record_header(database, record_id)
+    if channels is None:
+        channels = list(range(len(header['sig_name'])))
+    return SignalCalibration([header['adc_gain'][id_sig] for id_sig in channels],
+                             [header['baseline'][id_sig] for id_sig in channels],
+                             [header['fmt'][id_sig] for id_sig in channels])
+
+
+def read_record_signals(database: str, record_id: str, channels: Optional[List[int]] = None,
+                        dtype: str = 'float64') -> Dict[str, numpy.ndarray]:
+    """
+    read physical values (or digital samples) of the channels of a record through the cache.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param channels: indexes of the channels to read (every channel if None)
+    :type channels: list(int)
+    :param dtype: dtype of the values, among signal_dtypes
+    :type dtype: str
+    :return: values of sampled signals for each channel
+    :rtype: dict(str, ndarray)
+    """
+    record_cache_dir = get_record_cache(database, record_id)
+    with open(f'{record_cache_dir}/header.json') as header_json:
+        header = json.load(header_json)
+    if channels is None:
+        channels = list(range(len(header['sig_name'])))
+    record_sigs = {}
+    for id_sig in channels:
+        d_signal = numpy.load(f'{record_cache_dir}/{id_sig}.npy', mmap_mode='r')
+        if dtype == 'digital':
+            record_sigs[header['sig_name'][id_sig]] = numpy.array(d_signal)
+        else:
+            record_sigs[header['sig_name'][id_sig]] = digital_to_physical(d_signal, header['adc_gain'][id_sig],
+                                                                          header['baseline'][id_sig],
+                                                                          header['fmt'][id_sig], dtype=dtype)
+    return record_sigs
+
+
+def read_record_array(database: str, record_id: str, channels: Optional[List[int]] = None, dtype: str = 'float64') \
+        -> Tuple[List[str], numpy.ndarray]:
+    """
+    read physical values (or digital samples) of the channels of a record through the cache, in a single 2-D array
+    (samples x channels) like the p_signal (or d_signal) of wfdb. The array is in Fortran order so that each channel is
+    contiguous.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param channels: indexes of the channels to read (every channel if None)
+    :type channels: list(int)
+    :param dtype: dtype of the values, among signal_dtypes
+    :type dtype: str
+    :return: names of the channels and values of sampled signals (one column per channel)
+    :rtype: tuple(list(str), ndarray)
+    """
+    record_cache_dir = get_record_cache(database, record_id)
+    with open(f'{record_cache_dir}/header.json') as header_json:
+        header = json.load(header_json)
+    if channels is None:
+        channels = list(range(len(header['sig_name'])))
+    if dtype == 'digital':
+        array_dtype = numpy.result_type(numpy.int16, *[header['dtype'][id_sig] for id_sig in channels])
+    else:
+        array_dtype = dtype
+    p_signal = numpy.empty((header['sig_len'], len(channels)), dtype=array_dtype, order='F')
+    for column, id_sig in enumerate(channels):
+        d_signal = numpy.load(f'{record_cache_dir}/{id_sig}.npy', mmap_mode='r')
+        if dtype == 'digital':
+            p_signal[:, column] = d_signal
+        else:
+            digital_to_physical(d_signal, header['adc_gain'][id_sig], header['baseline'][id_sig],
+                                header['fmt'][id_sig], out=p_signal[:, column])
+    return [header['sig_name'][id_sig] for id_sig in channels], p_signal
+
+
+def read_record_windows(database: str, record_id: str, window_size: int, overlap: int,
+                        channels: Optional[List[int]] = None, dtype: str = 'float64') \
+        -> Generator[Tuple[str, int, numpy.ndarray], None, None]:
+    """
+    read channels of a record by fixed-size windows. Each window starts overlap samples before the end of the previous
+    one. Samples are read from the memory map of the cached digital samples and converted to physical units window by
+    window, so that memory is bounded by the size of the window rather than the length of the record.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param window_size: number of samples of each window
+    :type window_size: int
+    :param overlap: number of samples shared by two consecutive windows (lower than window_size)
+    :type overlap: int
+    :param channels: indexes of the channels to read (every channel if None)
+    :type channels: list(int)
+    :param dtype: dtype of the values, among signal_dtypes
+    :type dtype: str
+    :return: for each window of each channel: name of the channel, index of the first sample of the window in the
+    record and physical values (or digital samples) of the window
+    :rtype: tuple(str, int, ndarray)
+    """
+    if not 0 <= overlap < window_size:
+        raise ValueError(f'overlap ({overlap}) must be positive and lower than window_size ({window_size})')
+    record_cache_dir = get_record_cache(database, record_id)
+    with open(f'{record_cache_dir}/header.json') as header_json:
+        header = json.load(header_json)
+    if channels is None:
+        channels = list(range(len(header['sig_name'])))
+    for id_sig in channels:
+        sig_name = header['sig_name'][id_sig]
+        d_signal = numpy.load(f'{record_cache_dir}/{id_sig}.npy', mmap_mode='r')
+        for start in range(0, max(header['sig_len'] - overlap, 1), window_size - overlap):
+            if dtype == 'digital':
+                yield sig_name, start, numpy.array(d_signal[start:start + window_size])
+            else:
+                yield sig_name, start, digital_to_physical(d_signal[start:start + window_size],
+                                                           header['adc_gain'][id_sig], header['baseline'][id_sig],
+                                                           header['fmt'][id_sig], dtype=dtype)
+
+
+def clear_cache(database: Optional[str] = None) -> None:
+    """
+    remove cached records of a database, or of every database.
+
+    :param database: name of the folder of the database in data_path (every database if None)
+    :type database: str
+    """
+    shutil.rmtree(cache_path if database is None else f'{cache_path}/{database}', ignore_errors=True)
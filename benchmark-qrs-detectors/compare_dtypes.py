@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script verifies that reading signals in another dtype than float64 does not change the results of a QRS
+detector. For each record of the chosen dataset, every channel is read as physical values in float64 and in the chosen
+dtype (physical values in float32, or digital samples with their calibration), QRS detection is performed on both and
+detections are compared one by one. The memory of both signals and the CPU times of both detections are also compared.
+Obtained results are saved in a csv file, and the script fails if any detection differs."""
+
+import os
+import time
+import click
+from dataset_helper import *
+from algo_helper import *
+
+
+def write_dtypes_csv(algorithm: str, dataset: str, dtype: str, comparison_df: pd.DataFrame) -> None:
+    """
+    write differences of detections, memory of signals and CPU times of the detection on signals read in float64 and in
+    another dtype from a DataFrame in a csv file.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param dtype: dtype compared to float64
+    :type dtype: str
+    :param comparison_df: differences, memory and CPU times for each record and for the entire dataset
+    :type comparison_df: DataFrame
+    """
+    os.makedirs(f'output/dtypes', exist_ok=True)
+    comparison_df.to_csv(f'output/dtypes/{algorithm}_{dataset}_{dtype}.csv', sep=',', index=True)
+
+
+def time_run_algo_multichannel(algorithm: str, sigs: numpy.ndarray, freq_sampling: int,
+                               calibration: Optional[SignalCalibration] = None) -> Tuple[List[List[int]], float]:
+    """
+    run a qrs detector on every channel of a record (see run_algo_multichannel) and measure the CPU time of the process
+    during the detection.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sigs: values of sampled signals to study (one column per channel)
+    :type sigs: ndarray
+    :param freq_sampling: value of sampling frequency of the signals
+    :type freq_sampling: int
+    :param calibration: calibration of each column, required if sigs holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections for each channel and CPU time in s (including the conversion of signals)
+    :rtype: tuple(list(list(int)), float)
+    """
+    start_cpu = time.process_time()
+    detections = run_algo_multichannel(algorithm, sigs, freq_sampling, calibration=calibration)
+    return detections, time.process_time() - start_cpu
+
+
+# parse arguments
+@click.command()
+@click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
+@click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
+@click.option('--dtype', default='digital', type=click.Choice(signal_dtypes[1:]),
+              help='dtype compared to float64: physical values in float32 or digital samples with their calibration')
+@click.option('--record', multiple=True, help='ID of a record to compare, option can be repeated, every record if '
+                                              'omitted')
+def main(data: str, algo: str, dtype: str, record: Tuple[str]) -> None:
+    dataset = data
+    algorithm = algo
+    fs = sampling_frequency[dataset]
+    record_ids = get_record_ids(dataset, list(record) if len(record) > 0 else None)
+
+    columns = ['channels', 'detections', 'different detections', 'memory(MB)', f'memory {dtype}(MB)', 'CPU time(s)',
+               f'CPU time {dtype}(s)']
+    counts = []
+    print(f'Comparison of detection with {algorithm} on signals in float64 and {dtype} on dataset {dataset} is '
+          f'running....')
+    for counter, ((record_id, sig_names, sigs), (_, _, dtype_sigs)) in enumerate(
+            zip(iter_dataset_arrays(dataset, record_ids), iter_dataset_arrays(dataset, record_ids, dtype=dtype)),
+            start=1):
+        calibration = get_record_calibration(dataset, record_id, sig_names) if dtype == 'digital' else None
+        detections, cpu_time = time_run_algo_multichannel(algorithm, sigs, fs)
+        dtype_detections, dtype_cpu_time = time_run_algo_multichannel(algorithm, dtype_sigs, fs, calibration)
+        differences = sum(len(set(qrs_frames).symmetric_difference(dtype_qrs_frames))
+                          for qrs_frames, dtype_qrs_frames in zip(detections, dtype_detections))
+        counts.append([len(sig_names), sum(len(qrs_frames) for qrs_frames in detections), differences,
+                       sigs.nbytes / 2 ** 20, dtype_sigs.nbytes / 2 ** 20, cpu_time, dtype_cpu_time])
+        print(f'{counter}/{len(record_ids)}')
+
+    comparison_df = pd.DataFrame(counts, index=record_ids, columns=columns)
+    comparison_df.loc['global'] = comparison_df.sum(axis=0)
+    comparison_df['memory ratio'] = (comparison_df[f'memory {dtype}(MB)'] / comparison_df['memory(MB)']).round(2)
+    comparison_df['CPU speedup'] = (comparison_df['CPU time(s)'] /
+                                    comparison_df[f'CPU time {dtype}(s)'].where(
+                                        comparison_df[f'CPU time {dtype}(s)'] > 0)).round(2)
+    write_dtypes_csv(algorithm, dataset, dtype, comparison_df)
+    print(comparison_df.loc['global', ['detections', 'different detections', 'memory(MB)', f'memory {dtype}(MB)',
+                                       'memory ratio', 'CPU speedup']])
+    changed_records = [record_id for record_id in record_ids
+                       if comparison_df.loc[record_id, 'different detections'] > 0]
+    if len(changed_records) > 0:
+        raise click.ClickException(f'Detections with {algorithm} on signals in {dtype} differ from signals in float64 '
+                                   f'for records: {", ".join(changed_records)}')
+    print(f'Detections with {algorithm} on signals in {dtype} are unchanged on dataset {dataset}....')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script measures the accuracy cost and the CPU savings of running a QRS detector on resampled signals (see
+resampling_helper). For each record of the chosen dataset, QRS detection is performed on the first channel at the
+sampling frequency of the dataset and on the same channel resampled to the chosen frequency, detections being mapped
+back to samples of the record. Both detections are evaluated against beat annotations, and scores and CPU times are
+compared. Obtained results are saved in a csv file, to choose a common frequency which trades accuracy for speed."""
+
+import os
+import time
+import click
+from dataset_helper import *
+from algo_helper import *
+from get_annotations import get_annotations_dataset
+from get_perf import compute_confusion_matrices_and_delays, get_scores
+
+
+def write_resampled_csv(algorithm: str, dataset: str, target_frequency: int, comparison_df: pd.DataFrame) -> None:
+    """
+    write scores and CPU times of the detection at the frequency of the dataset and on resampled signals from a
+    DataFrame in a csv file.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param target_frequency: sampling frequency of resampled signals
+    :type target_frequency: int
+    :param comparison_df: scores and CPU times of both detections for each record and for the entire dataset
+    :type comparison_df: DataFrame
+    """
+    os.makedirs(f'output/resampled', exist_ok=True)
+    comparison_df.to_csv(f'output/resampled/{algorithm}_{dataset}_{target_frequency}hz.csv', sep=',', index=True)
+
+
+def time_run_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int, target_frequency: Optional[int] = None) \
+        -> Tuple[List[int], float]:
+    """
+    run a qrs detector on a signal (see run_algo) and measure the CPU time of the process during the detection.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sig: values of the sampled signal to study
+    :type sig: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection
+    :type target_frequency: int
+    :return: localisations of qrs detections and CPU time in s (including the resampling)
+    :rtype: tuple(list(int), float)
+    """
+    start_cpu = time.process_time()
+    qrs_frames = run_algo(algorithm, sig, freq_sampling, target_frequency)
+    return qrs_frames, time.process_time() - start_cpu
+
+
+# parse arguments
+@click.command()
+@click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
+@click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
+@click.option('--fs', 'target_fs', default=128, type=click.IntRange(1, None),
+              help='sampling frequency of resampled signals (in Hz), type=int')
+@click.option('--tol', default=50, type=click.IntRange(0, 1000, clamp=True),
+              help='tolerance of the evaluation (in ms), type=int')
+def main(data: str, algo: str, target_fs: int, tol: int) -> None:
+    dataset = data
+    algorithm = algo
+    fs = sampling_frequency[dataset]
+    tolerance_fr = int((tol * fs) / 1000)
+    records_dict = records[dataset]
+    annotations_dict = get_annotations_dataset(dataset)
+    detection_fs = get_detection_frequency(algorithm, fs)
+    resampled_fs = get_detection_frequency(algorithm, fs, target_fs)
+    if resampled_fs != target_fs:
+        print(f'{algorithm} cannot run at {target_fs} Hz, signals are resampled to {resampled_fs} Hz....')
+
+    columns = ['nbofbeats', 'TP', 'FP', 'FN', 'TP resampled', 'FP resampled', 'FN resampled', 'CPU time(s)',
+               'CPU time resampled(s)']
+    counts = []
+    print(f'Comparison of detection with {algorithm} at {detection_fs} Hz and {resampled_fs} Hz on dataset {dataset} '
+          f'is running....')
+    for counter, (record_id, sig_names) in enumerate(records_dict.items(), start=1):
+        sig = read_record_channel(dataset, record_id, sig_names[0])
+        native_detections, native_time = time_run_algo(algorithm, sig, fs)
+        resampled_detections, resampled_time = time_run_algo(algorithm, sig, fs, target_fs)
+        [[native_cm, _]] = compute_confusion_matrices_and_delays(native_detections, annotations_dict[record_id],
+                                                                 [tolerance_fr])
+        [[resampled_cm, _]] = compute_confusion_matrices_and_delays(resampled_detections, annotations_dict[record_id],
+                                                                    [tolerance_fr])
+        counts.append([len(annotations_dict[record_id])] + native_cm + resampled_cm + [native_time, resampled_time])
+        print(f'{counter}/{len(records_dict.keys())}')
+
+    comparison_df = pd.DataFrame(counts, index=list(records_dict.keys()), columns=columns)
+    comparison_df.loc['global'] = comparison_df.sum(axis=0)
+    scores = [get_scores(*comparison_df.loc[id_rec, ['TP', 'FP', 'FN']]) +
+              get_scores(*comparison_df.loc[id_rec, ['TP resampled', 'FP resampled', 'FN resampled']])
+              for id_rec in comparison_df.index]
+    scores_df = pd.DataFrame(scores, index=comparison_df.index,
+                             columns=['P+(%)', 'Se(%)', 'F1(%)', 'P+ resampled(%)', 'Se resampled(%)',
+                                      'F1 resampled(%)'])
+    comparison_df = pd.concat([comparison_df, scores_df], axis=1)
+    comparison_df['F1 difference(%)'] = (comparison_df['F1 resampled(%)'] - comparison_df['F1(%)']).round(2)
+    comparison_df['CPU speedup'] = (comparison_df['CPU time(s)'] /
+                                    comparison_df['CPU time resampled(s)'].where(
+                                        comparison_df['CPU time resampled(s)'] > 0)).round(2)
+    write_resampled_csv(algorithm, dataset, target_fs, comparison_df)
+    print(comparison_df.loc['global', ['F1(%)', 'F1 resampled(%)', 'F1 difference(%)', 'CPU time(s)',
+                                       'CPU time resampled(s)', 'CPU speedup']])
+    print(f'Comparison of detection with {algorithm} on dataset {dataset} was successful....')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script measures the accuracy cost of the windowed (streaming) detection mode of algo_helper. For each record of
+the chosen dataset, QRS detection is performed on the entire signal of the first channel and on the same channel read
+by overlapping windows. Both detections are evaluated against beat annotations and scores are compared. Obtained
+results are saved in a csv file, to choose the size of windows which trades memory for fidelity."""
+
+import os
+import click
+from dataset_helper import *
+from algo_helper import *
+from cache_helper import read_record_windows
+from get_annotations import get_annotations_dataset
+from get_perf import compute_confusion_matrices_and_delays, get_scores
+
+
+def write_windowed_csv(algorithm: str, dataset: str, window_s: float, overlap_s: float,
+                       comparison_df: pd.DataFrame) -> None:
+    """
+    write scores of the detection on entire signals and by windows from a DataFrame in a csv file.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param window_s: duration of windows in seconds
+    :type window_s: float
+    :param overlap_s: duration of the overlap between windows in seconds
+    :type overlap_s: float
+    :param comparison_df: scores of both detections for each record and for the entire dataset
+    :type comparison_df: DataFrame
+    """
+    os.makedirs(f'output/windowed', exist_ok=True)
+    comparison_df.to_csv(f'output/windowed/{algorithm}_{dataset}_{window_s:g}_{overlap_s:g}.csv', sep=',', index=True)
+
+
+# parse arguments
+@click.command()
+@click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
+@click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
+@click.option('--window', required=True, type=click.FloatRange(1, None), help='duration of windows (in s), type=float')
+@click.option('--overlap', default=5, type=click.FloatRange(0, None),
+              help='duration of the overlap between windows (in s), type=float')
+@click.option('--merge', default=50, type=click.IntRange(0, None),
+              help='minimal time between two detections on both sides of a seam (in ms), type=int')
+@click.option('--tol', default=50, type=click.IntRange(0, 1000, clamp=True),
+              help='tolerance of the evaluation (in ms), type=int')
+def main(data: str, algo: str, window: float, overlap: float, merge: int, tol: int) -> None:
+    dataset = data
+    algorithm = algo
+    fs = sampling_frequency[dataset]
+    window_size = int(window * fs)
+    overlap_size = int(overlap * fs)
+    if overlap_size >= window_size:
+        raise click.BadParameter('overlap must be shorter than window')
+    merge_fr = int((merge * fs) / 1000)
+    tolerance_fr = int((tol * fs) / 1000)
+    records_dict = records[dataset]
+    annotations_dict = get_annotations_dataset(dataset)
+
+    columns = ['nbofbeats', 'TP', 'FP', 'FN', 'TP windowed', 'FP windowed', 'FN windowed']
+    counts = []
+    print(f'Comparison of detection with {algorithm} on entire signals and windows of {window:g}s on dataset {dataset} '
+          f'is running....')
+    for counter, (record_id, sig_names) in enumerate(records_dict.items(), start=1):
+        sig = read_record_channel(dataset, record_id, sig_names[0])
+        whole_detections = run_algo(algorithm, sig, fs)
+        del sig
+        windows = ((start, values) for _, start, values in read_record_windows(
+            database_folders[dataset], record_id, window_size, overlap_size, channels=[0]))
+        windowed_detections = run_algo_windows(algorithm, windows, fs, overlap_size, merge_fr)
+        [[whole_cm, _]] = compute_confusion_matrices_and_delays(whole_detections, annotations_dict[record_id],
+                                                                [tolerance_fr])
+        [[windowed_cm, _]] = compute_confusion_matrices_and_delays(windowed_detections, annotations_dict[record_id],
+                                                                   [tolerance_fr])
+        counts.append([len(annotations_dict[record_id])] + whole_cm + windowed_cm)
+        print(f'{counter}/{len(records_dict.keys())}')
+
+    comparison_df = pd.DataFrame(counts, index=list(records_dict.keys()), columns=columns)
+    comparison_df.loc['global'] = comparison_df.sum(axis=0)
+    scores = [get_scores(*comparison_df.loc[id_rec, ['TP', 'FP', 'FN']]) +
+              get_scores(*comparison_df.loc[id_rec, ['TP windowed', 'FP windowed', 'FN windowed']])
+              for id_rec in comparison_df.index]
+    scores_df = pd.DataFrame(scores, index=comparison_df.index,
+                             columns=['P+(%)', 'Se(%)', 'F1(%)', 'P+ windowed(%)', 'Se windowed(%)',
+                                      'F1 windowed(%)'])
+    comparison_df = pd.concat([comparison_df, scores_df], axis=1)
+    comparison_df['F1 difference(%)'] = (comparison_df['F1 windowed(%)'] - comparison_df['F1(%)']).round(2)
+    write_windowed_csv(algorithm, dataset, window, overlap, comparison_df)
+    print(comparison_df.loc['global', ['F1(%)', 'F1 windowed(%)', 'F1 difference(%)']])
+    print(f'Comparison of detection with {algorithm} on dataset {dataset} was successful....')
+
+
+if __name__ == '__main__':
+    main()
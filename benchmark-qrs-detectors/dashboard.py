@@ -5,17 +5,22 @@ evaluation which have already been performed. This module is independent from ot
 """
 
 import streamlit as st
-import glob
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
-from statistics import mean
 import pandas as pd
-from math import nan
 import os
-import json
+import numpy
+from typing import List, Optional, Union
 
 from dataset_helper import records, sampling_frequency
 from algo_helper import algorithms_list
+from results_helper import results_db_path, read_performances, read_delay_histograms, read_profiles, \
+    delay_statistics_columns
+
+# cache of streamlit for data (st.cache before streamlit 1.18)
+cache_data = st.cache_data if hasattr(st, 'cache_data') else st.cache
+
+perf_columns = ['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)']
 
 '''
 # Benchmark of QRS detectors
@@ -34,8 +39,153 @@ def get_layout(title: str) -> go.Layout:
     return go.Layout(title=title, margin=dict(l=20, r=20, t=30, b=20))
 
 
+def get_results_mtime() -> int:
+    """
+    get the modification time of the database of results, to know if results changed since they were queried.
+
+    :return: modification time of the database (in ns), 0 if there is no result
+    :rtype: int
+    """
+    return os.stat(results_db_path).st_mtime_ns if os.path.exists(results_db_path) else 0
+
+
+@cache_data
+def query_performances(mtime: int, algorithm: Optional[str] = None, dataset: Union[None, str, List[str]] = None,
+                       tolerance: Optional[int] = None, record: Union[None, str, List[str]] = None) -> pd.DataFrame:
+    """
+    query criteria and scores of evaluations in the database of results. Results of queries are cached by streamlit
+    until the database changes.
+
+    :param mtime: modification time of the database, given by get_results_mtime
+    :type mtime: int
+    :param algorithm: name of the algorithm (any algorithm if None)
+    :type algorithm: str
+    :param dataset: names of the datasets (any dataset if None)
+    :type dataset: str or list(str)
+    :param tolerance: tolerance of the evaluations in ms (any tolerance if None)
+    :type tolerance: int
+    :param record: IDs of the records, 'global' for the entire dataset (any record if None)
+    :type record: str or list(str)
+    :return: criteria and scores with the algorithm, dataset, tolerance and record of each line
+    :rtype: DataFrame
+    """
+    if mtime == 0:
+        return pd.DataFrame(columns=['algorithm', 'dataset', 'tolerance', 'record'] + perf_columns)
+    return read_performances(algorithm, dataset, tolerance, record)
+
+
+@cache_data
+def query_delay_histograms(mtime: int, algorithm: str, dataset: str, record: str) -> pd.DataFrame:
+    """
+    query histograms and statistics of delays of a record in the evaluations of an algorithm on a dataset for every
+    tolerance, cached by streamlit until the database changes.
+
+    :param mtime: modification time of the database, given by get_results_mtime
+    :type mtime: int
+    :param algorithm: name of the algorithm
+    :type algorithm: str
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record: ID of the record, 'global' for the entire dataset
+    :type record: str
+    :return: value of the first bin, histogram and statistics of delays for each tolerance
+    :rtype: DataFrame
+    """
+    return read_delay_histograms(algorithm, dataset, record=record)
+
+
+def get_global_scores(column: str, tolerance: int, datasets: List[str]) -> pd.DataFrame:
+    """
+    get a global criterion or score of every algorithm on several datasets for one tolerance.
+
+    :param column: name of the criterion or score
+    :type column: str
+    :param tolerance: tolerance of the evaluations (in ms)
+    :type tolerance: int
+    :param datasets: names of the datasets
+    :type datasets: list(str)
+    :return: values for each algorithm (lines) and each dataset (columns), NaN for evaluations not performed
+    :rtype: DataFrame
+    """
+    global_lines = query_performances(results_mtime, dataset=datasets, tolerance=tolerance, record='global')
+    return global_lines.pivot_table(index='algorithm', columns='dataset', values=column, aggfunc='last') \
+        .reindex(index=algorithms_list, columns=datasets)
+
+
+@cache_data
+def query_profiles(mtime: int, dataset: str) -> pd.DataFrame:
+    """
+    query measures of speed and memory of the detections of every algorithm on a dataset, cached by streamlit until the
+    database changes.
+
+    :param mtime: modification time of the database, given by get_results_mtime
+    :type mtime: int
+    :param dataset: name of the dataset
+    :type dataset: str
+    :return: measures of the detection of each channel of each record
+    :rtype: DataFrame
+    """
+    if mtime == 0:
+        return pd.DataFrame(columns=['algorithm', 'dataset', 'record', 'channel', 'sampling_frequency', 'samples',
+                                     'wall_time', 'cpu_time', 'peak_memory', 'peak_rss', 'samples_per_second'])
+    return read_profiles(dataset=dataset)
+
+
+def get_speed_accuracy(dataset: str, tolerance: int) -> pd.DataFrame:
+    """
+    gather the cost of the detection of every profiled algorithm on a dataset with its global F1 score. Throughput is
+    the number of samples of every channel divided by the total wall time, CPU time is given per hour of ECG and memory
+    is the highest peak among channels.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param tolerance: tolerance of the evaluations (in ms)
+    :type tolerance: int
+    :return: throughput (samples/s), CPU time per hour of ECG (s), peak memory (MB), peak resident memory of the process
+    during the detection (MB) and F1 score (%) for each algorithm
+    :rtype: DataFrame
+    """
+    profiles = query_profiles(results_mtime, dataset)
+    hours = profiles['samples'] / profiles['sampling_frequency'] / 3600
+    costs = pd.DataFrame({'samples': profiles['samples'], 'wall_time': profiles['wall_time'],
+                          'cpu_time': profiles['cpu_time'], 'hours': hours, 'peak_memory': profiles['peak_memory'],
+                          'peak_rss': profiles['peak_rss']}).groupby(profiles['algorithm']) \
+        .agg({'samples': 'sum', 'wall_time': 'sum', 'cpu_time': 'sum', 'hours': 'sum', 'peak_memory': 'max',
+              'peak_rss': 'max'})
+    speed_accuracy = pd.DataFrame({'samples/s': costs['samples'] / costs['wall_time'],
+                                   'CPU s per hour of ECG': costs['cpu_time'] / costs['hours'],
+                                   'peak memory (MB)': costs['peak_memory'],
+                                   'peak RSS during detection (MB)': costs['peak_rss']})
+    global_lines = query_performances(results_mtime, dataset=dataset, tolerance=tolerance, record='global')
+    speed_accuracy['F1(%)'] = global_lines.groupby('algorithm')['F1(%)'].last()
+    return speed_accuracy.dropna(subset=['samples/s', 'F1(%)']).round(2)
+
+
+def get_pareto_front(speed_accuracy: pd.DataFrame, cost_column: str, lower_is_better: bool) -> pd.DataFrame:
+    """
+    select the algorithms which are not dominated on a cost and the F1 score: no other algorithm is at least as good
+    on both and better on one of them.
+
+    :param speed_accuracy: cost and F1 score for each algorithm, given by get_speed_accuracy
+    :type speed_accuracy: DataFrame
+    :param cost_column: name of the column of the cost
+    :type cost_column: str
+    :param lower_is_better: True if the cost is better when it is lower (memory), False otherwise (throughput)
+    :type lower_is_better: bool
+    :return: lines of the algorithms of the Pareto front, sorted by cost from the best to the worst
+    :rtype: DataFrame
+    """
+    sorted_df = speed_accuracy.sort_values([cost_column, 'F1(%)'], ascending=[lower_is_better, False])
+    # an algorithm is on the front if it is more accurate than every algorithm with a better cost
+    best_f1_before = sorted_df['F1(%)'].cummax().shift(1, fill_value=-1)
+    return sorted_df[sorted_df['F1(%)'] > best_f1_before]
+
+
+results_mtime = get_results_mtime()
+
 # choose application of interest
-applications = ['Comparison of different algorithms', 'Evaluation of one algorithm', 'Noise robustness']
+applications = ['Comparison of different algorithms', 'Evaluation of one algorithm', 'Noise robustness',
+                'Speed and accuracy']
 application = st.sidebar.selectbox('What would you like to study ?', applications)
 
 
@@ -89,173 +239,26 @@ if application == 'Comparison of different algorithms':
     st.write('\n\n')
 
     dataset = st.selectbox('Please choose a dataset:', datasets_list)
-    csv_files_dataset = glob.glob(f'output/perf/*_{dataset}_*.csv')
-    tolerance_list = []
-    for file in csv_files_dataset:
-        eval_tolerance = file[:-4].split('_')[-1]
-        tolerance_list.append(eval_tolerance)
-    tolerance = st.selectbox('Please choose tolerance of the evaluation (in ms):', list(set(tolerance_list)))
-    csv_files = [csv_file for csv_file in csv_files_dataset if csv_file[:-4].split('_')[-1] == tolerance]
+    dataset_results = query_performances(results_mtime, dataset=dataset, record='global')
+    tolerance = st.selectbox('Please choose tolerance of the evaluation (in ms):',
+                             sorted(dataset_results['tolerance'].unique()))
 
     # table of comparison
-    if len(csv_files) == 0:
+    if len(dataset_results) == 0:
         print_error_no_evaluation(ds=dataset)
     else:
+        global_results = dataset_results[dataset_results['tolerance'] == tolerance].set_index('algorithm')
         comparison_df = pd.DataFrame(columns=['FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
         number_of_beats = ''
         st.write('Please select algorithms you would like to compare:')
-        if st.checkbox('Pan-Tompkins-ecg-detector'):
-            if not os.path.exists(f'output/perf/Pan-Tompkins-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Pan-Tompkins-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Pan-Tompkins-ecg-detector_{dataset}_{tolerance}.csv',
-                                         delimiter=',', index_col=0)
-                results_df.iloc[-1, :].name = 'Pan-Tompkins-ecg-detector'
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Pan-Tompkins-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Hamilton-ecg-detector'):
-            if not os.path.exists(f'output/perf/Hamilton-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Hamilton-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Hamilton-ecg-detector_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Hamilton-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Christov-ecg-detector'):
-            if not os.path.exists(f'output/perf/Christov-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Christov-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Christov-ecg-detector_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Christov-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Engelse-Zeelenberg-ecg-detector'):
-            if not os.path.exists(f'output/perf/Engelse-Zeelenberg-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Engelse-Zeelenberg-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Engelse-Zeelenberg-ecg-detector_{dataset}_{tolerance}.csv',
-                                         delimiter=',', index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Engelse-Zeelenberg-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('SWT-ecg-detector'):
-            if not os.path.exists(f'output/perf/SWT-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='SWT-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/SWT-ecg-detector_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'SWT-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Matched-filter-ecg-detector'):
-            if not os.path.exists(f'output/perf/Matched-filter-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Matched-filter-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Matched-filter-ecg-detector_{dataset}_{tolerance}.csv',
-                                         delimiter=',', index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Matched-filter-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Two-average-ecg-detector'):
-            if not os.path.exists(f'output/perf/Two-average-ecg-detector_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Two-average-ecg-detector', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Two-average-ecg-detector_{dataset}_{tolerance}.csv',
-                                         delimiter=',', index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Two-average-ecg-detector'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Hamilton-biosppy'):
-            if not os.path.exists(f'output/perf/Hamilton-biosppy_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Hamilton-biosppy', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Hamilton-biosppy_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Hamilton-biosppy'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Christov-biosppy'):
-            if not os.path.exists(f'output/perf/Christov-biosppy_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Christov-biosppy', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Christov-biosppy_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Christov-biosppy'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Engelse-Zeelenberg-biosppy'):
-            if not os.path.exists(f'output/perf/Engelse-Zeelenberg-biosppy_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Engelse-Zeelenberg-biosppy', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Engelse-Zeelenberg-biosppy_{dataset}_{tolerance}.csv',
-                                         delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Engelse-Zeelenberg-biosppy'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('Gamboa-biosppy'):
-            if not os.path.exists(f'output/perf/Gamboa-biosppy_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='Gamboa-biosppy', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/Gamboa-biosppy_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'Gamboa-biosppy'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('mne-ecg'):
-            if not os.path.exists(f'output/perf/mne-ecg_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='mne-ecg', t=tolerance)
+        selected_algorithms = [algo for algo in algorithms_list if st.checkbox(algo)]
+        for algo in selected_algorithms:
+            if algo not in global_results.index:
+                print_error_no_evaluation(ds=dataset, alg=algo, t=tolerance)
             else:
-                results_df = pd.read_csv(f'output/perf/mne-ecg_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'mne-ecg'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('heartpy'):
-            if not os.path.exists(f'output/perf/heartpy_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='heartpy', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/heartpy_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'heartpy'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('gqrs-wfdb'):
-            if not os.path.exists(f'output/perf/gqrs-wfdb_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='gqrs-wfdb', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/gqrs-wfdb_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'gqrs-wfdb'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
-        if st.checkbox('xqrs-wfdb'):
-            if not os.path.exists(f'output/perf/xqrs-wfdb_{dataset}_{tolerance}.csv'):
-                print_error_no_evaluation(ds=dataset, alg='xqrs-wfdb', t=tolerance)
-            else:
-                results_df = pd.read_csv(f'output/perf/xqrs-wfdb_{dataset}_{tolerance}.csv', delimiter=',',
-                                         index_col=0)
-                global_eval = results_df.iloc[-1, 1:]
-                global_eval.name = 'xqrs-wfdb'
-                comparison_df = comparison_df.append(global_eval)
-                number_of_beats = results_df.iloc[-1, 0]
+                number_of_beats = global_results.loc[algo, 'nbofbeats']
+        evaluated_algorithms = [algo for algo in selected_algorithms if algo in global_results.index]
+        comparison_df = pd.concat([comparison_df, global_results.loc[evaluated_algorithms, comparison_df.columns]])
         st.write(f"Comparative table of global performances: ")
         st.write(comparison_df)
         st.write(f'Total number of beats for this dataset is : {number_of_beats}')
@@ -264,35 +267,15 @@ if application == 'Comparison of different algorithms':
         '''
         ## Comparison of performances of algorithms on different datasets
         '''
-        results_F1 = pd.DataFrame(columns=datasets_list, index=algorithms_list)
-        results_Fp = pd.DataFrame(columns=datasets_list, index=algorithms_list)
-        for algo in algorithms_list:
-            for dataset in datasets_list:
-                if os.path.exists(f'output/perf/{algo}_{dataset}_{tolerance}.csv'):
-                    results_df = pd.read_csv(f'output/perf/{algo}_{dataset}_{tolerance}.csv', delimiter=',')
-                    results_F1.loc[algo, dataset] = results_df.iloc[-1, -1]
-                    results_Fp.loc[algo, dataset] = results_df.iloc[-1, 5]
-                else:
-                    results_F1.loc[algo, dataset] = nan
-                    results_Fp.loc[algo, dataset] = nan
+        results_F1 = get_global_scores('F1(%)', tolerance, datasets_list)
+        results_Fp = get_global_scores('F(%)', tolerance, datasets_list)
         fig_F1 = go.Figure(
             layout=get_layout(f'F1 score of every algorithms for each dataset (tolerance={tolerance}ms)'))
         fig_Fp = go.Figure(layout=get_layout(f'Rate of detection failure of every algorithms for each dataset '
                                              f'(tolerance={tolerance}ms)'))
-        dict_algo_F1 = {}
-        dict_algo_Fp = {}
-        for algo in algorithms_list:
-            F1_series_algo = list(results_F1.loc[algo, :].dropna().astype(float))
-            mean_F1 = mean(F1_series_algo)
-            dict_algo_F1[algo] = mean_F1
-            Fp_series_algo = list(results_Fp.loc[algo, :].dropna().astype(float))
-            mean_Fp = mean(Fp_series_algo)
-            dict_algo_Fp[algo] = mean_Fp
-
-        dict_meanF1_sorted = dict(sorted(dict_algo_F1.items(), key=lambda t: t[1]))
-        dict_meanFp_sorted = dict(sorted(dict_algo_Fp.items(), key=lambda t: t[1]))
-
-        for algo in dict_meanF1_sorted.keys():
+
+        # algorithms are sorted by their mean score on the datasets
+        for algo in results_F1.mean(axis=1).sort_values().index:
             F1_algo = results_F1.loc[algo, :]
             fig_F1.add_trace(go.Histogram(x=datasets_list,
                                           y=F1_algo,
@@ -303,7 +286,7 @@ if application == 'Comparison of different algorithms':
                                  width=800,
                                  height=600)
 
-        for algo in dict_meanFp_sorted.keys():
+        for algo in results_Fp.mean(axis=1).sort_values().index:
             Fp_algo = results_Fp.loc[algo, :]
             fig_Fp.add_trace(go.Histogram(x=datasets_list,
                                           y=Fp_algo,
@@ -333,38 +316,34 @@ elif application == 'Evaluation of one algorithm':
     dataset = st.selectbox('Please choose a dataset:', datasets_list)
     algorithm = st.selectbox('Please choose an algorithm:', algorithms_list)
 
-    csv_files = glob.glob(f'output/perf/{algorithm}_{dataset}_*.csv')
-    json_files = glob.glob(f'output/perf/{algorithm}_{dataset}_*.json')
+    evaluation_results = query_performances(results_mtime, algorithm=algorithm, dataset=dataset)
 
-    if len(csv_files) == 0 or len(json_files) == 0:
+    if len(evaluation_results) == 0:
         print_error_no_evaluation(ds=dataset, alg=algorithm)
     else:
         # tables of performances
         if st.checkbox("Display performances' scores"):
-            for file in csv_files:
-                results_df = pd.read_csv(file, delimiter=',', index_col=0)
-                tolerance = file[:-4].split('_')[-1]
+            for tolerance, results_df in evaluation_results.groupby('tolerance'):
                 st.write(f"Evaluation's results for a tolerance of {tolerance} ms: ")
-                st.write(results_df)
+                st.write(results_df.set_index('record')[perf_columns])
         # histograms of delays
         if st.checkbox("Display delays' plots"):
             freq_sampling = sampling_frequency[dataset]
             st.write(f'Signals of this dataset ({dataset}) was sampled at {freq_sampling}Hz. It means that 1 second of '
                      f'recording corresponds to {freq_sampling} frames.')
-            id_records = list(records[dataset].keys())
+            id_records = list(records[dataset].keys()) + ['global']
             record_id = st.selectbox('Please choose the record', id_records)
-            for file in json_files:
-                with open(file) as json_delays:
-                    dict_delays = json.load(json_delays)
-                    tolerance = int(file[:-5].split('_')[-1])
-                    tolerance_fr = int((tolerance * 360 / 1000))
-                    plt.hist(dict_delays[record_id], range=(-tolerance_fr, tolerance_fr + 1), bins=2 * tolerance_fr,
-                             label=f'tolerance : {tolerance}ms')
-                    plt.xlabel('delay (nb of frames)')
-                    plt.ylabel('count of annotations detected with each delay')
-                    plt.title(f'Distribution of Delays for Record {record_id}')
-                    plt.legend()
-                    st.pyplot()
+            delay_histograms = query_delay_histograms(results_mtime, algorithm, dataset, record_id) \
+                .sort_values('tolerance')
+            st.write(delay_histograms.set_index('tolerance')[delay_statistics_columns])
+            for _, distribution in delay_histograms.iterrows():
+                plt.bar(numpy.arange(len(distribution['histogram'])) + distribution['first_delay'],
+                        distribution['histogram'], width=1, label=f'tolerance : {distribution["tolerance"]}ms')
+                plt.xlabel('delay (nb of frames)')
+                plt.ylabel('count of annotations detected with each delay')
+                plt.title(f'Distribution of Delays for Record {record_id}')
+                plt.legend()
+                st.pyplot()
 
 # third application
 elif application == 'Noise robustness':
@@ -376,13 +355,11 @@ elif application == 'Noise robustness':
     st.write('Impact of the electrode motion artefact')
 
     algorithm = st.selectbox('Please choose an algorithm:', algorithms_list)
-    csv_files_noise_stress = glob.glob(f'output/perf/{algorithm}_mit-bih-noise-stress-test-*_*.csv')
-    tolerance_list = []
-    for file in csv_files_noise_stress:
-        eval_tolerance = file[:-4].split('_')[-1]
-        tolerance_list.append(eval_tolerance)
-    tolerance = st.selectbox('Please choose tolerance of the evaluation (in ms):', list(set(tolerance_list)))
-    csv_files = [csv_file for csv_file in csv_files_noise_stress if csv_file[:-4].split('_')[-1] == tolerance]
+    SNR_list = ['_6', '00', '06', '12', '18', '24']
+    noise_datasets = [f'mit-bih-noise-stress-test-e{snr}' for snr in SNR_list]
+    noise_results = query_performances(results_mtime, algorithm=algorithm, dataset=noise_datasets)
+    tolerance = st.selectbox('Please choose tolerance of the evaluation (in ms):',
+                             sorted(noise_results['tolerance'].unique()))
 
     st.write('Indexes (IDeSNR) correspond to the ID of the record and its SNR during the "noisy segments" in dB. The '
              'record without added noise belongs to the MIT-BIH arrhythmia database.'
@@ -392,34 +369,23 @@ elif application == 'Noise robustness':
     st.write(f'\t make evaluation --DATASET="mit-bih-noise-stress-test-e#SNR" --ALGO="{algorithm}" '
              f'--TOLERANCE={tolerance}')
     # tables of performances
-    comparison_df_118 = pd.DataFrame(columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    comparison_df_119 = pd.DataFrame(columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    if os.path.exists(f'output/perf/{algorithm}_mit-bih-arrhythmia_{tolerance}.csv'):
-        df_without_noise = pd.read_csv(f'output/perf/{algorithm}_mit-bih-arrhythmia_{tolerance}.csv', delimiter=',',
-                                       index_col=0)
-        comparison_df_118 = comparison_df_118.append(df_without_noise.loc['118', :])
-        comparison_df_119 = comparison_df_119.append(df_without_noise.loc['119', :])
-    for csv_file in csv_files:
-        results_df = pd.read_csv(csv_file, delimiter=',', index_col=0)
-        comparison_df_118 = comparison_df_118.append(results_df.iloc[0, :])
-        comparison_df_119 = comparison_df_119.append(results_df.iloc[1, :])
-    st.write(comparison_df_118)
-    st.write(comparison_df_119)
+    comparison_dfs = []
+    for id_rec in ['118', '119']:
+        # the record without noise is followed by its noisy versions, from the lowest to the highest SNR
+        ids_records = [id_rec] + [f'{id_rec}e{snr}' for snr in SNR_list]
+        comparison_df = query_performances(results_mtime, algorithm=algorithm,
+                                           dataset=['mit-bih-arrhythmia'] + noise_datasets, tolerance=tolerance,
+                                           record=ids_records).set_index('record')
+        ids_evaluated = [record_id for record_id in ids_records if record_id in comparison_df.index]
+        comparison_dfs.append(comparison_df.loc[ids_evaluated, perf_columns])
+    st.write(comparison_dfs[0])
+    st.write(comparison_dfs[1])
 
     # graphs of performances
-    SNR_list = ['_6', '00', '06', '12', '18', '24']
-    results_F1 = pd.DataFrame(columns=SNR_list, index=algorithms_list)
-    results_Fp = pd.DataFrame(columns=SNR_list, index=algorithms_list)
-    for algo in algorithms_list:
-        for snr in SNR_list:
-            dataset = f"mit-bih-noise-stress-test-e{snr}"
-            if os.path.exists(f'output/perf/{algo}_{dataset}_{tolerance}.csv'):
-                results_df = pd.read_csv(f'output/perf/{algo}_{dataset}_{tolerance}.csv', delimiter=',')
-                results_F1.loc[algo, snr] = results_df.iloc[-1, -1]
-                results_Fp.loc[algo, snr] = results_df.iloc[-1, 5]
-            else:
-                results_F1.loc[algo, snr] = nan
-                results_Fp.loc[algo, snr] = nan
+    results_F1 = get_global_scores('F1(%)', tolerance, noise_datasets)
+    results_Fp = get_global_scores('F(%)', tolerance, noise_datasets)
+    results_F1.columns = SNR_list
+    results_Fp.columns = SNR_list
     fig_F1 = go.Figure(layout=get_layout(f'F1 score of every algorithms for each value of SNR '
                                          f'(tolerance={tolerance}ms)'))
     fig_Fp = go.Figure(layout=get_layout(f'Rate of detection failure of every algorithms for each value of SNR'
@@ -449,3 +415,54 @@ elif application == 'Noise robustness':
                              height=600)
     st.plotly_chart(fig_F1)
     st.plotly_chart(fig_Fp)
+
+# fourth application
+elif application == 'Speed and accuracy':
+    st.write('\n\n')
+    '''
+    ## Comparison of speed, memory and accuracy of algorithms
+    '''
+    st.write('\n\n')
+
+    dataset = st.selectbox('Please choose a dataset:', list(records.keys()))
+    dataset_results = query_performances(results_mtime, dataset=dataset, record='global')
+    tolerance = st.selectbox('Please choose tolerance of the evaluation (in ms):',
+                             sorted(dataset_results['tolerance'].unique()))
+    speed_accuracy = get_speed_accuracy(dataset, tolerance)
+
+    if len(speed_accuracy) == 0:
+        st.write('Speed and memory of detections are measured when the detection is profiled. Please compute the '
+                 'following commands :')
+        st.write(f'\t python perform_detection.py --data {dataset} --algo "#check --help#" --profile --trace-memory')
+        st.write(f'\t make evaluation --DATASET="{dataset}" --ALGO="#check --help#" --TOLERANCE={tolerance}')
+    else:
+        st.write('Throughput is the number of samples processed per second of wall time (on one core), CPU time and '
+                 'peak memory are measured during the detection of each channel. Peak memory is only measured with '
+                 'PROFILE=memory.')
+        st.write(speed_accuracy)
+        for cost_column, lower_is_better in [('samples/s', False), ('peak memory (MB)', True)]:
+            # peak memory is only measured when allocations were traced
+            cost_accuracy = speed_accuracy.dropna(subset=[cost_column])
+            if len(cost_accuracy) == 0:
+                continue
+            pareto_front = get_pareto_front(cost_accuracy, cost_column, lower_is_better)
+            fig_pareto = go.Figure(layout=get_layout(f'F1 score and {cost_column} of every algorithm '
+                                                     f'(tolerance={tolerance}ms)'))
+            for algo in cost_accuracy.index:
+                fig_pareto.add_trace(go.Scatter(x=[cost_accuracy.loc[algo, cost_column]],
+                                                y=[cost_accuracy.loc[algo, 'F1(%)']],
+                                                mode='markers',
+                                                marker=dict(size=12, color=colormap[algo]),
+                                                name=algo))
+            fig_pareto.add_trace(go.Scatter(x=pareto_front[cost_column],
+                                            y=pareto_front['F1(%)'],
+                                            mode='lines',
+                                            line=dict(width=2, color='black', dash='dot'),
+                                            name='Pareto front'))
+            fig_pareto.update_layout(autosize=False,
+                                     xaxis_type='log',
+                                     xaxis_title=cost_column,
+                                     yaxis_title='F1(%)',
+                                     width=800,
+                                     height=600)
+            st.plotly_chart(fig_pareto)
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """This script provides lists of available databases, of their records and their channels, their sampling frequency and
-methods to read files from Physionet."""
+methods to read files from Physionet. Datasets are described in a registry from which new generators of records can be
+obtained at any time, for every record or a selection of them. Signals are read through the cache of cache_helper, so
+that WFDB files are decoded only once, as physical values in float64 or float32 or as digital samples with their
+calibration."""
 
 import wfdb
 import pandas as pd
 import numpy
-from typing import Generator, Dict, Tuple
+from typing import Generator, Dict, List, NamedTuple, Optional, Tuple
+from cache_helper import signal_dtypes, SignalCalibration, read_record_signals, read_record_array, \
+    read_record_windows, read_record_calibration
 
 data_path = 'data'
 
@@ -70,21 +75,6 @@ mit_bih_arrhythmia = {
 }
 
 
-def read_mit_bih_arrhythmia() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records from MIT BIH Arrhythmia Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-arrhythmia-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-arrhythmia-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
 
 # MIT-BIH Noise stress test Database
 # records and their channels
@@ -119,108 +109,6 @@ mit_bih_noise_stress_test_e_6 = {
 }
 
 
-def read_mit_bih_noise_e24() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR 24dB from MIT BIH Noise Stress Test Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e24') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
-def read_mit_bih_noise_e18() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR 18dB from MIT BIH Noise Stress Test Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e18') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
-def read_mit_bih_noise_e12() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR 12dB from MIT BIH Noise Stress Test Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e12') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
-def read_mit_bih_noise_e06() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR 6dB from MIT BIH Noise Stress Test Database
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e06') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
-def read_mit_bih_noise_e00() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR 0dB from MIT BIH Noise Stress Test Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e00') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
-def read_mit_bih_noise_e_6() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records with SNR -6dB from MIT BIH Noise Stress Test Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    rec_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    records_list = [record_id for record_id in rec_list['id'] if record_id.find('e_6') != -1]
-    for record_id in records_list:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
-
 # European ST-T Database
 # records and their channels
 european_stt = {
@@ -317,21 +205,6 @@ european_stt = {
 }
 
 
-def read_european_stt() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records from European ST-T Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/european-stt-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        record = wfdb.rdrecord(f'{data_path}/european-stt-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
 
 # MIT-BIH Supraventricular Arrhythmia Database
 # records and their channels
@@ -417,21 +290,6 @@ mit_bih_supraventricular_arrhythmia = {
 }
 
 
-def read_mit_bih_supraventricular_arrhythmia() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
-    """
-    read records from MIT BIH Supraventricular Arrhythmia Database.
-
-    :return: ID and values of sampled signals for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-supraventricular-arrhythmia-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-supraventricular-arrhythmia-database/{record_id}')
-        yield record_id, {
-            record.sig_name[0]: record.p_signal[:, 0],
-            record.sig_name[1]: record.p_signal[:, 1]
-        }
-
 
 # MIT-BIH Long Term Database
 # records and their channels
@@ -446,61 +304,183 @@ mit_bih_long_term = {
 }
 
 
-def read_mit_bih_long_term() -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
+
+
+class DatasetDescriptor(NamedTuple):
+    """
+    description of a dataset: folder of its database in data_path, substring which selects its records among those of
+    the database ('' for every record), names of its records and their channels and sampling frequency of signals.
     """
-    read records from MIT BIH Long Term ECG Database.
+    database: str
+    record_filter: str
+    channels: Dict[str, List[str]]
+    fs: int
+
+
+# registry of datasets
+dataset_descriptors = {
+    'mit-bih-arrhythmia': DatasetDescriptor('mit-bih-arrhythmia-database', '', mit_bih_arrhythmia, 360),
+    'mit-bih-noise-stress-test-e24': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e24',
+                                                       mit_bih_noise_stress_test_e24, 360),
+    'mit-bih-noise-stress-test-e18': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e18',
+                                                       mit_bih_noise_stress_test_e18, 360),
+    'mit-bih-noise-stress-test-e12': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e12',
+                                                       mit_bih_noise_stress_test_e12, 360),
+    'mit-bih-noise-stress-test-e06': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e06',
+                                                       mit_bih_noise_stress_test_e06, 360),
+    'mit-bih-noise-stress-test-e00': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e00',
+                                                       mit_bih_noise_stress_test_e00, 360),
+    'mit-bih-noise-stress-test-e_6': DatasetDescriptor('mit-bih-noise-stress-test-database', 'e_6',
+                                                       mit_bih_noise_stress_test_e_6, 360),
+    'european-stt': DatasetDescriptor('european-stt-database', '', european_stt, 250),
+    'mit-bih-supraventricular-arrhythmia': DatasetDescriptor('mit-bih-supraventricular-arrhythmia-database', '',
+                                                             mit_bih_supraventricular_arrhythmia, 128),
+    'mit-bih-long-term-ecg': DatasetDescriptor('mit-bih-long-term-ecg-database', '', mit_bih_long_term, 128)
+}
+
+# names of records and their channels
+records = {dataset: descriptor.channels for dataset, descriptor in dataset_descriptors.items()}
+
+# folders of databases (in data_path) corresponding to each dataset
+database_folders = {dataset: descriptor.database for dataset, descriptor in dataset_descriptors.items()}
 
+# value of signals' sampling frequency
+sampling_frequency = {dataset: descriptor.fs for dataset, descriptor in dataset_descriptors.items()}
+
+
+def get_record_ids(dataset: str, record_ids: Optional[List[str]] = None, resume_from: Optional[str] = None) \
+        -> List[str]:
+    """
+    get IDs of records of a dataset, in the order of the RECORDS file of its database.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_ids: IDs of the records to select (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param resume_from: ID of the record from which to start (included), to resume an interrupted run
+    :type resume_from: str
+    :return: IDs of the selected records
+    :rtype: list(str)
+    """
+    descriptor = dataset_descriptors[dataset]
+    with open(f'{data_path}/{descriptor.database}/RECORDS') as records_file:
+        database_records = records_file.read().split()
+    dataset_records = [record_id for record_id in database_records
+                       if descriptor.record_filter in record_id and record_id in descriptor.channels]
+    if record_ids is not None:
+        unknown_records = set(map(str, record_ids)).difference(dataset_records)
+        if len(unknown_records) > 0:
+            raise ValueError(f'Sorry... unknown records {sorted(unknown_records)} for dataset {dataset}')
+        dataset_records = [record_id for record_id in dataset_records if record_id in set(map(str, record_ids))]
+    if resume_from is not None:
+        dataset_records = dataset_records[dataset_records.index(str(resume_from)):]
+    return dataset_records
+
+
+def iter_dataset(dataset: str, record_ids: Optional[List[str]] = None, resume_from: Optional[str] = None,
+                 dtype: str = 'float64') -> Generator[Tuple[str, Dict[str, numpy.ndarray]], None, None]:
+    """
+    read records of a dataset. Each call gives a new generator, and only selected records are read.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param resume_from: ID of the record from which to start (included), to resume an interrupted run
+    :type resume_from: str
+    :param dtype: dtype of the values, among signal_dtypes (see get_record_calibration for digital samples)
+    :type dtype: str
     :return: ID and values of sampled signals for each record
     :rtype: tuple(str, dict(str, ndarray))
     """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-long-term-ecg-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        record = wfdb.rdrecord(f'{data_path}/mit-bih-long-term-ecg-database/{record_id}')
-        record_sigs = {}
-        for id_sig in range(len(record.sig_name)):
-            record_sigs[record.sig_name[id_sig]] = record.p_signal[:, id_sig]
-        yield record_id, record_sigs
-
-
-# generator for records' readers
-dataset_generators = {
-    'mit-bih-arrhythmia': read_mit_bih_arrhythmia(),
-    'mit-bih-noise-stress-test-e24': read_mit_bih_noise_e24(),
-    'mit-bih-noise-stress-test-e18': read_mit_bih_noise_e18(),
-    'mit-bih-noise-stress-test-e12': read_mit_bih_noise_e12(),
-    'mit-bih-noise-stress-test-e06': read_mit_bih_noise_e06(),
-    'mit-bih-noise-stress-test-e00': read_mit_bih_noise_e00(),
-    'mit-bih-noise-stress-test-e_6': read_mit_bih_noise_e_6(),
-    'european-stt': read_european_stt(),
-    'mit-bih-supraventricular-arrhythmia': read_mit_bih_supraventricular_arrhythmia(),
-    'mit-bih-long-term-ecg': read_mit_bih_long_term()
-}
+    database = dataset_descriptors[dataset].database
+    for record_id in get_record_ids(dataset, record_ids, resume_from):
+        yield record_id, read_record_signals(database, record_id, dtype=dtype)
 
 
-# generator to get names of records and their channels
-records = {
-    'mit-bih-arrhythmia': mit_bih_arrhythmia,
-    'mit-bih-noise-stress-test-e24': mit_bih_noise_stress_test_e24,
-    'mit-bih-noise-stress-test-e18': mit_bih_noise_stress_test_e18,
-    'mit-bih-noise-stress-test-e12': mit_bih_noise_stress_test_e12,
-    'mit-bih-noise-stress-test-e06': mit_bih_noise_stress_test_e06,
-    'mit-bih-noise-stress-test-e00': mit_bih_noise_stress_test_e00,
-    'mit-bih-noise-stress-test-e_6': mit_bih_noise_stress_test_e_6,
-    'european-stt': european_stt,
-    'mit-bih-supraventricular-arrhythmia': mit_bih_supraventricular_arrhythmia,
-    'mit-bih-long-term-ecg': mit_bih_long_term
-}
+def iter_dataset_arrays(dataset: str, record_ids: Optional[List[str]] = None, resume_from: Optional[str] = None,
+                        dtype: str = 'float64') -> Generator[Tuple[str, List[str], numpy.ndarray], None, None]:
+    """
+    read records of a dataset as 2-D arrays (samples x channels), to process every channel of a record at once.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param resume_from: ID of the record from which to start (included), to resume an interrupted run
+    :type resume_from: str
+    :param dtype: dtype of the values, among signal_dtypes (see get_record_calibration for digital samples)
+    :type dtype: str
+    :return: ID of the record, names of its channels and values of sampled signals (one column per channel)
+    :rtype: tuple(str, list(str), ndarray)
+    """
+    database = dataset_descriptors[dataset].database
+    for record_id in get_record_ids(dataset, record_ids, resume_from):
+        sig_names, p_signal = read_record_array(database, record_id,
+                                                channels=list(range(len(records[dataset][record_id]))), dtype=dtype)
+        yield record_id, sig_names, p_signal
 
-# generator for value of signals' sampling frequency
-sampling_frequency = {
-    'mit-bih-arrhythmia': 360,
-    'mit-bih-noise-stress-test-e24': 360,
-    'mit-bih-noise-stress-test-e18': 360,
-    'mit-bih-noise-stress-test-e12': 360,
-    'mit-bih-noise-stress-test-e06': 360,
-    'mit-bih-noise-stress-test-e00': 360,
-    'mit-bih-noise-stress-test-e_6': 360,
-    'european-stt': 250,
-    'mit-bih-supraventricular-arrhythmia': 128,
-    'mit-bih-long-term-ecg': 128
-}
+
+def iter_dataset_windows(dataset: str, window_size: int, overlap: int, record_ids: Optional[List[str]] = None,
+                         resume_from: Optional[str] = None, dtype: str = 'float64') \
+        -> Generator[Tuple[str, str, int, numpy.ndarray], None, None]:
+    """
+    read records of a dataset by overlapping windows of each channel, without loading entire records in memory.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param window_size: number of samples of each window
+    :type window_size: int
+    :param overlap: number of samples shared by two consecutive windows
+    :type overlap: int
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param resume_from: ID of the record from which to start (included), to resume an interrupted run
+    :type resume_from: str
+    :param dtype: dtype of the values, among signal_dtypes (see get_record_calibration for digital samples)
+    :type dtype: str
+    :return: ID of the record, name of the channel, index of the first sample of the window and values of the window
+    :rtype: tuple(str, str, int, ndarray)
+    """
+    database = dataset_descriptors[dataset].database
+    for record_id in get_record_ids(dataset, record_ids, resume_from):
+        for sig_name, start, window in read_record_windows(database, record_id, window_size, overlap, dtype=dtype):
+            yield record_id, sig_name, start, window
+
+
+def read_record_channel(dataset: str, record_id: str, sig_name: str, dtype: str = 'float64') -> numpy.ndarray:
+    """
+    read only one channel of one record of a dataset, without decoding the other channels.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_name: name of the channel to read
+    :type sig_name: str
+    :param dtype: dtype of the values, among signal_dtypes (see get_record_calibration for digital samples)
+    :type dtype: str
+    :return: values of the sampled signal of the channel
+    :rtype: ndarray
+    """
+    id_sig = records[dataset][str(record_id)].index(sig_name)
+    return read_record_signals(database_folders[dataset], record_id, channels=[id_sig], dtype=dtype)[sig_name]
+
+
+def get_record_calibration(dataset: str, record_id: str, sig_names: Optional[List[str]] = None) -> SignalCalibration:
+    """
+    get the calibration of channels of a record of a dataset, to convert their digital samples (read with dtype
+    'digital') to physical units.
+
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_names: names of the channels (every channel of the record in the dataset if None)
+    :type sig_names: list(str)
+    :return: calibration of the channels, in the given order
+    :rtype: SignalCalibration
+    """
+    record_channels = records[dataset][str(record_id)]
+    channels = [record_channels.index(sig_name) for sig_name in (record_channels if sig_names is None else sig_names)]
+    return read_record_calibration(database_folders[dataset], record_id, channels)
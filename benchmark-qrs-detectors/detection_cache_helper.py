@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a persistent cache of QRS detections for each unit (algorithm, record, channel). The results of
+a unit are saved as soon as it is performed, in a .npy file named by a key computed from the algorithm, its parameters,
+the version of its library, the record, the channel, a hash of the values of the signal (and their calibration for
+digital samples) and the sampling frequency at which the signal is resampled, if any. A unit whose key was already
+computed is not performed again: an interrupted detection resumes where it stopped, and changing a parameter of an
+algorithm only reruns the units of this algorithm."""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy
+from typing import Dict, List, Optional
+
+from algo_helper import run_algo, run_algo_multichannel, get_algo_params, get_algo_version
+from profiling_helper import profile_run_algo
+from cache_helper import SignalCalibration
+
+detection_cache_path = 'output/cache/detections'
+
+
+def get_signal_hash(sig: numpy.ndarray) -> str:
+    """
+    compute a hash of the values of a sampled signal and of their dtype (the same bytes give other values in another
+    dtype).
+
+    :param sig: values of the sampled signal
+    :type sig: ndarray
+    :return: hash of the signal
+    :rtype: str
+    """
+    signal_hash = hashlib.sha1(numpy.dtype(sig.dtype).str.encode())
+    signal_hash.update(numpy.ascontiguousarray(sig).view(numpy.uint8))
+    return signal_hash.hexdigest()
+
+
+def get_detection_key(algorithm: str, freq_sampling: int, record_id: str, sig_name: str, signal_hash: str,
+                      target_frequency: Optional[int] = None, calibration: Optional[SignalCalibration] = None) -> str:
+    """
+    compute the key of the detections of an algorithm on one channel of a record.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_name: name of the channel
+    :type sig_name: str
+    :param signal_hash: hash of the values of the signal
+    :type signal_hash: str
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (None
+    if it is not resampled)
+    :type target_frequency: int
+    :param calibration: calibration of the signal if it holds digital samples (None for physical values)
+    :type calibration: SignalCalibration
+    :return: key of the unit
+    :rtype: str
+    """
+    unit = [algorithm, get_algo_params(algorithm), get_algo_version(algorithm), freq_sampling, str(record_id),
+            sig_name, signal_hash]
+    if target_frequency is not None and target_frequency != freq_sampling:
+        unit.append(target_frequency)
+    if calibration is not None:
+        unit.append([calibration.adc_gain, calibration.baseline])
+    return hashlib.sha1(json.dumps(unit, sort_keys=True).encode()).hexdigest()
+
+
+def read_cached_detections(algorithm: str, key: str) -> Optional[List[int]]:
+    """
+    read the cached detections of a unit.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param key: key of the unit
+    :type key: str
+    :return: localisations of qrs detections (None if the unit is not cached)
+    :rtype: list(int)
+    """
+    cache_file = f'{detection_cache_path}/{algorithm}/{key}.npy'
+    if not os.path.exists(cache_file):
+        return None
+    return [int(frame) for frame in numpy.load(cache_file)]
+
+
+def write_cached_detections(algorithm: str, key: str, qrs_frames: List[int]) -> None:
+    """
+    save the detections of a unit in the cache. The file is written under a temporary name and then renamed, so that
+    an interrupted write never leaves a partial result.
+
+    :param algorithm: name of the qrs detector
+    :type algorithm: str
+    :param key: key of the unit
+    :type key: str
+    :param qrs_frames: localisations of qrs detections
+    :type qrs_frames: list(int)
+    """
+    os.makedirs(f'{detection_cache_path}/{algorithm}', exist_ok=True)
+    tmp_file = f'{detection_cache_path}/{algorithm}/{key}.tmp-{os.getpid()}.npy'
+    numpy.save(tmp_file, numpy.asarray(qrs_frames, dtype=numpy.int64))
+    os.replace(tmp_file, f'{detection_cache_path}/{algorithm}/{key}.npy')
+
+
+def run_algo_cached(algorithm: str, sig: numpy.ndarray, freq_sampling: int, record_id: str, sig_name: str,
+                    profiles: Optional[List[Dict]] = None, trace_memory: bool = False,
+                    target_frequency: Optional[int] = None, calibration: Optional[SignalCalibration] = None) \
+        -> List[int]:
+    """
+    run a qrs detector on one channel of a record, or read its detections from the cache if this unit was already
+    performed on the same signal with the same parameters and library version. To profile the detection, the unit is
+    performed even if it is cached and its measures (see profile_run_algo) are added to profiles.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sig: values of the sampled signal to study
+    :type sig: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_name: name of the channel
+    :type sig_name: str
+    :param profiles: list where measures of the detection are added (no profiling if None)
+    :type profiles: list(dict)
+    :param trace_memory: also measure the peak of memory allocated during the detection when it is profiled
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param calibration: calibration of the signal, required if sig holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections
+    :rtype: list(int)
+    """
+    key = get_detection_key(algorithm, freq_sampling, record_id, sig_name, get_signal_hash(sig), target_frequency,
+                            calibration)
+    if profiles is not None:
+        qrs_frames, profile = profile_run_algo(algorithm, sig, freq_sampling, trace_memory, target_frequency,
+                                               calibration)
+        profiles.append({'record': str(record_id), 'channel': sig_name, 'sampling_frequency': freq_sampling,
+                         **profile})
+        write_cached_detections(algorithm, key, qrs_frames)
+        return qrs_frames
+    qrs_frames = read_cached_detections(algorithm, key)
+    if qrs_frames is None:
+        qrs_frames = run_algo(algorithm, sig, freq_sampling, target_frequency, calibration)
+        write_cached_detections(algorithm, key, qrs_frames)
+    return qrs_frames
+
+
+def run_algo_multichannel_cached(algorithm: str, sigs: numpy.ndarray, freq_sampling: int, record_id: str,
+                                 sig_names: List[str], profiles: Optional[List[Dict]] = None,
+                                 trace_memory: bool = False, target_frequency: Optional[int] = None,
+                                 calibration: Optional[SignalCalibration] = None) -> Dict[str, List[int]]:
+    """
+    run a qrs detector on every channel of a record at once with run_algo_multichannel, except on channels whose
+    detections are already cached. To profile the detection, channels are processed one by one with run_algo_cached so
+    that each channel is measured.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sigs: values of sampled signals to study (one column per channel)
+    :type sigs: ndarray
+    :param freq_sampling: value of sampling frequency of the signals
+    :type freq_sampling: int
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_names: names of the channels, in the order of the columns
+    :type sig_names: list(str)
+    :param profiles: list where measures of the detection of each channel are added (no profiling if None)
+    :type profiles: list(dict)
+    :param trace_memory: also measure the peak of memory allocated during the detection when it is profiled
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which signals are resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param calibration: calibration of each column, required if sigs holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections for each channel
+    :rtype: dict(str, list(int))
+    """
+    calibrations = [None if calibration is None else calibration.select([id_sig]) for id_sig in range(len(sig_names))]
+    if profiles is not None:
+        return {sig_name: run_algo_cached(algorithm, sigs[:, id_sig], freq_sampling, record_id, sig_name, profiles,
+                                          trace_memory, target_frequency, calibrations[id_sig])
+                for id_sig, sig_name in enumerate(sig_names)}
+    keys = [get_detection_key(algorithm, freq_sampling, record_id, sig_name, get_signal_hash(sigs[:, id_sig]),
+                              target_frequency, calibrations[id_sig]) for id_sig, sig_name in enumerate(sig_names)]
+    detections = [read_cached_detections(algorithm, key) for key in keys]
+    missing_sigs = [id_sig for id_sig, qrs_frames in enumerate(detections) if qrs_frames is None]
+    if len(missing_sigs) > 0:
+        missing_columns = sigs if len(missing_sigs) == len(sig_names) else sigs[:, missing_sigs]
+        missing_calibration = None if calibration is None else calibration.select(missing_sigs)
+        missing_detections = run_algo_multichannel(algorithm, missing_columns, freq_sampling, target_frequency,
+                                                   missing_calibration)
+        for id_sig, qrs_frames in zip(missing_sigs, missing_detections):
+            write_cached_detections(algorithm, keys[id_sig], qrs_frames)
+            detections[id_sig] = qrs_frames
+    return dict(zip(sig_names, detections))
+
+
+def clear_detection_cache(algorithm: Optional[str] = None) -> None:
+    """
+    remove cached detections of an algorithm, or of every algorithm.
+
+    :param algorithm: name of the qrs detector (every algorithm if None)
+    :type algorithm: str
+    """
+    shutil.rmtree(detection_cache_path if algorithm is None else f'{detection_cache_path}/{algorithm}',
+                  ignore_errors=True)
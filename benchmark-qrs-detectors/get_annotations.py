@@ -1,137 +1,100 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """This script gets beats annotations of specialists from the chosen dataset. Obtained results (localisations of QRS for
- each record of the entire dataset) are saved in json files."""
+ each record of the entire dataset) are saved in binary files (or exported in json files) thanks to storage_helper."""
 
-import json
-import os
 import click
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+from wfdb.io.annotation import ann_label_table
 
 from dataset_helper import *
+from storage_helper import storage_formats, write_annotations
 
 data_path = 'data'
+# number of threads reading annotation files at the same time
+annotation_read_workers = 8
 
 # annotations corresponding to beats so related to QRS complexes' localisations
 mit_beat_labels = ['N', 'L', 'R', 'B', 'A', 'a', 'J', 'S', 'V', 'r', 'F', 'e', 'j', 'n', 'E', '/', 'f', 'Q', '?']
+# boolean lookup indexed by the label codes stored in annotation files (label_store of wfdb): True for beat labels
+beat_label_lookup = numpy.zeros(int(ann_label_table['label_store'].max()) + 1, dtype=bool)
+beat_label_lookup[ann_label_table.loc[ann_label_table['symbol'].isin(mit_beat_labels), 'label_store'].to_numpy()] = True
 
 
-def get_annotations_mit_bih_arrhythmia() -> Generator[Tuple[str, List[int]], None, None]:
+@lru_cache(maxsize=None)
+def read_beat_annotations(database: str, record_id: str) -> numpy.ndarray:
     """
-    read annotations of records from MIT BIH Arrhythmia Database and select those related to beat information.
-
-    :return: ID and localisations of QRS complexes for each record
-    :rtype: tuple(str, dict(str, ndarray))
+    read annotations of a record and select those related to beat information, by looking up their stored label codes
+    in beat_label_lookup instead of converting them to symbols (codes missing from the lookup are not beats). Results
+    are cached by physical database and record, so that datasets sharing a database never read the same annotation
+    file twice.
+
+    :param database: name of the folder of the database in data_path
+    :type database: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :return: localisations of QRS complexes of the record (read-only)
+    :rtype: ndarray
     """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-arrhythmia-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        annotation = wfdb.rdann(f'{data_path}/mit-bih-arrhythmia-database/{record_id}', 'atr')
-        annot_serie = pd.Series(annotation.symbol, index=annotation.sample, name="annotations")
-        qrs_annotations = annot_serie.iloc[:].loc[annot_serie.isin(mit_beat_labels)]
-        frames_annotations_list = qrs_annotations.index.tolist()
-        yield record_id, frames_annotations_list
-
-
-def get_annotations_mit_bih_noise() -> Generator[Tuple[str, List[int]], None, None]:
+    annotation = wfdb.rdann(f'{data_path}/{database}/{record_id}', 'atr', return_label_elements=['label_store'])
+    label_store = numpy.asarray(annotation.label_store)
+    # codes outside the table of wfdb (custom labels) are not beats
+    is_beat = numpy.zeros(len(label_store), dtype=bool)
+    valid = label_store < len(beat_label_lookup)
+    is_beat[valid] = beat_label_lookup[label_store[valid]]
+    frames_annotations = numpy.asarray(annotation.sample)[is_beat]
+    frames_annotations.setflags(write=False)
+    return frames_annotations
+
+
+def iter_annotations(dataset: str, record_ids: Optional[List[str]] = None, resume_from: Optional[str] = None) \
+        -> Generator[Tuple[str, List[int]], None, None]:
     """
-    read annotations of records from MIT BIH Noise Stress Test Database and select those related to beat information.
-
-    :return: ID and localisations of QRS complexes for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-noise-stress-test-database/RECORDS', names=['id'])
-    for record_id in records_list['id'][:-3]:
-        annotation = wfdb.rdann(f'{data_path}/mit-bih-noise-stress-test-database/{record_id}', 'atr')
-        annot_serie = pd.Series(annotation.symbol, index=annotation.sample, name="annotations")
-        qrs_annotations = annot_serie.iloc[:].loc[annot_serie.isin(mit_beat_labels)]
-        frames_annotations_list = qrs_annotations.index.tolist()
-        yield record_id, frames_annotations_list
-
-
-def get_annotations_european_stt() -> Generator[Tuple[str, List[int]], None, None]:
-    """
-    read annotations of records from European STT Database and select those related to beat information.
-
-    :return: ID and localisations of QRS complexes for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/european-stt-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        annotation = wfdb.rdann(f'{data_path}/european-stt-database/{record_id}', 'atr')
-        annot_serie = pd.Series(annotation.symbol, index=annotation.sample, name="annotations")
-        qrs_annotations = annot_serie.iloc[:].loc[annot_serie.isin(mit_beat_labels)]
-        frames_annotations_list = qrs_annotations.index.tolist()
-        yield record_id, frames_annotations_list
-
-
-def get_annotations_mit_bih_supraventricular_arrhythmia() -> Generator[Tuple[str, List[int]], None, None]:
-    """
-    read annotations of records from MIT BIH Supraventricular Arrhythmia Database and select those related to beat
-    information.
+    read annotations of records of a dataset and select those related to beat information. Each call gives a new
+    generator, and only selected records are read. Annotation files are read by annotation_read_workers threads, and
+    records are given in the order of the dataset.
 
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param resume_from: ID of the record from which to start (included), to resume an interrupted run
+    :type resume_from: str
     :return: ID and localisations of QRS complexes for each record
-    :rtype: tuple(str, dict(str, ndarray))
+    :rtype: tuple(str, list(int))
     """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-supraventricular-arrhythmia-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        annotation = wfdb.rdann(f'{data_path}/mit-bih-supraventricular-arrhythmia-database/{record_id}', 'atr')
-        annot_serie = pd.Series(annotation.symbol, index=annotation.sample, name="annotations")
-        qrs_annotations = annot_serie.iloc[:].loc[annot_serie.isin(mit_beat_labels)]
-        frames_annotations_list = qrs_annotations.index.tolist()
-        yield record_id, frames_annotations_list
-
+    database = dataset_descriptors[dataset].database
+    records_ids = get_record_ids(dataset, record_ids, resume_from)
+    with ThreadPoolExecutor(max_workers=annotation_read_workers) as executor:
+        for record_id, frames_annotations in zip(records_ids, executor.map(
+                lambda record_id: read_beat_annotations(database, record_id), records_ids)):
+            yield record_id, frames_annotations.tolist()
 
-def get_annotations_mit_bih_long_term() -> Generator[Tuple[str, List[int]], None, None]:
-    """
-    read annotations of records from MIT BIH Long Term ECG Database and select those related to beat information.
 
-    :return: ID and localisations of QRS complexes for each record
-    :rtype: tuple(str, dict(str, ndarray))
-    """
-    records_list = pd.read_csv(f'{data_path}/mit-bih-long-term-ecg-database/RECORDS', names=['id'])
-    for record_id in records_list['id']:
-        annotation = wfdb.rdann(f'{data_path}/mit-bih-long-term-ecg-database/{record_id}', 'atr')
-        annot_serie = pd.Series(annotation.symbol, index=annotation.sample, name="annotations")
-        qrs_annotations = annot_serie.iloc[:].loc[annot_serie.isin(mit_beat_labels)]
-        frames_annotations_list = qrs_annotations.index.tolist()
-        yield record_id, frames_annotations_list
-
-
-# generator of annotations' readers
-dataset_annot_generators = {
-    'mit-bih-arrhythmia': get_annotations_mit_bih_arrhythmia(),
-    'mit-bih-noise-stress-test-e24': get_annotations_mit_bih_noise(),
-    'mit-bih-noise-stress-test-e18': get_annotations_mit_bih_noise(),
-    'mit-bih-noise-stress-test-e12': get_annotations_mit_bih_noise(),
-    'mit-bih-noise-stress-test-e06': get_annotations_mit_bih_noise(),
-    'mit-bih-noise-stress-test-e00': get_annotations_mit_bih_noise(),
-    'mit-bih-noise-stress-test-e_6': get_annotations_mit_bih_noise(),
-    'european-stt': get_annotations_european_stt(),
-    'mit-bih-supraventricular-arrhythmia': get_annotations_mit_bih_supraventricular_arrhythmia(),
-    'mit-bih-long-term-ecg': get_annotations_mit_bih_long_term()
-}
-
-
-def write_annotations_json(dataset: str, dict_annotations: Dict[str, List[int]]) -> None:
+def get_annotations_dataset(dataset: str, record_ids: Optional[List[str]] = None) -> Dict[str, List[int]]:
     """
-    write localisations of beat annotations from a dictionary in a json file.
+    recover beat annotations of every record of a dataset.
 
     :param dataset: name of the studied dataset
     :type dataset: str
-    :param dict_annotations: localisations of beat annotations for each record of the dataset
-    :type dict_annotations: dict(str, list(int)
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :return: localisations of beat annotations for each record of the dataset
+    :rtype: dict(str, list(int))
     """
-    os.makedirs(f'output/annotations', exist_ok=True)
-    with open(f'output/annotations/{dataset}.json', 'w') as outfile:
-        json.dump(dict_annotations, outfile)
+    return {record_id: record_annotations for record_id, record_annotations in iter_annotations(dataset, record_ids)}
 
 
 # parse arguments
 @click.command()
 @click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
-def main(data: str) -> None:
+@click.option('--format', 'storage_format', default='npy', type=click.Choice(storage_formats),
+              help='format of the saved annotations (binary npy file with its index or json export)')
+def main(data: str, storage_format: str) -> None:
     dataset = data
-    data_generator = dataset_annot_generators[dataset]
+    data_generator = iter_annotations(dataset)
 
     annotations_dict = {}
     print(f'Beat annotations on dataset {dataset} are being recovered....')
@@ -140,9 +103,10 @@ def main(data: str) -> None:
             record_id, record_annotations = next(data_generator)
             annotations_dict[record_id] = record_annotations
         except StopIteration:
-            write_annotations_json(dataset, annotations_dict)
+            write_annotations(dataset, annotations_dict, storage_format)
             print(f'Beat annotations on dataset {dataset} are successfully recovered....')
             break
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,59 @@
 """This script compares QRS detections of an algorithm and beat annotations of specialists, in order to evaluate
 performances of the chosen method in function of a tolerance's value. For that, it computes a confusion matrix with
 criteria of interest, to calculate with those, different scores of performances. It studies also delays between
-annotations and correct detections. Obtained results are saved in csv files (criteria & scores) and json files (delays).
+annotations and correct detections, summarized by histograms of delays (one bin per frame) from which mean, variance
+and quantiles are computed. Obtained results (criteria, scores & distributions of delays) are saved in the database of
+results (output/results.sqlite, see results_helper).
 """
 
 import numpy as np
 import os
+from bisect import bisect_right
 import click
-import json
 from dataset_helper import *
 from algo_helper import *
+from storage_helper import read_detections, read_annotations
+from results_helper import write_evaluation, delay_statistics_columns
+
+
+def compute_confusion_matrices_and_delays(frames_detections: List[int], frames_annotations: List[int],
+                                          tolerances_frames: List[int]) -> List[Tuple[List[int], List[List[int]]]]:
+    """
+    compute the confusion matrix of the evaluation for several tolerances at once. Detections are sorted once, then for
+    each tolerance the first detection located in the interval of tolerance around every annotation is found by a
+    binary search (numpy.searchsorted), so the cost is O(N log M) instead of O(N x M). If there is such a detection :
+    correct detection (TP) and the delay between the corresponding annotation and it is measured, if not : missed
+    complex (FN). Every detection which was not in a tolerance interval around an annotation is a false detection (FP).
+
+    :param frames_detections: list of QRS detections (localisations) of the chosen algorithm
+    :type frames_detections: list(int)
+    :param frames_annotations: list of beat annotations (localisations)
+    :type frames_annotations: list(int)
+    :param tolerances_frames: numbers of frames corresponding to the values of the tolerances in milliseconds
+    :type tolerances_frames: list(int)
+    :return: for each tolerance, list of calculated criteria and the list of delays between annotations and their
+    corresponding correct detections
+    :rtype: list(tuple(list(int),list(list(int))))
+    """
+    detections = np.sort(np.asarray(frames_detections, dtype=np.int64))
+    annotations = np.asarray(frames_annotations, dtype=np.int64)
+    # sentinel after the last detection so that annotations without any following detection never match
+    padded_detections = np.append(detections, np.iinfo(np.int64).max)
+    results = []
+    for tolerance_frames in tolerances_frames:
+        first_candidates = np.searchsorted(detections, annotations - tolerance_frames, side='left')
+        candidates_frames = padded_detections[first_candidates]
+        matched = candidates_frames <= annotations + tolerance_frames
+        true_pos = int(np.count_nonzero(matched))
+        false_neg = len(annotations) - true_pos
+        false_pos = len(detections) - true_pos
+        delays = (candidates_frames[matched] - annotations[matched]).tolist()
+        results.append(([true_pos, false_pos, false_neg], [delays]))
+    return results
 
 
 def compute_confusion_matrix_and_delays(frames_detections: List[int], frames_annotations: List[int],
-                                        tolerance_frames: int) -> Tuple[List[int], List[int]]:
+                                        tolerance_frames: int) -> Tuple[List[int], List[List[int]]]:
     """
     compute the confusion matrix of the evaluation. For each annotation, consider a interval of tolerance around it, and
     check if there is a detection. If Yes : correct detection (TP) and the delays between the corresponding annotation
@@ -30,21 +70,139 @@ def compute_confusion_matrix_and_delays(frames_detections: List[int], frames_ann
     :type tolerance_frames: int
     :return: list of calculated criteria and the list of delays between annotations and their corresponding correct
     detections
-    :rtype: tuple(list(int),list(int))
-    """
-    true_pos = 0
-    false_neg = 0
-    delays = []
-    for fr in frames_annotations:
-        interval = range(fr - tolerance_frames, fr + tolerance_frames + 1)
-        corresponding_detections_frame = list(set(interval).intersection(frames_detections))
-        if len(corresponding_detections_frame) > 0:
-            true_pos += 1
-            delays.append(corresponding_detections_frame[0] - fr)
-        else:
-            false_neg += 1
-    false_pos = len(frames_detections) - true_pos
-    return [true_pos, false_pos, false_neg], [delays]
+    :rtype: tuple(list(int),list(list(int)))
+    """
+    return compute_confusion_matrices_and_delays(frames_detections, frames_annotations, [tolerance_frames])[0]
+
+
+def match_linked_annotations(detections: np.ndarray, annotations: np.ndarray, linked_annotations: np.ndarray,
+                             tolerance_frames: int, matched_detections: np.ndarray) -> None:
+    """
+    match annotations whose intervals of tolerance share detections with their neighbours, in one pass in the order of
+    annotations: each annotation takes the nearest detection of its interval which is not matched yet (the first one in
+    case of equality), if any. Matched detections of annotations are written in matched_detections.
+
+    :param detections: sorted localisations of detections
+    :type detections: ndarray
+    :param annotations: sorted localisations of annotations
+    :type annotations: ndarray
+    :param linked_annotations: indexes of the annotations to match, in increasing order
+    :type linked_annotations: ndarray
+    :param tolerance_frames: number of frames corresponding to the value of the tolerance in milliseconds
+    :type tolerance_frames: int
+    :param matched_detections: index of the detection matched with each annotation (-1 if none), updated in place
+    :type matched_detections: ndarray
+    """
+    first_detections = np.searchsorted(detections, annotations[linked_annotations] - tolerance_frames, side='left')
+    last_detections = np.searchsorted(detections, annotations[linked_annotations] + tolerance_frames, side='right')
+    taken_detections = set()
+    for id_annotation, first_detection, last_detection in zip(linked_annotations.tolist(), first_detections.tolist(),
+                                                              last_detections.tolist()):
+        annotation = int(annotations[id_annotation])
+        nearest_detection, nearest_distance = -1, None
+        for id_detection in range(first_detection, last_detection):
+            distance = abs(int(detections[id_detection]) - annotation)
+            if id_detection not in taken_detections and (nearest_distance is None or distance < nearest_distance):
+                nearest_detection, nearest_distance = id_detection, distance
+        matched_detections[id_annotation] = nearest_detection
+        if nearest_detection >= 0:
+            taken_detections.add(nearest_detection)
+
+
+def compute_one_to_one_confusion_matrices_and_delays(frames_detections: List[int], frames_annotations: List[int],
+                                                     tolerances_frames: List[int]) \
+        -> List[Tuple[List[int], List[List[int]]]]:
+    """
+    compute the confusion matrix of the evaluation for several tolerances with a one-to-one matching between
+    annotations and detections, as the beat-by-beat comparison of EC57 (wfdb.processing.compare_annotations): a
+    detection can correspond to one annotation only. Annotations are matched by a greedy pass in their order, each one
+    taking the nearest detection of its interval of tolerance which is not matched yet (the first one in case of
+    equality). An annotation whose interval shares no detection with the intervals of its neighbours can not compete
+    with them, so its nearest detection is found for every such annotation at once by binary searches on the sorted
+    arrays, and only runs of annotations sharing detections are matched one after the other (see
+    match_linked_annotations), which gives the same result as a pass over every annotation. Matched annotations are
+    correct detections (TP), other annotations are missed complexes (FN) and other detections are false detections (FP).
+    Delays are those of the matched pairs, in the order of annotations.
+
+    :param frames_detections: list of QRS detections (localisations) of the chosen algorithm
+    :type frames_detections: list(int)
+    :param frames_annotations: list of beat annotations (localisations)
+    :type frames_annotations: list(int)
+    :param tolerances_frames: numbers of frames corresponding to the values of the tolerances in milliseconds
+    :type tolerances_frames: list(int)
+    :return: for each tolerance, list of calculated criteria and the list of delays between annotations and their
+    corresponding correct detections
+    :rtype: list(tuple(list(int),list(list(int))))
+    """
+    detections = np.sort(np.asarray(frames_detections, dtype=np.int64))
+    annotations = np.asarray(frames_annotations, dtype=np.int64)
+    annotations_gaps = np.diff(annotations)
+    if np.any(annotations_gaps < 0):
+        annotations = np.sort(annotations)
+        annotations_gaps = np.diff(annotations)
+    # sentinels around detections so that the nearest detections before and after every annotation exist
+    padded_detections = np.concatenate([[np.iinfo(np.int64).min // 2], detections, [np.iinfo(np.int64).max // 2]])
+    next_detections = np.searchsorted(detections, annotations, side='left') + 1
+    delays_previous = padded_detections[next_detections - 1] - annotations
+    delays_next = padded_detections[next_detections] - annotations
+    # nearest detection of each annotation (the previous one in case of equality), as an index in detections, and delay
+    # between the annotation and it
+    previous_is_nearest = -delays_previous <= delays_next
+    nearest_detections = np.where(previous_is_nearest, next_detections - 2, next_detections - 1)
+    nearest_delays = np.where(previous_is_nearest, delays_previous, delays_next)
+    nearest_distances = np.abs(nearest_delays)
+    results = []
+    for tolerance_frames in tolerances_frames:
+        matched_detections = np.where(nearest_distances <= tolerance_frames, nearest_detections, -1)
+        annotations_delays = nearest_delays
+        # two consecutive annotations are linked if a detection is in both intervals of tolerance, which is only
+        # possible if they are closer than twice the tolerance
+        close_pairs = np.flatnonzero(annotations_gaps <= 2 * tolerance_frames)
+        links = close_pairs[np.searchsorted(detections, annotations[close_pairs] + tolerance_frames, side='right') >
+                            np.searchsorted(detections, annotations[close_pairs + 1] - tolerance_frames, side='left')]
+        if len(links) > 0:
+            linked_annotations = np.union1d(links, links + 1)
+            match_linked_annotations(detections, annotations, linked_annotations, tolerance_frames,
+                                     matched_detections)
+            annotations_delays = nearest_delays.copy()
+            annotations_delays[linked_annotations] = (detections[matched_detections[linked_annotations]] -
+                                                      annotations[linked_annotations])
+        annotations_matched = matched_detections >= 0
+        true_pos = int(np.count_nonzero(annotations_matched))
+        delays = annotations_delays[annotations_matched]
+        results.append(([true_pos, len(detections) - true_pos, len(annotations) - true_pos], [delays.tolist()]))
+    return results
+
+
+# methods to match annotations and detections, see compute_confusion_matrices_and_delays and
+# compute_one_to_one_confusion_matrices_and_delays
+matching_methods = {
+    'window': compute_confusion_matrices_and_delays,
+    'one-to-one': compute_one_to_one_confusion_matrices_and_delays
+}
+
+
+def compute_nearest_distances(frames_detections: List[int], frames_annotations: List[int]) -> np.ndarray:
+    """
+    compute for each annotation the distance (in frames) to its nearest detection. An annotation is a correct detection
+    for a tolerance as soon as this distance is lower or equal to the tolerance, so that confusion matrices of every
+    tolerance can be derived from these distances.
+
+    :param frames_detections: list of QRS detections (localisations) of the chosen algorithm
+    :type frames_detections: list(int)
+    :param frames_annotations: list of beat annotations (localisations)
+    :type frames_annotations: list(int)
+    :return: distance between each annotation and its nearest detection (maximal int64 value if there is no detection)
+    :rtype: ndarray
+    """
+    detections = np.sort(np.asarray(frames_detections, dtype=np.int64))
+    annotations = np.asarray(frames_annotations, dtype=np.int64)
+    if len(detections) == 0:
+        return np.full(len(annotations), np.iinfo(np.int64).max, dtype=np.int64)
+    next_detections = np.searchsorted(detections, annotations, side='left')
+    distances_next = np.abs(detections[np.minimum(next_detections, len(detections) - 1)] - annotations)
+    distances_previous = np.abs(annotations - detections[np.maximum(next_detections - 1, 0)])
+    return np.minimum(distances_next, distances_previous)
 
 
 def get_scores(true_pos: int, false_pos: int, false_neg: int) -> List[float]:
@@ -67,12 +225,183 @@ def get_scores(true_pos: int, false_pos: int, false_neg: int) -> List[float]:
     return [positive_predictivity, recall, f1_score]
 
 
+def get_scores_columns(true_pos: np.ndarray, false_pos: np.ndarray, false_neg: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    calculate the scores of get_scores for arrays of criteria (for example one value per record or per tolerance) in
+    one pass. Scores which can not be calculated (no detection or no annotation) are NaN.
+
+    :param true_pos: numbers of correct detections
+    :type true_pos: ndarray
+    :param false_pos: numbers of false detections
+    :type false_pos: ndarray
+    :param false_neg: numbers of missed QRS complex
+    :type false_neg: ndarray
+    :return: arrays of calculated scores : precision, recall or sensibility and F1-score
+    :rtype: tuple(ndarray, ndarray, ndarray)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        positive_predictivity = np.round(100 * true_pos / (true_pos + false_pos), 2)
+        recall = np.round(100 * true_pos / (true_pos + false_neg), 2)
+        f1_score = np.round(100 * 2 * true_pos / ((2 * true_pos) + false_pos + false_neg), 2)
+    return positive_predictivity, recall, f1_score
+
+
+# quantiles of delays saved with their histograms
+delay_quantiles = {'p5': 0.05, 'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p95': 0.95}
+
+
+def get_delay_histogram(delays: List[List[int]], tolerance_frames: int) -> np.ndarray:
+    """
+    count delays between annotations and their corresponding correct detections in bins of one frame, from
+    -tolerance_frames to tolerance_frames. Delays are integers within the tolerance, so that the histogram holds the
+    exact distribution of delays.
+
+    :param delays: values of delays, as given by compute_confusion_matrices_and_delays
+    :type delays: list(list(int))
+    :param tolerance_frames: number of frames corresponding to the value of the tolerance in milliseconds
+    :type tolerance_frames: int
+    :return: number of delays of each value from -tolerance_frames to tolerance_frames
+    :rtype: ndarray
+    """
+    values = np.concatenate([np.asarray(values, dtype=np.int64) for values in delays] + [np.zeros(0, dtype=np.int64)])
+    return np.bincount(values + tolerance_frames, minlength=2 * tolerance_frames + 1)
+
+
+def get_delay_statistics(histogram: np.ndarray, tolerance_frames: int) -> Dict[str, Optional[float]]:
+    """
+    compute statistics of delays from their histogram: number, mean, variance, extremes and quantiles of
+    delay_quantiles. Quantiles are exact: each one is the lowest delay whose cumulative count reaches the fraction of
+    the number of delays (inverse of the empirical distribution function).
+
+    :param histogram: number of delays of each value from -tolerance_frames to tolerance_frames
+    :type histogram: ndarray
+    :param tolerance_frames: number of frames corresponding to the value of the tolerance in milliseconds
+    :type tolerance_frames: int
+    :return: value of each statistic of delay_statistics_columns (None without any delay)
+    :rtype: dict(str, float)
+    """
+    count = int(histogram.sum())
+    if count == 0:
+        return {'count': 0, **{column: None for column in delay_statistics_columns[1:]}}
+    values = np.arange(-tolerance_frames, tolerance_frames + 1)
+    mean = float(np.dot(values, histogram)) / count
+    cumulative_counts = np.cumsum(histogram)
+    not_empty = np.flatnonzero(histogram)
+    statistics = {'count': count, 'mean': mean, 'variance': float(np.dot((values - mean) ** 2, histogram)) / count,
+                  'min': int(values[not_empty[0]]), 'max': int(values[not_empty[-1]])}
+    for name, quantile in delay_quantiles.items():
+        statistics[name] = int(values[np.searchsorted(cumulative_counts, quantile * count)])
+    return statistics
+
+
+# criteria and scores saved for each record and for the entire dataset
+perf_columns = ['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)']
+
+
+class EvaluationResult:
+    """
+    results of evaluation of an algorithm on the records of a dataset for several tolerances. Criteria of each record
+    are stored in preallocated columns (one row per record, one column per tolerance), so that adding a record does
+    not copy previous ones, and tables of criteria and scores are built once, at the end. Delays of each record are
+    only kept as a histogram (one row per record, one bin per frame of the interval of tolerance), unless raw delays
+    are asked for.
+    """
+
+    def __init__(self, record_ids: List[str], tolerances_ms: List[int], tolerances_frames: List[int],
+                 keep_delays: bool = False):
+        """
+        :param record_ids: IDs of the evaluated records, in the order of the tables
+        :type record_ids: list(str)
+        :param tolerances_ms: accepted times before and after an annotation to consider a detection as correct
+        :type tolerances_ms: list(int)
+        :param tolerances_frames: numbers of frames corresponding to the values of the tolerances in milliseconds
+        :type tolerances_frames: list(int)
+        :param keep_delays: also keep values of delays of each record
+        :type keep_delays: bool
+        """
+        self.record_ids = list(record_ids)
+        self.tolerances_ms = list(tolerances_ms)
+        self.rows = {id_rec: row for row, id_rec in enumerate(self.record_ids)}
+        self.nb_of_beats = np.zeros(len(self.record_ids), dtype=np.int64)
+        self.true_pos = np.zeros((len(self.record_ids), len(self.tolerances_ms)), dtype=np.int64)
+        self.false_pos = np.zeros((len(self.record_ids), len(self.tolerances_ms)), dtype=np.int64)
+        self.false_neg = np.zeros((len(self.record_ids), len(self.tolerances_ms)), dtype=np.int64)
+        self.tolerances_frames = list(tolerances_frames)
+        self.delay_histograms = [np.zeros((len(self.record_ids), 2 * tolerance_frames + 1), dtype=np.int64)
+                                 for tolerance_frames in self.tolerances_frames]
+        self.delays = [{} for _ in self.tolerances_ms] if keep_delays else None
+
+    def add_record(self, id_rec: str, number_beats: int,
+                   confusion_matrices: List[Tuple[List[int], List[List[int]]]]) -> None:
+        """
+        store criteria and delays of a record for every tolerance.
+
+        :param id_rec: ID of the record
+        :type id_rec: str
+        :param number_beats: number of beat annotations of the record
+        :type number_beats: int
+        :param confusion_matrices: for each tolerance, criteria (TP, FP, FN) and delays, as given by
+        compute_confusion_matrices_and_delays
+        :type confusion_matrices: list(tuple(list(int),list(list(int))))
+        """
+        row = self.rows[id_rec]
+        self.nb_of_beats[row] = number_beats
+        for id_tol, ([true_pos, false_pos, false_neg], delays) in enumerate(confusion_matrices):
+            self.true_pos[row, id_tol] = true_pos
+            self.false_pos[row, id_tol] = false_pos
+            self.false_neg[row, id_tol] = false_neg
+            self.delay_histograms[id_tol][row] = get_delay_histogram(delays, self.tolerances_frames[id_tol])
+            if self.delays is not None:
+                self.delays[id_tol][id_rec] = delays
+
+    def get_performances(self, id_tol: int) -> pd.DataFrame:
+        """
+        build the table of criteria and scores of each record and of the entire dataset for one tolerance.
+
+        :param id_tol: index of the tolerance in tolerances_ms
+        :type id_tol: int
+        :return: criteria and scores for each record and for the entire dataset
+        :rtype: DataFrame
+        """
+        true_pos = self.true_pos[:, id_tol]
+        false_pos = self.false_pos[:, id_tol]
+        false_neg = self.false_neg[:, id_tol]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            false_per = np.round(100 * (false_pos + false_neg) / self.nb_of_beats, 2)
+        pos_predict, recall, f1 = get_scores_columns(true_pos, false_pos, false_neg)
+        records_df = pd.DataFrame({'nbofbeats': self.nb_of_beats, 'FP': false_pos, 'FN': false_neg,
+                                   'F': false_pos + false_neg, 'F(%)': false_per, 'P+(%)': pos_predict,
+                                   'Se(%)': recall, 'F1(%)': f1}, index=self.record_ids, columns=perf_columns)
+        return add_eval_global_line(records_df, int(np.sum(true_pos)))
+
+    def get_delay_distributions(self, id_tol: int) -> pd.DataFrame:
+        """
+        build the table of histograms and statistics of delays of each record and of the entire dataset for one
+        tolerance. The histogram of the entire dataset is the sum of histograms of records.
+
+        :param id_tol: index of the tolerance in tolerances_ms
+        :type id_tol: int
+        :return: value of the first bin of histograms, histogram and statistics of delays for each record and for the
+        entire dataset
+        :rtype: DataFrame
+        """
+        tolerance_frames = self.tolerances_frames[id_tol]
+        histograms = np.vstack([self.delay_histograms[id_tol], self.delay_histograms[id_tol].sum(axis=0)])
+        distributions_df = pd.DataFrame([get_delay_statistics(histogram, tolerance_frames)
+                                         for histogram in histograms], index=self.record_ids + ['global'],
+                                        columns=delay_statistics_columns)
+        distributions_df.insert(0, 'first_delay', -tolerance_frames)
+        distributions_df.insert(1, 'histogram', list(histograms))
+        return distributions_df
+
+
 def get_perf_dataset(records_dict: Dict[str, List[str]], detections_dict: Dict[str, Dict[str, List[int]]],
-                     annotations_dict: Dict[str, List[int]], tolerance: int, tolerance_sup1: int, tolerance_sup2: int) \
-                    -> Generator[Tuple[str, List[int], List[int], List[pd.DataFrame]], None, None]:
+                     annotations_dict: Dict[str, List[int]], tolerances: List[int], matching: str = 'window') \
+                    -> Generator[Tuple[str, int, List[Tuple[List[int], List[List[int]]]]], None, None]:
     """
-    get performances of the chosen algorithm for each record thanks to compute_confusion_matrix_and_delays and
-    get_scores for 3 tolerance's values.
+    get performances of the chosen algorithm for each record thanks to compute_confusion_matrices_and_delays for
+    several tolerance's values.
 
     :param records_dict: names of the record and its channel(s)
     :type records_dict: dict(str, list(str))
@@ -80,186 +409,394 @@ def get_perf_dataset(records_dict: Dict[str, List[str]], detections_dict: Dict[s
     :type detections_dict: dict(str, dict(str,list(int)))
     :param annotations_dict: list of beat annotations (localisations) for each record
     :type annotations_dict: dict(str, list(int))
-    :param tolerance: accepted number of frames before and after an annotation to consider a detection as correct.
-    It corresponds to the value of the tolerance in milliseconds (given as argument)
-    :type tolerance: int
-    :param tolerance_sup1: number of frames corresponding to the value of the tolerance in milliseconds (fixed in main())
-    :type tolerance_sup1: int
-    :param tolerance_sup2: number of frames corresponding to the value of the tolerance in milliseconds (fixed in main())
-    :type tolerance_sup2: int
-    :return: results of evaluation for each record: number of correct detections, delays between annotations and their
-    corresponding correct detections and Series with criteria and scores of interest (number of annotations, number of
-    false detections, number of missed QRS complexes, number of errors (FP+FN), rate of detection error, precision,
-    recall or sensibility and F1-score)
-    :rtype: tuple(str, list(int), list(int), list(DataFrame))
+    :param tolerances: accepted numbers of frames before and after an annotation to consider a detection as correct.
+    They correspond to the values of the tolerances in milliseconds
+    :type tolerances: list(int)
+    :param matching: method to match annotations and detections, among matching_methods
+    :type matching: str
+    :return: results of evaluation for each record: ID of the record, number of annotations and, for each tolerance,
+    number of correct detections, false detections and missed QRS complexes with delays between annotations and their
+    corresponding correct detections
+    :rtype: tuple(str, int, list(tuple(list(int),list(list(int)))))
     """
     for id_rec in list(records_dict.keys()):
         number_beats = len(annotations_dict[id_rec])
         sig_name = records_dict[str(id_rec)][0]
-        # given tolerance
-        [true_pos_tol, false_pos_tol, false_neg_tol], delays_tol = compute_confusion_matrix_and_delays(
-            detections_dict[str(id_rec)][sig_name], annotations_dict[id_rec], tolerance)
-        false_tol = false_pos_tol + false_neg_tol
-        false_per_tol = round(100 * false_tol / number_beats, 2)
-        pos_predict_tol, recall_tol, f1_tol = get_scores(true_pos_tol, false_pos_tol, false_neg_tol)
-        # first additional tolerance
-        [true_pos_sup1, false_pos_sup1, false_neg_sup1], delays_sup1 = compute_confusion_matrix_and_delays(
-            detections_dict[str(id_rec)][sig_name], annotations_dict[id_rec], tolerance_sup1)
-        false_sup1 = false_pos_sup1 + false_neg_sup1
-        false_per_sup1 = round(100 * false_sup1 / number_beats, 2)
-        pos_predict_sup1, recall_sup1, f1_sup1 = get_scores(true_pos_sup1, false_pos_sup1, false_neg_sup1)
-        # second additional tolerance
-        [true_pos_sup2, false_pos_sup2, false_neg_sup2], delays_sup2 = compute_confusion_matrix_and_delays(
-            detections_dict[str(id_rec)][sig_name], annotations_dict[id_rec], tolerance_sup2)
-        false_sup2 = false_pos_sup2 + false_neg_sup2
-        false_per_sup2 = round(100 * false_sup2 / number_beats, 2)
-        pos_predict_sup2, recall_sup2, f1_sup2 = get_scores(true_pos_sup2, false_pos_sup2, false_neg_sup2)
-        # lists to yield
-        list_true_pos = [true_pos_tol, true_pos_sup1, true_pos_sup2]
-        list_delays = [delays_tol, delays_sup1, delays_sup2]
-        list_df = [pd.DataFrame([[int(number_beats), int(false_pos_tol), int(false_neg_tol), int(false_tol),
-                                  false_per_tol, pos_predict_tol, recall_tol, f1_tol]], index=[id_rec],
-                                columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)']),
-                   pd.DataFrame([[int(number_beats), int(false_pos_sup1), int(false_neg_sup1), int(false_sup1),
-                                  false_per_sup1, pos_predict_sup1, recall_sup1, f1_sup1]], index=[id_rec],
-                                columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)']),
-                   pd.DataFrame([[int(number_beats), int(false_pos_sup2), int(false_neg_sup2), int(false_sup2),
-                                  false_per_sup2, pos_predict_sup2, recall_sup2, f1_sup2]], index=[id_rec],
-                                columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-                   ]
-        yield id_rec, list_true_pos, list_delays, list_df
-
-
-def add_eval_global_line(performances_df: pd.DataFrame, nb_of_records: int, total_true_pos: int) -> pd.DataFrame:
+        # every tolerance is evaluated in one pass over the sorted detections
+        confusion_matrices = matching_methods[matching](detections_dict[str(id_rec)][sig_name],
+                                                        annotations_dict[id_rec], tolerances)
+        yield id_rec, number_beats, confusion_matrices
+
+
+def fuse_detections(channels_detections: List[List[int]], window_frames: int, min_votes: int) -> List[int]:
+    """
+    merge QRS detections of several channels of a record into consensus beats. Detections of every channel are sorted
+    together, and a beat gathers the detections at most window_frames after its first detection. Beats are anchored on
+    their first detection instead of chaining successive detections, so that a noisy channel cannot merge neighbouring
+    beats into one. A beat is kept if it was detected on at least min_votes channels, at the median localisation of its
+    detections.
+
+    :param channels_detections: QRS detections (localisations) of each channel
+    :type channels_detections: list(list(int))
+    :param window_frames: maximal number of frames between the first and the last detections of a beat
+    :type window_frames: int
+    :param min_votes: minimal number of channels which detected a beat
+    :type min_votes: int
+    :return: localisations of consensus beats
+    :rtype: list(int)
+    """
+    frames = np.concatenate([np.asarray(detections, dtype=np.int64) for detections in channels_detections])
+    if len(frames) == 0:
+        return []
+    channels = np.repeat(np.arange(len(channels_detections)),
+                         [len(detections) for detections in channels_detections])
+    order = np.argsort(frames, kind='stable')
+    frames = frames[order]
+    channels = channels[order]
+    # chains of detections closer than window_frames to the previous one are beats if they last at most window_frames,
+    # longer chains are split so that each beat starts at the first detection more than window_frames after the first
+    # detection of the previous one
+    new_beats = np.concatenate([[True], np.diff(frames) > window_frames])
+    chain_starts = np.flatnonzero(new_beats)
+    chain_ends = np.append(chain_starts[1:], len(frames))
+    long_chains = frames[chain_ends - 1] - frames[chain_starts] > window_frames
+    if long_chains.any():
+        sorted_frames = frames.tolist()
+        for chain_start, chain_end in zip(chain_starts[long_chains].tolist(), chain_ends[long_chains].tolist()):
+            start = bisect_right(sorted_frames, sorted_frames[chain_start] + window_frames, chain_start, chain_end)
+            while start < chain_end:
+                new_beats[start] = True
+                start = bisect_right(sorted_frames, sorted_frames[start] + window_frames, start, chain_end)
+    beats = np.cumsum(new_beats) - 1
+    starts = np.flatnonzero(new_beats)
+    sizes = np.diff(np.append(starts, len(frames)))
+    # a channel votes once for a beat, even with several detections in it
+    votes = np.bincount(np.unique(beats * len(channels_detections) + channels) // len(channels_detections),
+                        minlength=len(starts))
+    medians = (frames[starts + (sizes - 1) // 2] + frames[starts + sizes // 2]) // 2
+    return medians[votes >= min_votes].tolist()
+
+
+def get_perf_channels_dataset(records_dict: Dict[str, List[str]], detections_dict: Dict[str, Dict[str, List[int]]],
+                              annotations_dict: Dict[str, List[int]], tolerances: List[int], fusion_window: int,
+                              fusion_votes: int, matching: str = 'window') \
+        -> Generator[Tuple[str, int, List[List[Tuple[List[int], List[List[int]]]]]], None, None]:
+    """
+    get performances of the chosen algorithm on every channel of each record, and on consensus beats fused from all
+    channels with fuse_detections, for several tolerance's values.
+
+    :param records_dict: names of the record and its channel(s)
+    :type records_dict: dict(str, list(str))
+    :param detections_dict: QRS detections (localisations) of the chosen algorithm for each record
+    :type detections_dict: dict(str, dict(str,list(int)))
+    :param annotations_dict: list of beat annotations (localisations) for each record
+    :type annotations_dict: dict(str, list(int))
+    :param tolerances: accepted numbers of frames before and after an annotation to consider a detection as correct
+    :type tolerances: list(int)
+    :param fusion_window: maximal number of frames between the first and the last detections of a consensus beat
+    :type fusion_window: int
+    :param fusion_votes: minimal number of channels for a consensus beat (0 for a strict majority of the channels,
+    limited to the number of channels of each record)
+    :type fusion_votes: int
+    :param matching: method to match annotations and detections, among matching_methods
+    :type matching: str
+    :return: results of evaluation for each record: ID of the record, number of annotations and, for each channel
+    followed by the fusion of channels, results for each tolerance as given by get_perf_dataset
+    :rtype: tuple(str, int, list(list(tuple(list(int),list(list(int))))))
+    """
+    for id_rec in list(records_dict.keys()):
+        channels_detections = [detections_dict[str(id_rec)][sig_name] for sig_name in records_dict[str(id_rec)]]
+        # a strict majority requires both leads of 2-lead records, votes cannot exceed the number of channels
+        min_votes = min(fusion_votes, len(channels_detections)) if fusion_votes > 0 \
+            else len(channels_detections) // 2 + 1
+        fused_detections = fuse_detections(channels_detections, fusion_window, min_votes)
+        confusion_matrices = [matching_methods[matching](detections, annotations_dict[id_rec], tolerances)
+                              for detections in channels_detections + [fused_detections]]
+        yield id_rec, len(annotations_dict[id_rec]), confusion_matrices
+
+
+def add_eval_global_line(performances_df: pd.DataFrame, total_true_pos: int) -> pd.DataFrame:
     """
     get and calculate global criteria and scores on the entire dataset with those calculated for each record. Obtained
     results are added at the end of the global DataFrame (with performances for each record).
 
     :param performances_df: criteria and scores for each record
     :type performances_df: DataFrame
-    :param nb_of_records: number of records in the studied dataset
-    :type nb_of_records: int
     :param total_true_pos: number of correct detections in the entire dataset (sum of number of correct detections for
     each record)
     :type total_true_pos: int
     :return: criteria and scores for each record and for the entire dataset
     :rtype: DataFrame
     """
-    total_beats = np.sum(performances_df.iloc[:nb_of_records, 0])
-    total_false_pos = np.sum(performances_df.iloc[:nb_of_records, 1])
-    total_false_neg = np.sum(performances_df.iloc[:nb_of_records, 2])
+    total_beats, total_false_pos, total_false_neg = performances_df[['nbofbeats', 'FP', 'FN']].to_numpy().sum(axis=0)
     glob_pos_predict, glob_recall, glob_f1 = get_scores(total_true_pos, total_false_pos, total_false_neg)
     global_perf = pd.DataFrame(
         [[total_beats, total_false_pos, total_false_neg, (total_false_pos + total_false_neg),
           round((100 * (total_false_pos + total_false_neg) / total_beats), 2), glob_pos_predict,
           glob_recall, glob_f1]],
         index=['global'],
-        columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
+        columns=perf_columns)
     blanks = pd.DataFrame([['_____', '_____', '_____', '_____', '_____', '_____', '_____', '_____']],
                           index=['_____'],
-                          columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    performances_df = performances_df.append(blanks, ignore_index=False)
-    final_performances_df = performances_df.append(global_perf, ignore_index=False)
-    return final_performances_df
+                          columns=perf_columns)
+    return pd.concat([performances_df, blanks, global_perf])
+
+
+def sweep_tolerances(records_dict: Dict[str, List[str]], detections_dict: Dict[str, Dict[str, List[int]]],
+                     annotations_dict: Dict[str, List[int]], freq_sampling: int, tolerances_ms: List[int],
+                     matching: str = 'window') -> pd.DataFrame:
+    """
+    compute global criteria and scores of the entire dataset for many tolerances in a single pass. With the window
+    matching, distances between annotations and their nearest detections and between detections and their nearest
+    annotations are computed once for each record and accumulated in two histograms, whose cumulative sums give for any
+    tolerance the number of annotations with a detection in their interval of tolerance (TP) and the number of
+    detections in no interval of tolerance (FP), as compute_confusion_matrices_and_delays defines them, so that FP is
+    never negative even when a detection lies in the intervals of two annotations. With the one-to-one matching, every
+    tolerance is evaluated by compute_one_to_one_confusion_matrices_and_delays, so that no detection is counted twice.
+
+    :param records_dict: names of the record and its channel(s)
+    :type records_dict: dict(str, list(str))
+    :param detections_dict: QRS detections (localisations) of the chosen algorithm for each record
+    :type detections_dict: dict(str, dict(str,list(int)))
+    :param annotations_dict: list of beat annotations (localisations) for each record
+    :type annotations_dict: dict(str, list(int))
+    :param freq_sampling: value of sampling frequency of the dataset
+    :type freq_sampling: int
+    :param tolerances_ms: accepted times before and after an annotation to consider a detection as correct
+    :type tolerances_ms: list(int)
+    :param matching: method to match annotations and detections, among matching_methods
+    :type matching: str
+    :return: criteria and scores of the entire dataset for each tolerance
+    :rtype: DataFrame
+    """
+    tolerances_fr = np.array([int((tol * freq_sampling) / 1000) for tol in tolerances_ms], dtype=np.int64)
+    max_tolerance_fr = int(tolerances_fr.max())
+    # distances greater than every tolerance are counted in the last bin
+    annotations_histogram = np.zeros(max_tolerance_fr + 2, dtype=np.int64)
+    detections_histogram = np.zeros(max_tolerance_fr + 2, dtype=np.int64)
+    confusion_matrix = np.zeros((len(tolerances_fr), 3), dtype=np.int64)
+    total_beats = 0
+    for id_rec in list(records_dict.keys()):
+        sig_name = records_dict[str(id_rec)][0]
+        detections = detections_dict[str(id_rec)][sig_name]
+        total_beats += len(annotations_dict[id_rec])
+        if matching == 'one-to-one':
+            confusion_matrix += np.array([record_confusion_matrix for record_confusion_matrix, _ in
+                                          compute_one_to_one_confusion_matrices_and_delays(
+                                              detections, annotations_dict[id_rec], tolerances_fr.tolist())])
+            continue
+        annotations_distances = compute_nearest_distances(detections, annotations_dict[id_rec])
+        annotations_histogram += np.bincount(np.minimum(annotations_distances, max_tolerance_fr + 1),
+                                             minlength=max_tolerance_fr + 2)
+        detections_distances = compute_nearest_distances(annotations_dict[id_rec], detections)
+        detections_histogram += np.bincount(np.minimum(detections_distances, max_tolerance_fr + 1),
+                                            minlength=max_tolerance_fr + 2)
+    if matching == 'one-to-one':
+        true_pos, false_pos, false_neg = confusion_matrix.T
+    else:
+        true_pos = np.cumsum(annotations_histogram)[tolerances_fr]
+        false_pos = detections_histogram.sum() - np.cumsum(detections_histogram)[tolerances_fr]
+        false_neg = total_beats - true_pos
+    pos_predict, recall, f1 = get_scores_columns(true_pos, false_pos, false_neg)
+    return pd.DataFrame({'tolerance(ms)': tolerances_ms, 'tolerance(frames)': tolerances_fr, 'nbofbeats': total_beats,
+                         'TP': true_pos, 'FP': false_pos, 'FN': false_neg, 'P+(%)': pos_predict, 'Se(%)': recall,
+                         'F1(%)': f1})
+
 
+def write_sweep_csv(algorithm: str, dataset: str, sweep_df: pd.DataFrame) -> None:
+    """
+    write global criteria and scores of the entire dataset for each tolerance of a sweep in a csv file.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param sweep_df: criteria and scores for each tolerance
+    :type sweep_df: DataFrame
+    """
+    os.makedirs(f'output/sweep', exist_ok=True)
+    sweep_df.to_csv(f'output/sweep/{algorithm}_{dataset}.csv', sep=',', index=False)
+
+
+def get_run_metadata(algorithm: str, freq_sampling: int, tolerance_frames: int, options: Optional[Dict] = None) \
+        -> Dict:
+    """
+    gather the metadata of an evaluation saved with its results: parameters and version of the algorithm, sampling
+    frequency and tolerance in frames.
 
-def write_delays_json(algorithm: str, dataset: str, tolerance_ms: int, delays_dict: Dict[str, List[int]]) -> None:
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param freq_sampling: value of sampling frequency of the dataset
+    :type freq_sampling: int
+    :param tolerance_frames: number of frames corresponding to the value of the tolerance in milliseconds
+    :type tolerance_frames: int
+    :param options: other options of the evaluation
+    :type options: dict
+    :return: metadata of the evaluation
+    :rtype: dict
     """
-    write delays between annotations and their corresponding correct detections for each record of the dataset from a
-    dictionary in a json file.
+    return {'tolerance_frames': tolerance_frames, 'sampling_frequency': freq_sampling,
+            'algorithm_version': get_algo_version(algorithm), 'algorithm_params': get_algo_params(algorithm),
+            'options': options}
+
+
+def evaluate_dataset(algorithm: str, dataset: str, tolerances_ms: List[int],
+                     detections_dict: Dict[str, Dict[str, List[int]]], annotations_dict: Dict[str, List[int]],
+                     record_ids: Optional[List[str]] = None, matching: str = 'window', raw_delays: bool = False) \
+        -> None:
+    """
+    evaluate QRS detections of an algorithm on every record of a dataset for several tolerances and save criteria,
+    scores and distributions of delays of each tolerance in the database of results.
 
     :param algorithm: name of the used method for QRS detection
     :type algorithm: str
     :param dataset: name of the studied dataset
     :type dataset: str
-    :param tolerance_ms: accepted time before and after an annotation to consider a detection as correct
-    :type tolerance_ms: int
-    :param delays_dict: values of delays between annotations and their corresponding correct detections for each record
-    :type delays_dict: dict(str, dict(str, list(int)))
+    :param tolerances_ms: accepted times before and after an annotation to consider a detection as correct
+    :type tolerances_ms: list(int)
+    :param detections_dict: QRS detections (localisations) of the chosen algorithm for each record
+    :type detections_dict: dict(str, dict(str,list(int)))
+    :param annotations_dict: list of beat annotations (localisations) for each record
+    :type annotations_dict: dict(str, list(int))
+    :param record_ids: IDs of the records to evaluate (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param matching: method to match annotations and detections, among matching_methods
+    :type matching: str
+    :param raw_delays: also save values of delays of each record
+    :type raw_delays: bool
     """
-    os.makedirs(f'output/perf', exist_ok=True)
-    with open(f'output/perf/{algorithm}_{dataset}_{tolerance_ms}.json', 'w') as outfile:
-        json.dump(delays_dict, outfile)
+    fs = sampling_frequency[dataset]
+    tolerances_fr = [int((tol * fs) / 1000) for tol in tolerances_ms]
+    records_dict = records[dataset] if record_ids is None \
+        else {record_id: records[dataset][record_id] for record_id in record_ids}
+    nb_of_records = len(records_dict.keys())
+    evaluation = EvaluationResult(list(records_dict.keys()), tolerances_ms, tolerances_fr, raw_delays)
+    print(f'Evaluation of performances of {algorithm} on dataset {dataset} is running....')
+    for counter, (id_rec, number_beats, confusion_matrices) in enumerate(
+            get_perf_dataset(records_dict, detections_dict, annotations_dict, tolerances_fr, matching), start=1):
+        evaluation.add_record(id_rec, number_beats, confusion_matrices)
+        print(f'{counter}/{nb_of_records}')
+    for id_tol, tol in enumerate(tolerances_ms):
+        write_evaluation(algorithm, dataset, int(tol), evaluation.get_performances(id_tol),
+                         evaluation.get_delay_distributions(id_tol), matching,
+                         metadata=get_run_metadata(algorithm, fs, tolerances_fr[id_tol]),
+                         delays_dict=None if evaluation.delays is None else evaluation.delays[id_tol])
+    print(f'Evaluation of performances of {algorithm} on dataset {dataset} was successful....')
 
 
-def write_perf_csv(algorithm: str, dataset: str, tolerance_ms: int, perf_df: pd.DataFrame) -> None:
+def evaluate_dataset_channels(algorithm: str, dataset: str, tolerances_ms: List[int],
+                              detections_dict: Dict[str, Dict[str, List[int]]], annotations_dict: Dict[str, List[int]],
+                              fusion_window_ms: int, fusion_votes: int, record_ids: Optional[List[str]] = None,
+                              matching: str = 'window', raw_delays: bool = False) -> None:
     """
-    write criteria and scores calculated for each record and the entire dataset from a DataFrame with all results in a
-    csv file.
+    evaluate QRS detections of an algorithm on every channel of every record of a dataset, and on consensus beats of
+    the fused channels, for several tolerances. Criteria, scores and distributions of delays of each channel (by
+    position in the record) and of the fusion are saved in the database of results, with the lead 'channel i' or
+    'fused'.
 
     :param algorithm: name of the used method for QRS detection
     :type algorithm: str
     :param dataset: name of the studied dataset
     :type dataset: str
-    :param tolerance_ms: accepted time before and after an annotation to consider a detection as correct
-    :type tolerance_ms: int
-    :param perf_df: results of evaluation (criteria and scores)
-    :type perf_df: DataFrame
+    :param tolerances_ms: accepted times before and after an annotation to consider a detection as correct
+    :type tolerances_ms: list(int)
+    :param detections_dict: QRS detections (localisations) of the chosen algorithm for each record
+    :type detections_dict: dict(str, dict(str,list(int)))
+    :param annotations_dict: list of beat annotations (localisations) for each record
+    :type annotations_dict: dict(str, list(int))
+    :param fusion_window_ms: maximal time between the first and the last detections of a consensus beat
+    :type fusion_window_ms: int
+    :param fusion_votes: minimal number of channels for a consensus beat (0 for a strict majority of the channels,
+    limited to the number of channels of each record)
+    :type fusion_votes: int
+    :param record_ids: IDs of the records to evaluate (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param matching: method to match annotations and detections, among matching_methods
+    :type matching: str
+    :param raw_delays: also save values of delays of each record
+    :type raw_delays: bool
     """
-    os.makedirs(f'output/perf', exist_ok=True)
-    perf_df.to_csv(f'output/perf/{algorithm}_{dataset}_{tolerance_ms}' + '.csv', sep=',', index=True)
+    fs = sampling_frequency[dataset]
+    tolerances_fr = [int((tol * fs) / 1000) for tol in tolerances_ms]
+    records_dict = records[dataset] if record_ids is None \
+        else {record_id: records[dataset][record_id] for record_id in record_ids}
+    nb_of_records = len(records_dict.keys())
+    nb_of_channels = max(len(sig_names) for sig_names in records_dict.values())
+    leads = [f'channel {id_sig}' for id_sig in range(nb_of_channels)] + ['fused']
+    evaluations = [EvaluationResult([id_rec for id_rec, sig_names in records_dict.items() if len(sig_names) > id_sig],
+                                    tolerances_ms, tolerances_fr, raw_delays) for id_sig in range(nb_of_channels)]
+    evaluations.append(EvaluationResult(list(records_dict.keys()), tolerances_ms, tolerances_fr, raw_delays))
+    print(f'Evaluation of performances of {algorithm} on every channel of dataset {dataset} is running....')
+    for counter, (id_rec, number_beats, leads_confusion_matrices) in enumerate(
+            get_perf_channels_dataset(records_dict, detections_dict, annotations_dict, tolerances_fr,
+                                      int((fusion_window_ms * fs) / 1000), fusion_votes, matching), start=1):
+        lead_evaluations = evaluations[:len(leads_confusion_matrices) - 1] + [evaluations[-1]]
+        for evaluation, confusion_matrices in zip(lead_evaluations, leads_confusion_matrices):
+            evaluation.add_record(id_rec, number_beats, confusion_matrices)
+        print(f'{counter}/{nb_of_records}')
+    for id_tol, tol in enumerate(tolerances_ms):
+        for lead, evaluation in zip(leads, evaluations):
+            options = {'fusion_window': fusion_window_ms, 'fusion_votes': fusion_votes} if lead == 'fused' else None
+            write_evaluation(algorithm, dataset, int(tol), evaluation.get_performances(id_tol),
+                             evaluation.get_delay_distributions(id_tol), matching, lead,
+                             get_run_metadata(algorithm, fs, tolerances_fr[id_tol], options),
+                             None if evaluation.delays is None else evaluation.delays[id_tol])
+    print(f'Evaluation of performances of {algorithm} on every channel of dataset {dataset} was successful....')
 
 
 # parse arguments
 @click.command()
 @click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
 @click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
-@click.option('--tol', required=True, type=click.IntRange(0, 1000, clamp=True),
-              help='tolerance of the evaluation (in ms), type=int')
-def main(data: str, algo: str, tol: int) -> None:
+@click.option('--tol', type=click.IntRange(0, 1000, clamp=True),
+              help='tolerance of the evaluation (in ms), required without --sweep and ignored with it, type=int')
+@click.option('--matching', default='window', type=click.Choice(list(matching_methods)),
+              help='matching of annotations and detections: any detection in the interval of tolerance (window) or '
+                   'one detection per annotation (one-to-one)')
+@click.option('--channels/--first-channel', default=True,
+              help='evaluate every channel and the fusion of channels (default) or only the first channel of each '
+                   'record')
+@click.option('--fusion-window', default=100, type=click.IntRange(0, 1000),
+              help='maximal time between the first and the last detections of different channels merged in one beat '
+                   '(in ms), type=int')
+@click.option('--fusion-votes', default=0, type=click.IntRange(0, None),
+              help='minimal number of channels which detected a fused beat (0 for more than half, all channels if '
+                   'greater than their number), type=int')
+@click.option('--sweep', is_flag=True,
+              help='compute global scores for every tolerance from 0 to --sweep-max ms in a single pass with the '
+                   'chosen --matching, instead of the detailed evaluation of --tol')
+@click.option('--sweep-max', default=150, type=click.IntRange(0, 1000), help='maximal tolerance of the sweep (in ms)')
+@click.option('--sweep-step', default=1, type=click.IntRange(1, 1000), help='step of tolerances of the sweep (in ms)')
+@click.option('--raw-delays', is_flag=True,
+              help='also save every delay of each record in the database of results, besides their histograms')
+def main(data: str, algo: str, tol: Optional[int], matching: str, channels: bool, fusion_window: int,
+         fusion_votes: int, sweep: bool, sweep_max: int, sweep_step: int, raw_delays: bool) -> None:
     dataset = data
     algorithm = algo
-    fs = sampling_frequency[dataset]
     tol_sup1 = 25
     tol_sup2 = 50
-    tolerances_fr = [int((tol * fs) / 1000), int((tol_sup1 * fs) / 1000), int((tol_sup2 * fs) / 1000)]
-    records_dict = records[dataset]
-    nb_of_records = len(records_dict.keys())
 
-    with open(f'output/frames/{algorithm}_{dataset}.json') as detections_json:
-        detections_dict = json.load(detections_json)
-    with open(f'output/annotations/{dataset}.json') as annotations_json:
-        annotations_dict = json.load(annotations_json)
-    perf_generator = get_perf_dataset(records_dict, detections_dict, annotations_dict, tolerances_fr[0],
-                                      tolerances_fr[1], tolerances_fr[2])
-
-    total_true_pos_tol = 0
-    total_true_pos_sup1 = 0
-    total_true_pos_sup2 = 0
-    delays_dict_tol = {}
-    delays_dict_sup1 = {}
-    delays_dict_sup2 = {}
-    performances_tol = pd.DataFrame(columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    performances_sup1 = pd.DataFrame(columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    performances_sup2 = pd.DataFrame(columns=['nbofbeats', 'FP', 'FN', 'F', 'F(%)', 'P+(%)', 'Se(%)', 'F1(%)'])
-    counter = 0
-    print(f'Evaluation of performances of {algorithm} on dataset {dataset} is running....')
-    while True:
-        try:
-            id_rec, list_true_pos, list_delays, list_performance = next(perf_generator)
-            total_true_pos_tol += list_true_pos[0]
-            total_true_pos_sup1 += list_true_pos[1]
-            total_true_pos_sup2 += list_true_pos[2]
-            delays_dict_tol[id_rec] = list_delays[0]
-            delays_dict_sup1[id_rec] = list_delays[1]
-            delays_dict_sup2[id_rec] = list_delays[2]
-            performances_tol = performances_tol.append(list_performance[0], ignore_index=False)
-            performances_sup1 = performances_sup1.append(list_performance[1], ignore_index=False)
-            performances_sup2 = performances_sup2.append(list_performance[2], ignore_index=False)
-            counter += 1
-            print(f'{counter}/{nb_of_records}')
-        except StopIteration:
-            final_performances_tol = add_eval_global_line(performances_tol, nb_of_records, total_true_pos_tol)
-            final_performances_sup1 = add_eval_global_line(performances_sup1, nb_of_records, total_true_pos_sup1)
-            final_performances_sup2 = add_eval_global_line(performances_sup2, nb_of_records, total_true_pos_sup2)
-            write_delays_json(algorithm, dataset, tol, delays_dict_tol)
-            write_delays_json(algorithm, dataset, tol_sup1, delays_dict_sup1)
-            write_delays_json(algorithm, dataset, tol_sup2, delays_dict_sup2)
-            write_perf_csv(algorithm, dataset, int(tol), final_performances_tol)
-            write_perf_csv(algorithm, dataset, tol_sup1, final_performances_sup1)
-            write_perf_csv(algorithm, dataset, tol_sup2, final_performances_sup2)
-            print(f'Evaluation of performances of {algorithm} on dataset {dataset} was successful....')
-            break
-
-
-main()
+    if not sweep and tol is None:
+        raise click.UsageError('Missing option --tol (or --sweep)')
+    if sweep and tol is not None:
+        print(f'Option --tol is ignored by the tolerance sweep (from 0 to {sweep_max} ms)....')
+    detections_dict = read_detections(dataset, algorithm)
+    annotations_dict = read_annotations(dataset)
+    if sweep:
+        print(f'Tolerance sweep of {algorithm} on dataset {dataset} is running....')
+        sweep_df = sweep_tolerances(records[dataset], detections_dict, annotations_dict, sampling_frequency[dataset],
+                                    list(range(0, sweep_max + 1, sweep_step)), matching)
+        write_sweep_csv(algorithm, dataset, sweep_df)
+        print(f'Tolerance sweep of {algorithm} on dataset {dataset} was successful....')
+        return
+    # the evaluation of every channel also gives the one of the first channel
+    if channels:
+        evaluate_dataset_channels(algorithm, dataset, [tol, tol_sup1, tol_sup2], detections_dict, annotations_dict,
+                                  fusion_window, fusion_votes, matching=matching, raw_delays=raw_delays)
+    else:
+        evaluate_dataset(algorithm, dataset, [tol, tol_sup1, tol_sup2], detections_dict, annotations_dict,
+                         matching=matching, raw_delays=raw_delays)
+
+
+if __name__ == '__main__':
+    main()
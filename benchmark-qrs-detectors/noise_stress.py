@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script measures the robustness of a QRS detector to noise. Noise stress test signals are synthesized on the fly
+from records of the MIT-BIH Arrhythmia Database and noise records of the MIT-BIH Noise Stress Test Database, for many
+signal-to-noise ratios and types of noise (see noise_stress_helper). QRS detection is performed on the first channel of
+each synthesized signal and evaluated against the beat annotations of the clean record. Obtained results (criteria and
+scores of each record and of every record together, for each noise and ratio) are saved in a csv file."""
+
+import os
+import click
+from dataset_helper import *
+from algo_helper import *
+from get_annotations import get_annotations_dataset
+from get_perf import compute_confusion_matrices_and_delays, get_scores
+from noise_stress_helper import clean_dataset, noise_types, iter_noise_stress
+
+# signal-to-noise ratios (in dB) used by default, from -12 dB to 26 dB by steps of 2 dB
+default_snrs = list(range(-12, 28, 2))
+
+
+def write_noise_stress_csv(algorithm: str, noise_stress_df: pd.DataFrame) -> None:
+    """
+    write criteria and scores of the detection on noise stress test signals from a DataFrame in a csv file.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param noise_stress_df: criteria and scores for each noise, ratio and record
+    :type noise_stress_df: DataFrame
+    """
+    os.makedirs(f'output/noise_stress', exist_ok=True)
+    noise_stress_df.to_csv(f'output/noise_stress/{algorithm}.csv', sep=',', index=False)
+
+
+# parse arguments
+@click.command()
+@click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
+@click.option('--snr', multiple=True, type=float,
+              help='signal-to-noise ratio (in dB), option can be repeated, from -12 to 26 dB by steps of 2 dB if '
+                   'omitted')
+@click.option('--noise', multiple=True, type=click.Choice(noise_types),
+              help='noise record (electrode motion, muscle artifact or baseline wander), option can be repeated, every '
+                   'noise if omitted')
+@click.option('--record', multiple=True, help=f'record of {clean_dataset}, option can be repeated, every record if '
+                                              f'omitted')
+@click.option('--batch', default=4, type=click.IntRange(1, None),
+              help='number of signal-to-noise ratios whose signals are computed together, type=int')
+@click.option('--tol', default=50, type=click.IntRange(0, 1000, clamp=True),
+              help='tolerance of the evaluation (in ms), type=int')
+def main(algo: str, snr: Tuple[float], noise: Tuple[str], record: Tuple[str], batch: int, tol: int) -> None:
+    algorithm = algo
+    snrs = list(snr) if len(snr) > 0 else default_snrs
+    selected_noises = list(noise) if len(noise) > 0 else noise_types
+    record_ids = get_record_ids(clean_dataset, list(record) if len(record) > 0 else None)
+    fs = sampling_frequency[clean_dataset]
+    tolerance_fr = int((tol * fs) / 1000)
+    annotations_dict = get_annotations_dataset(clean_dataset, record_ids)
+
+    counts = []
+    total = len(record_ids) * len(selected_noises) * len(snrs)
+    print(f'Detection with {algorithm} on noise stress test signals of {len(record_ids)} records is running....')
+    for counter, (record_id, noise_type, record_snr, _, sigs) in enumerate(
+            iter_noise_stress(snrs, selected_noises, record_ids, channels=[0], batch_size=batch), start=1):
+        detections = run_algo(algorithm, sigs[:, 0], fs)
+        [[confusion_matrix, _]] = compute_confusion_matrices_and_delays(detections, annotations_dict[record_id],
+                                                                        [tolerance_fr])
+        counts.append([noise_type, record_snr, record_id, len(annotations_dict[record_id])] + confusion_matrix)
+        print(f'{counter}/{total}')
+
+    noise_stress_df = pd.DataFrame(counts, columns=['noise', 'snr(dB)', 'record', 'nbofbeats', 'TP', 'FP', 'FN'])
+    global_df = noise_stress_df.groupby(['noise', 'snr(dB)'], as_index=False, sort=False)[
+        ['nbofbeats', 'TP', 'FP', 'FN']].sum()
+    global_df.insert(2, 'record', 'global')
+    noise_stress_df = pd.concat([noise_stress_df, global_df], ignore_index=True)
+    scores = [get_scores(*counts_line) for counts_line in noise_stress_df[['TP', 'FP', 'FN']].to_numpy()]
+    noise_stress_df[['P+(%)', 'Se(%)', 'F1(%)']] = pd.DataFrame(scores, index=noise_stress_df.index)
+    write_noise_stress_csv(algorithm, noise_stress_df)
+    print(noise_stress_df[noise_stress_df['record'] == 'global'].pivot(index='snr(dB)', columns='noise',
+                                                                        values='F1(%)'))
+    print(f'Detection with {algorithm} on noise stress test signals was successful....')
+
+
+if __name__ == '__main__':
+    main()
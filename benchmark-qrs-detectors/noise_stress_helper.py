@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script synthesizes noise stress test signals on the fly, as nst of WFDB built the MIT-BIH Noise Stress Test
+Database: clean records of the MIT-BIH Arrhythmia Database are mixed with a noise record of this database (electrode
+motion, muscle artifact or baseline wander) scaled to a chosen signal-to-noise ratio, with the same schedule of noisy
+segments. Clean records and noise records are read through the cache of cache_helper, and signals of several SNRs are
+computed together in batches and given one by one, so that no intermediate file is written."""
+
+import numpy
+from typing import Generator, List, Optional, Tuple
+
+from dataset_helper import dataset_descriptors, get_record_ids
+from cache_helper import read_record_array, read_record_header
+from get_annotations import read_beat_annotations
+
+# dataset of clean records and database of noise records
+clean_dataset = 'mit-bih-arrhythmia'
+noise_database = 'mit-bih-noise-stress-test-database'
+# noise records of the database: electrode motion, muscle artifact and baseline wander
+noise_types = ['em', 'ma', 'bw']
+
+# schedule of nst (in seconds): clean signal during the first 5 minutes, then alternately 2 minutes with noise and 2
+# minutes without noise
+noise_start = 300
+noise_segment = 120
+# half width of the interval around each annotation where the amplitude of the QRS complex is measured (in seconds)
+qrs_half_width = 0.05
+
+
+def get_noise_schedule(sig_len: int, freq_sampling: int, start: float = noise_start,
+                       segment: float = noise_segment) -> numpy.ndarray:
+    """
+    get the samples of a signal where noise is added: none before start, then alternately segments with noise and
+    segments without noise of the same duration.
+
+    :param sig_len: number of samples of the signal
+    :type sig_len: int
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param start: time of the beginning of the first noisy segment (in seconds)
+    :type start: float
+    :param segment: duration of each segment (in seconds)
+    :type segment: float
+    :return: True for each noisy sample
+    :rtype: ndarray
+    """
+    times = numpy.arange(sig_len) / freq_sampling - start
+    return (times >= 0) & (numpy.mod(times, 2 * segment) < segment)
+
+
+def get_signal_powers(sigs: numpy.ndarray, frames_annotations: numpy.ndarray, freq_sampling: int) -> numpy.ndarray:
+    """
+    compute the power of the ECG of each channel as nst does, from the amplitude of QRS complexes: the power of a sine
+    wave whose peak-to-peak amplitude is the median peak-to-peak amplitude of QRS complexes, that is amplitude ** 2 / 8.
+
+    :param sigs: values of sampled signals (one column per channel)
+    :type sigs: ndarray
+    :param frames_annotations: localisations of QRS complexes
+    :type frames_annotations: ndarray
+    :param freq_sampling: value of sampling frequency of the signals
+    :type freq_sampling: int
+    :return: power of each channel
+    :rtype: ndarray
+    """
+    half_width = int(qrs_half_width * freq_sampling)
+    frames = numpy.clip(numpy.asarray(frames_annotations)[:, numpy.newaxis] +
+                        numpy.arange(-half_width, half_width + 1), 0, sigs.shape[0] - 1)
+    amplitudes = numpy.ptp(sigs[frames], axis=1)
+    return numpy.nanmedian(amplitudes, axis=0) ** 2 / 8
+
+
+def get_noise_powers(noises: numpy.ndarray, freq_sampling: int) -> numpy.ndarray:
+    """
+    compute the power of the noise of each channel as nst does: mean over windows of one second of the power of the
+    noise around its mean in the window, so that a slow drift of the baseline is not counted.
+
+    :param noises: values of sampled noises (one column per channel)
+    :type noises: ndarray
+    :param freq_sampling: value of sampling frequency of the noises
+    :type freq_sampling: int
+    :return: power of each channel
+    :rtype: ndarray
+    """
+    nb_windows = noises.shape[0] // freq_sampling
+    windows = noises[:nb_windows * freq_sampling].reshape(nb_windows, freq_sampling, noises.shape[1])
+    return numpy.nanmean(numpy.nanvar(windows, axis=1), axis=0)
+
+
+def get_noise_gains(signal_powers: numpy.ndarray, noise_powers: numpy.ndarray, snrs: List[float]) -> numpy.ndarray:
+    """
+    compute the gains of the noise of each channel which give each signal-to-noise ratio, for all ratios at once.
+
+    :param signal_powers: power of the ECG of each channel
+    :type signal_powers: ndarray
+    :param noise_powers: power of the noise of each channel
+    :type noise_powers: ndarray
+    :param snrs: signal-to-noise ratios (in dB)
+    :type snrs: list(float)
+    :return: gains of the noise (one line per ratio, one column per channel)
+    :rtype: ndarray
+    """
+    snrs = numpy.asarray(snrs, dtype=numpy.float64)[:, numpy.newaxis]
+    return numpy.sqrt(signal_powers / (noise_powers * 10 ** (snrs / 10)))
+
+
+def read_noise(noise_type: str, sig_len: int, nb_channels: int, freq_sampling: int) -> numpy.ndarray:
+    """
+    read a noise record of the noise stress test database, fitted to a signal: it is repeated if it is shorter than the
+    signal and its channels are repeated if the signal has more channels.
+
+    :param noise_type: name of the noise record ('em', 'ma' or 'bw')
+    :type noise_type: str
+    :param sig_len: number of samples of the signal
+    :type sig_len: int
+    :param nb_channels: number of channels of the signal
+    :type nb_channels: int
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :return: values of the sampled noise (one column per channel)
+    :rtype: ndarray
+    """
+    noise_fs = read_record_header(noise_database, noise_type)['fs']
+    if noise_fs != freq_sampling:
+        raise ValueError(f'Sorry... noise {noise_type} is sampled at {noise_fs} Hz and signals at {freq_sampling} Hz')
+    _, noises = read_record_array(noise_database, noise_type)
+    return noises[numpy.arange(sig_len) % noises.shape[0]][:, numpy.arange(nb_channels) % noises.shape[1]]
+
+
+def iter_noise_stress(snrs: List[float], selected_noises: Optional[List[str]] = None,
+                      record_ids: Optional[List[str]] = None, channels: Optional[List[int]] = None,
+                      batch_size: int = 4) \
+        -> Generator[Tuple[str, str, float, List[str], numpy.ndarray], None, None]:
+    """
+    synthesize noise stress test signals from clean records for every signal-to-noise ratio and type of noise. Each
+    clean record and its annotations are read once, the noise is scaled for every ratio at once, and signals of
+    batch_size ratios are computed together in a 3-D array (ratios x samples x channels) before being given one by one.
+    Annotations of the clean records are those of the synthesized signals.
+
+    :param snrs: signal-to-noise ratios (in dB)
+    :type snrs: list(float)
+    :param selected_noises: names of the noise records to use (every one of noise_types if None)
+    :type selected_noises: list(str)
+    :param record_ids: IDs of the clean records to use (every record of clean_dataset if None)
+    :type record_ids: list(str)
+    :param channels: indexes of the channels to synthesize (every channel if None)
+    :type channels: list(int)
+    :param batch_size: number of ratios whose signals are computed together
+    :type batch_size: int
+    :return: ID of the record, name of the noise, signal-to-noise ratio, names of the channels and values of
+    sampled signals (one column per channel)
+    :rtype: tuple(str, str, float, list(str), ndarray)
+    """
+    descriptor = dataset_descriptors[clean_dataset]
+    for record_id in get_record_ids(clean_dataset, record_ids):
+        sig_names, clean_sigs = read_record_array(descriptor.database, record_id, channels)
+        schedule = get_noise_schedule(clean_sigs.shape[0], descriptor.fs)
+        signal_powers = get_signal_powers(clean_sigs, read_beat_annotations(descriptor.database, record_id),
+                                          descriptor.fs)
+        for noise_type in noise_types if selected_noises is None else selected_noises:
+            noises = read_noise(noise_type, clean_sigs.shape[0], clean_sigs.shape[1], descriptor.fs)
+            gains = get_noise_gains(signal_powers, get_noise_powers(noises, descriptor.fs), snrs)
+            noises[~schedule] = 0
+            for batch_start in range(0, len(snrs), batch_size):
+                batch_gains = gains[batch_start:batch_start + batch_size]
+                batch = clean_sigs[numpy.newaxis] + batch_gains[:, numpy.newaxis, :] * noises[numpy.newaxis]
+                for snr, sigs in zip(snrs[batch_start:batch_start + batch_size], batch):
+                    yield record_id, noise_type, snr, sig_names, sigs
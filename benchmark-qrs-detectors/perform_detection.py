@@ -1,60 +1,249 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """This script gets chosen algorithm and dataset to perform detection thanks to methods from algo_helper and
-dataset_helper modules. Obtained results (localisations of QRS for each channel of the entire dataset) are saved in json
- files."""
+dataset_helper modules. Obtained results (localisations of QRS for each channel of the entire dataset) are saved in
+binary files (or exported in json files) thanks to storage_helper. Detections of each channel are also cached by
+detection_cache_helper as soon as they are performed, so that an interrupted run resumes where it stopped and channels
+already processed with the same algorithm, parameters and signal are not processed again. With --profile, every
+channel is processed again and its wall time, CPU time, peak resident memory and throughput are saved in the database
+of results (see profiling_helper). With --resample, signals are resampled to a common sampling frequency before the
+detection (see resampling_helper). Without parallel processes, the next records are read by a background thread while
+a record is processed (see prefetch_helper). With --dtype, signals are read as physical values in float32 or as digital
+samples, to reduce the memory of records, and converted to a dtype taken by the algorithm (see run_algo)."""
 
-import os
-import json
+import time
 import click
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import Connection, wait
 from dataset_helper import *
 from algo_helper import *
+from storage_helper import storage_formats, write_detections
+from detection_cache_helper import run_algo_cached, run_algo_multichannel_cached
+from results_helper import write_profiles
+from prefetch_helper import default_prefetch_depth, default_prefetch_memory, prefetch
 
 
-def write_detections_json(dataset: str, algorithm: str, dict_detections: Dict[str, Dict[str, List[int]]]) -> None:
+def detect_record_channel(algorithm: str, dataset: str, record_id: str, sig_name: str, profile: bool = False,
+                          trace_memory: bool = False, target_frequency: Optional[int] = None,
+                          dtype: str = 'float64') -> Tuple[str, str, List[int], List[Dict]]:
     """
-    write results of QRS detection from a dictionary in a json file.
+    work unit of the parallel mode: read one channel of one record and perform QRS detection on it (or read its cached
+    detections). The signal is read by the worker itself so that only IDs and detections are exchanged between
+    processes.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param record_id: ID of the record
+    :type record_id: str
+    :param sig_name: name of the channel
+    :type sig_name: str
+    :param profile: measure the detection (performed even if it is cached)
+    :type profile: bool
+    :param trace_memory: also measure the peak of memory allocated during the detection when it is profiled
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param dtype: dtype in which the signal is read, among signal_dtypes
+    :type dtype: str
+    :return: ID of the record, name of the channel, localisations of qrs detections and measures of the detection (empty
+    without profiling)
+    :rtype: tuple(str, str, list(int), list(dict))
+    """
+    profiles = [] if profile else None
+    sig = read_record_channel(dataset, record_id, sig_name, dtype)
+    calibration = get_record_calibration(dataset, record_id, [sig_name]) if dtype == 'digital' else None
+    qrs_frames = run_algo_cached(algorithm, sig, sampling_frequency[dataset], record_id, sig_name, profiles,
+                                 trace_memory, target_frequency, calibration)
+    return record_id, sig_name, qrs_frames, profiles or []
+
+
+def detection_worker(connection: Connection) -> None:
+    """
+    loop of a worker process of the parallel mode: receive the arguments of detect_record_channel for one unit at a
+    time, and send back whether the unit succeeded with its results or its error, until None is received.
+
+    :param connection: end of the pipe shared with the main process
+    :type connection: Connection
+    """
+    while True:
+        unit_args = connection.recv()
+        if unit_args is None:
+            return
+        try:
+            connection.send((True, detect_record_channel(*unit_args)))
+        except Exception as error:
+            connection.send((False, f'{type(error).__name__}: {error}'))
+
+
+def start_detection_worker() -> Tuple[Connection, multiprocessing.Process]:
+    """
+    start a worker process of the parallel mode (see detection_worker).
+
+    :return: end of the pipe of the main process and worker process
+    :rtype: tuple(Connection, Process)
+    """
+    connection, worker_connection = multiprocessing.Pipe()
+    worker = multiprocessing.Process(target=detection_worker, args=(worker_connection,), daemon=True)
+    worker.start()
+    worker_connection.close()
+    return connection, worker
+
+
+def parallel_detection(dataset: str, algorithm: str, jobs: int, timeout: int, profiles: Optional[List[Dict]] = None,
+                       trace_memory: bool = False, target_frequency: Optional[int] = None, dtype: str = 'float64') \
+        -> Dict[str, Dict[str, List[int]]]:
+    """
+    perform QRS detection on every (record, channel) unit of a dataset with worker processes, each one processing one
+    unit at a time. The timeout is enforced by the main process: a worker whose unit exceeds it is killed, even inside a
+    long call of a compiled library, and replaced by a new worker. Results are gathered in the order of records and
+    channels of the dataset, whatever the order of completion of the units.
 
     :param dataset: name of the studied dataset
     :type dataset: str
     :param algorithm: name of the used method for QRS detection
     :type algorithm: str
-    :param dict_detections: results of QRS detections (localisations) for each record and each channel
-    :type dict_detections: dict(str, dict(str, list(int)))
+    :param jobs: number of worker processes
+    :type jobs: int
+    :param timeout: maximal duration of each unit in seconds (0 for no limit)
+    :type timeout: int
+    :param profiles: list where measures of the detection of each unit are added (no profiling if None)
+    :type profiles: list(dict)
+    :param trace_memory: also measure the peak of memory allocated during the detection when it is profiled
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which signals are resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param dtype: dtype in which signals are read, among signal_dtypes
+    :type dtype: str
+    :return: results of QRS detections (localisations) for each record and each channel
+    :rtype: dict(str, dict(str, list(int)))
     """
-    os.makedirs(f'output/frames', exist_ok=True)
-    with open(f'output/frames/{algorithm}_{dataset}.json', 'w') as outfile:
-        json.dump(dict_detections, outfile)
+    records_dict = records[dataset]
+    units = [(record_id, sig_name) for record_id, sig_names in records_dict.items() for sig_name in sig_names]
+    pending_units = deque(units)
+    unit_detections = {}
+    failed_units = []
+    idle_workers = [start_detection_worker() for _ in range(min(jobs, len(units)))]
+    # unit processed by each busy worker, with the worker and the start time of the unit
+    busy_workers = {}
+    counter = 0
+    try:
+        while len(pending_units) > 0 or len(busy_workers) > 0:
+            while len(pending_units) > 0 and len(idle_workers) > 0:
+                connection, worker = idle_workers.pop()
+                record_id, sig_name = pending_units.popleft()
+                connection.send((algorithm, dataset, record_id, sig_name, profiles is not None, trace_memory,
+                                 target_frequency, dtype))
+                busy_workers[connection] = (worker, (record_id, sig_name), time.monotonic())
+            wait_time = None if timeout == 0 else \
+                max(min(start + timeout for _, _, start in busy_workers.values()) - time.monotonic(), 0)
+            finished_units = []
+            for connection in wait(list(busy_workers), wait_time):
+                worker, unit, _ = busy_workers.pop(connection)
+                try:
+                    finished_units.append((unit, *connection.recv()))
+                    idle_workers.append((connection, worker))
+                except EOFError:
+                    worker.join()
+                    finished_units.append((unit, False, f'worker process exited with code {worker.exitcode}'))
+                    idle_workers.append(start_detection_worker())
+            for connection, (worker, unit, start) in list(busy_workers.items()):
+                if timeout > 0 and time.monotonic() - start >= timeout:
+                    worker.kill()
+                    worker.join()
+                    del busy_workers[connection]
+                    finished_units.append((unit, False, f'TimeoutError: detection unit exceeded its timeout of '
+                                                        f'{timeout}s'))
+                    idle_workers.append(start_detection_worker())
+            for (record_id, sig_name), success, result in finished_units:
+                counter += 1
+                if success:
+                    _, _, qrs_frames, unit_profiles = result
+                    unit_detections[(record_id, sig_name)] = qrs_frames
+                    if profiles is not None:
+                        profiles.extend(unit_profiles)
+                    print(f'{counter}/{len(units)} record {record_id} channel {sig_name}')
+                else:
+                    failed_units.append(f'{record_id}/{sig_name} ({result})')
+                    print(f'{counter}/{len(units)} record {record_id} channel {sig_name} failed')
+    finally:
+        for connection, _ in idle_workers:
+            connection.send(None)
+        for worker, _, _ in busy_workers.values():
+            worker.kill()
+        for connection, worker in idle_workers:
+            worker.join()
+    if len(failed_units) > 0:
+        raise click.ClickException(f'Detection with {algorithm} on dataset {dataset} failed for units: '
+                                   f'{", ".join(sorted(failed_units))}')
+    return {record_id: {sig_name: unit_detections[(record_id, sig_name)] for sig_name in sig_names}
+            for record_id, sig_names in records_dict.items()}
 
 
 # parse arguments
 @click.command()
 @click.option('--data', required=True, type=click.Choice(datasets_list, case_sensitive=False), help='dataset')
 @click.option('--algo', required=True, type=click.Choice(algorithms_list, case_sensitive=True), help='algorithm')
-def main(data: str, algo: str) -> None:
+@click.option('--jobs', default=1, type=click.IntRange(1, None), help='number of worker processes, type=int')
+@click.option('--timeout', default=0, type=click.IntRange(0, None),
+              help='maximal duration of one (record, channel) unit in parallel mode, whose worker process is killed '
+                   'beyond it (in s, 0 for no limit), type=int')
+@click.option('--format', 'storage_format', default='npy', type=click.Choice(storage_formats),
+              help='format of the saved detections (binary npy file with its index or json export)')
+@click.option('--profile', is_flag=True,
+              help='measure wall time, CPU time, peak resident memory and throughput of the detection of every channel '
+                   '(cached detections are performed again), saved in the database of results')
+@click.option('--trace-memory', is_flag=True,
+              help='with --profile, also measure the peak of memory allocated during the detection, in a second run '
+                   'traced by tracemalloc (about ten times slower)')
+@click.option('--resample', type=click.IntRange(1, None),
+              help='sampling frequency (in Hz) at which signals are resampled before the detection, detections being '
+                   'mapped back to samples of the records (frequency of the dataset if omitted), type=int')
+@click.option('--prefetch', 'prefetch_depth', default=default_prefetch_depth, type=click.IntRange(0, None),
+              help='number of records read in advance by a background thread while a record is processed, without '
+                   'parallel processes (0 to read records one after the other, always 0 with --profile), type=int')
+@click.option('--prefetch-memory', default=default_prefetch_memory, type=click.IntRange(1, None),
+              help='maximal memory of the records read in advance (in MB), type=int')
+@click.option('--dtype', default='float64', type=click.Choice(signal_dtypes),
+              help='dtype in which signals are read: physical values in float64 or float32, or digital samples with '
+                   'their calibration (converted to a dtype taken by the algorithm for the detection)')
+def main(data: str, algo: str, jobs: int, timeout: int, storage_format: str, profile: bool,
+         trace_memory: bool, resample: Optional[int], prefetch_depth: int, prefetch_memory: int, dtype: str) -> None:
     dataset = data
     algorithm = algo
-    data_generator = dataset_generators[dataset]
-    records_dict = records[dataset]
+    profiles = [] if profile else None
+    if jobs > 1:
+        print(f'Detection with {algorithm} on dataset {dataset} is running on {jobs} processes....')
+        detections_dict = parallel_detection(dataset, algorithm, jobs, timeout, profiles, trace_memory,
+                                             resample, dtype)
+        write_detections(dataset, algorithm, detections_dict, storage_format)
+        if profile:
+            write_profiles(algorithm, dataset, profiles, get_algo_version(algorithm))
+        print(f'Detection with {algorithm} on dataset {dataset} was successful....')
+        return
+    records_ids = get_record_ids(dataset)
 
     detections_dict = {}
-    counter = 0
     print(f'Detection with {algorithm} on dataset {dataset} is running....')
-    while True:
-        try:
-            record_id, record_sigs = next(data_generator)
-            sig_names = records_dict[str(record_id)]
-            detections_rec_dict = {}
-            for id_sig in range(len(sig_names)):
-                qrs_frames = run_algo(algorithm, record_sigs[sig_names[id_sig]], sampling_frequency[dataset])
-                detections_rec_dict[sig_names[id_sig]] = qrs_frames
-            detections_dict[record_id] = detections_rec_dict
-            counter += 1
-            print(f'{counter}/{len(records_dict.keys())}')
-        except StopIteration:
-            write_detections_json(dataset, algorithm, detections_dict)
-            print(f'Detection with {algorithm} on dataset {dataset} was successful....')
-            break
-
-
-main()
+    # records read in advance would be measured with the detection
+    with prefetch(iter_dataset_arrays(dataset, dtype=dtype), 0 if profile else prefetch_depth,
+                  prefetch_memory) as records_iterator:
+        for counter, (record_id, sig_names, p_signal) in enumerate(records_iterator, start=1):
+            calibration = get_record_calibration(dataset, record_id, sig_names) if dtype == 'digital' else None
+            detections_dict[record_id] = run_algo_multichannel_cached(algorithm, p_signal,
+                                                                      sampling_frequency[dataset], record_id,
+                                                                      sig_names, profiles, trace_memory, resample,
+                                                                      calibration)
+            print(f'{counter}/{len(records_ids)}')
+    write_detections(dataset, algorithm, detections_dict, storage_format)
+    if profile:
+        write_profiles(algorithm, dataset, profiles, get_algo_version(algorithm))
+    print(f'Detection with {algorithm} on dataset {dataset} was successful....')
+
+
+if __name__ == '__main__':
+    main()
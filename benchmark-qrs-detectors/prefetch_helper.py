@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a prefetcher of records: records given by a generator (such as iter_dataset_arrays of
+dataset_helper) are read in advance by a background thread, while the previous ones are processed, so that reading
+and decoding files (slow on cold caches or network-mounted data directories) overlaps with QRS detection instead of
+alternating with it. Records read in advance wait in a queue bounded by a number of records and by a memory ceiling."""
+
+import threading
+import numpy
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, ContextManager, Iterable, Iterator, Optional
+
+# number of records read in advance by default
+default_prefetch_depth = 2
+# maximal memory of the records waiting in the queue by default (in MB)
+default_prefetch_memory = 2048
+
+
+def get_item_size(item: Any) -> int:
+    """
+    get the memory used by the arrays of an item given by a generator of records (arrays in tuples, lists or dicts are
+    counted, other values are ignored).
+
+    :param item: item given by the generator
+    :type item: any
+    :return: number of bytes of the arrays of the item
+    :rtype: int
+    """
+    if isinstance(item, numpy.ndarray):
+        return item.nbytes
+    if isinstance(item, dict):
+        return sum(get_item_size(value) for value in item.values())
+    if isinstance(item, (tuple, list)):
+        return sum(get_item_size(value) for value in item)
+    return 0
+
+
+class Prefetcher:
+    """
+    iterator which gives the items of another iterator in the same order, items being produced in advance by a
+    background thread. At most depth items wait in the queue, and an item is only queued if the arrays of the queued
+    items stay below max_memory MB (an item is always queued when the queue is empty, so that a record larger than the
+    ceiling is still read). Besides the queue, the thread holds the item being read, so that at most depth + 1 records
+    are read in advance. An exception raised by the iterator is raised again by next, after the items read before it.
+    The background thread holds a reference to the prefetcher until the iterator is exhausted, so a prefetcher which is
+    not read until the end must be closed, for example by using it as a context manager.
+    """
+
+    def __init__(self, iterable: Iterable, depth: int = default_prefetch_depth,
+                 max_memory: Optional[float] = default_prefetch_memory):
+        """
+        :param iterable: items to read in advance, such as a generator of records
+        :type iterable: iterable
+        :param depth: maximal number of items waiting in the queue (at least 1)
+        :type depth: int
+        :param max_memory: maximal memory of the arrays of the items waiting in the queue in MB (no limit if None)
+        :type max_memory: float
+        """
+        self.iterator = iter(iterable)
+        self.depth = max(depth, 1)
+        self.max_bytes = None if max_memory is None else int(max_memory * 2 ** 20)
+        self.items = deque()
+        self.queued_bytes = 0
+        self.finished = False
+        self.closed = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.produce, name='record-prefetcher', daemon=True)
+        self.thread.start()
+
+    def can_queue(self, size: int) -> bool:
+        """
+        check if an item can be added to the queue (to be called with the condition acquired).
+
+        :param size: number of bytes of the arrays of the item
+        :type size: int
+        :return: True if the item can be queued or if the prefetcher is closed
+        :rtype: bool
+        """
+        if self.closed or len(self.items) == 0:
+            return True
+        return len(self.items) < self.depth and (self.max_bytes is None or self.queued_bytes + size <= self.max_bytes)
+
+    def produce(self) -> None:
+        """
+        read items of the iterator and add them to the queue, waiting while the queue is full. Run by the background
+        thread.
+        """
+        try:
+            for item in self.iterator:
+                size = get_item_size(item)
+                with self.condition:
+                    self.condition.wait_for(lambda: self.can_queue(size))
+                    if self.closed:
+                        return
+                    self.items.append((item, size))
+                    self.queued_bytes += size
+                    self.condition.notify_all()
+        except BaseException as error:
+            with self.condition:
+                self.error = error
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self) -> Any:
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.items) > 0 or self.finished)
+            if len(self.items) > 0:
+                item, size = self.items.popleft()
+                self.queued_bytes -= size
+                self.condition.notify_all()
+                return item
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise error
+            raise StopIteration
+
+    def close(self) -> None:
+        """
+        stop reading items in advance and release the queued items. The background thread stops after the item it is
+        reading.
+        """
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.queued_bytes = 0
+            self.condition.notify_all()
+
+    def __enter__(self) -> 'Prefetcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def prefetch(iterable: Iterable, depth: int = default_prefetch_depth,
+             max_memory: Optional[float] = default_prefetch_memory) -> ContextManager[Iterator]:
+    """
+    read the items of an iterable in advance with a Prefetcher, or one after the other if depth is 0. The result is a
+    context manager giving the iterator of items, so that the background thread stops when leaving the with block, even
+    after an exception.
+
+    :param iterable: items to read in advance, such as a generator of records
+    :type iterable: iterable
+    :param depth: maximal number of items waiting in the queue (0 to read items only when they are asked for)
+    :type depth: int
+    :param max_memory: maximal memory of the arrays of the items waiting in the queue in MB (no limit if None)
+    :type max_memory: float
+    :return: context manager giving the items of the iterable, in the same order
+    :rtype: context manager(iterator)
+    """
+    if depth == 0:
+        return nullcontext(iter(iterable))
+    return Prefetcher(iterable, depth, max_memory)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script measures the cost of QRS detection on one channel of a record: wall time, CPU time of the process, peak
+resident memory of the process during the detection (on Linux) and, optionally, peak of memory allocated during the
+detection (traced by tracemalloc, which also follows numpy buffers). The throughput in samples per second is derived
+from the wall time. These measures are saved next to the results of evaluations to compare algorithms on speed and
+memory as well as on accuracy."""
+
+import gc
+import time
+import tracemalloc
+import numpy
+from typing import Dict, List, Optional, Tuple
+
+from algo_helper import run_algo
+from cache_helper import SignalCalibration
+
+# files of the Linux kernel giving the peak resident memory of the process (VmHWM) and allowing to reset it
+proc_status_path = '/proc/self/status'
+proc_clear_refs_path = '/proc/self/clear_refs'
+
+
+def reset_peak_rss() -> bool:
+    """
+    reset the peak resident memory of the current process to its current resident memory, so that the next measure
+    only covers what follows (ru_maxrss of the resource module cannot be reset and would keep the peaks of previous
+    detections, of any algorithm).
+
+    :return: True if the peak was reset (only on Linux)
+    :rtype: bool
+    """
+    try:
+        with open(proc_clear_refs_path, 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def get_peak_rss() -> Optional[float]:
+    """
+    get the peak resident memory of the current process since its last reset by reset_peak_rss.
+
+    :return: peak resident memory in MB (None if it cannot be measured on this platform)
+    :rtype: float
+    """
+    try:
+        with open(proc_status_path) as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    return None
+
+
+def get_traced_peak_memory(algorithm: str, sig: numpy.ndarray, freq_sampling: int,
+                           target_frequency: Optional[int] = None,
+                           calibration: Optional[SignalCalibration] = None) -> float:
+    """
+    run a qrs detector on a signal while tracing memory allocations, to measure the peak of memory allocated during the
+    detection. Memory is traced only during the call, so that the peak does not include the signal itself.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sig: values of the sampled signal to study
+    :type sig: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param calibration: calibration of the signal, required if sig holds digital samples
+    :type calibration: SignalCalibration
+    :return: peak of memory allocated during the detection in MB
+    :rtype: float
+    """
+    gc.collect()
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        tracemalloc.stop()
+    tracemalloc.start()
+    try:
+        run_algo(algorithm, sig, freq_sampling, target_frequency, calibration)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if was_tracing:
+            tracemalloc.start()
+    return peak_memory / 2 ** 20
+
+
+def profile_run_algo(algorithm: str, sig: numpy.ndarray, freq_sampling: int, trace_memory: bool = False,
+                     target_frequency: Optional[int] = None,
+                     calibration: Optional[SignalCalibration] = None) -> Tuple[List[int], Dict]:
+    """
+    run a qrs detector on a signal and measure its cost. Tracing memory allocations slows down detectors by about ten
+    times, so times are measured on a run without tracing, and the peak of allocated memory is measured on a second
+    run, only if trace_memory is True.
+
+    :param algorithm: name of the qrs detector to use
+    :type algorithm: str
+    :param sig: values of the sampled signal to study
+    :type sig: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param trace_memory: also measure the peak of memory allocated during the detection (second run)
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which the signal is resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param calibration: calibration of the signal, required if sig holds digital samples
+    :type calibration: SignalCalibration
+    :return: localisations of qrs detections and measures of the detection (samples, wall_time and cpu_time in s,
+    peak_memory and peak_rss in MB, samples_per_second)
+    :rtype: tuple(list(int), dict)
+    """
+    gc.collect()
+    # peak resident memory of this detection only, not of previous channels and algorithms
+    is_peak_rss_reset = reset_peak_rss()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    qrs_frames = run_algo(algorithm, sig, freq_sampling, target_frequency, calibration)
+    wall_time = time.perf_counter() - start_wall
+    cpu_time = time.process_time() - start_cpu
+    peak_rss = get_peak_rss() if is_peak_rss_reset else None
+    peak_memory = get_traced_peak_memory(algorithm, sig, freq_sampling, target_frequency,
+                                         calibration) if trace_memory else None
+    profile = {
+        'samples': len(sig),
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'peak_memory': peak_memory,
+        'peak_rss': peak_rss,
+        'samples_per_second': len(sig) / wall_time if wall_time > 0 else None
+    }
+    return qrs_frames, profile
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script resamples signals between sampling frequencies, so that a detector can run at its native frequency or
+at a common frequency whatever the frequency of the dataset. Signals are resampled by polyphase filtering
+(scipy.signal.resample_poly), whose low-pass filter is designed once for each ratio of frequencies, and detections
+found on resampled signals are mapped back to samples of the original signals, to be compared with annotations."""
+
+import numpy
+from math import gcd
+from functools import lru_cache
+from scipy import signal as sp_signal
+from typing import List, Tuple
+
+# window of the low-pass filter of polyphase resampling (default of scipy.signal.resample_poly)
+resampling_window = ('kaiser', 5.0)
+
+
+def get_resampling_ratio(freq_sampling: int, target_frequency: int) -> Tuple[int, int]:
+    """
+    get the irreducible upsampling and downsampling factors between two sampling frequencies.
+
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency of the resampled signal
+    :type target_frequency: int
+    :return: upsampling and downsampling factors
+    :rtype: tuple(int, int)
+    """
+    divisor = gcd(int(freq_sampling), int(target_frequency))
+    return int(target_frequency) // divisor, int(freq_sampling) // divisor
+
+
+@lru_cache(maxsize=None)
+def get_resampling_filter(up: int, down: int) -> numpy.ndarray:
+    """
+    design the low-pass FIR filter of polyphase resampling for upsampling and downsampling factors, as
+    scipy.signal.resample_poly does. Filters are cached, so that each one is designed only once.
+
+    :param up: upsampling factor
+    :type up: int
+    :param down: downsampling factor
+    :type down: int
+    :return: coefficients of the filter (read-only)
+    :rtype: ndarray
+    """
+    max_rate = max(up, down)
+    coefficients = sp_signal.firwin(2 * 10 * max_rate + 1, 1 / max_rate, window=resampling_window)
+    coefficients.setflags(write=False)
+    return coefficients
+
+
+def resample_signals(sigs: numpy.ndarray, freq_sampling: int, target_frequency: int) -> numpy.ndarray:
+    """
+    resample a signal, or every column of a 2-D array (samples x channels), to another sampling frequency. The delay of
+    the filter is compensated, so that a sample of the resampled signal is at the same time as in the original signal.
+
+    :param sigs: values of the sampled signal (or one column per channel)
+    :type sigs: ndarray
+    :param freq_sampling: value of sampling frequency of the signal
+    :type freq_sampling: int
+    :param target_frequency: value of sampling frequency of the resampled signal
+    :type target_frequency: int
+    :return: values of the resampled signal (or one column per channel)
+    :rtype: ndarray
+    """
+    if target_frequency == freq_sampling:
+        return sigs
+    up, down = get_resampling_ratio(freq_sampling, target_frequency)
+    return sp_signal.resample_poly(sigs, up, down, axis=0, window=get_resampling_filter(up, down))
+
+
+def frames_to_original(frames: List[int], target_frequency: int, freq_sampling: int, sig_len: int) -> List[int]:
+    """
+    map localisations in a resampled signal to the nearest samples of the original signal.
+
+    :param frames: localisations in the resampled signal
+    :type frames: list(int)
+    :param target_frequency: value of sampling frequency of the resampled signal
+    :type target_frequency: int
+    :param freq_sampling: value of sampling frequency of the original signal
+    :type freq_sampling: int
+    :param sig_len: number of samples of the original signal
+    :type sig_len: int
+    :return: localisations in the original signal, sorted and without duplicates
+    :rtype: list(int)
+    """
+    original_frames = numpy.rint(numpy.asarray(frames, dtype=numpy.float64) * freq_sampling / target_frequency)
+    return numpy.unique(numpy.clip(original_frames, 0, sig_len - 1).astype(numpy.int64)).tolist()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides a single local store (SQLite database) for results of evaluations, in place of one csv file of
+criteria and scores and one json file of delays per algorithm, dataset and tolerance. Each evaluation (algorithm,
+dataset, tolerance, matching and lead) is a line of the table evaluations, with the metadata of the run (date, version
+and parameters of the algorithm, options), and its criteria and scores for each record and for the entire dataset
+(record 'global') are lines of the table performances. Delays between annotations and correct detections are
+summarized by a histogram (one bin per frame) and its statistics in the table delay_histograms, values of delays are
+only saved in the table delays on demand. Measures of speed and memory of the detection of each channel
+of each record by an algorithm are lines of the table profiles. Tables are indexed so that comparisons of algorithms,
+datasets or tolerances are queries instead of scans of files."""
+
+import os
+import json
+import sqlite3
+import datetime
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Union
+
+results_db_path = 'output/results.sqlite'
+
+# names of criteria and scores in tables of performances and in the database
+perf_db_columns = {
+    'nbofbeats': 'nbofbeats',
+    'FP': 'fp',
+    'FN': 'fn',
+    'F': 'f',
+    'F(%)': 'f_rate',
+    'P+(%)': 'pos_predict',
+    'Se(%)': 'recall',
+    'F1(%)': 'f1'
+}
+
+# lead of the default evaluation, which is performed on the first channel of each record
+default_lead = 'channel 0'
+
+schema = '''
+CREATE TABLE IF NOT EXISTS evaluations (
+    evaluation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    algorithm TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    tolerance INTEGER NOT NULL,
+    matching TEXT NOT NULL,
+    lead TEXT NOT NULL,
+    tolerance_frames INTEGER,
+    sampling_frequency INTEGER,
+    algorithm_version TEXT,
+    algorithm_params TEXT,
+    options TEXT,
+    created_at TEXT NOT NULL,
+    UNIQUE (dataset, tolerance, algorithm, matching, lead)
+);
+CREATE INDEX IF NOT EXISTS evaluations_by_algorithm ON evaluations (algorithm, dataset, tolerance);
+CREATE TABLE IF NOT EXISTS performances (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations (evaluation_id) ON DELETE CASCADE,
+    record TEXT NOT NULL,
+    nbofbeats INTEGER,
+    fp INTEGER,
+    fn INTEGER,
+    f INTEGER,
+    f_rate REAL,
+    pos_predict REAL,
+    recall REAL,
+    f1 REAL,
+    PRIMARY KEY (evaluation_id, record)
+);
+CREATE INDEX IF NOT EXISTS performances_by_record ON performances (record);
+CREATE TABLE IF NOT EXISTS delay_histograms (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations (evaluation_id) ON DELETE CASCADE,
+    record TEXT NOT NULL,
+    first_delay INTEGER NOT NULL,
+    histogram TEXT NOT NULL,
+    count INTEGER,
+    mean REAL,
+    variance REAL,
+    min INTEGER,
+    max INTEGER,
+    p5 INTEGER,
+    p25 INTEGER,
+    median INTEGER,
+    p75 INTEGER,
+    p95 INTEGER,
+    PRIMARY KEY (evaluation_id, record)
+);
+CREATE TABLE IF NOT EXISTS delays (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations (evaluation_id) ON DELETE CASCADE,
+    record TEXT NOT NULL,
+    delays TEXT NOT NULL,
+    PRIMARY KEY (evaluation_id, record)
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    algorithm TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    record TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    sampling_frequency INTEGER,
+    samples INTEGER,
+    wall_time REAL,
+    cpu_time REAL,
+    peak_memory REAL,
+    peak_rss REAL,
+    samples_per_second REAL,
+    algorithm_version TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (algorithm, dataset, record, channel)
+);
+'''
+
+# statistics of delays saved with their histogram in the table delay_histograms, given by get_delay_statistics
+delay_statistics_columns = ['count', 'mean', 'variance', 'min', 'max', 'p5', 'p25', 'median', 'p75', 'p95']
+
+# measures of the detection of each channel saved in the table profiles, given by profile_run_algo
+profile_columns = ['record', 'channel', 'sampling_frequency', 'samples', 'wall_time', 'cpu_time', 'peak_memory',
+                   'peak_rss', 'samples_per_second']
+
+
+def connect_results(db_path: str = results_db_path) -> sqlite3.Connection:
+    """
+    open the database of results, and create its tables if they are missing. Several processes can write in the
+    database: a writer waits for the others to finish their transaction.
+
+    :param db_path: path of the database
+    :type db_path: str
+    :return: connection to the database
+    :rtype: Connection
+    """
+    if os.path.dirname(db_path) != '':
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=60)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(schema)
+    return connection
+
+
+def write_evaluation(algorithm: str, dataset: str, tolerance_ms: int, perf_df: pd.DataFrame,
+                     distributions_df: pd.DataFrame, matching: str = 'window', lead: str = default_lead,
+                     metadata: Optional[Dict] = None, delays_dict: Optional[Dict[str, List[List[int]]]] = None,
+                     db_path: str = results_db_path) -> None:
+    """
+    save criteria and scores, and histograms and statistics of delays, of each record and of the entire dataset of an
+    evaluation in the database, with values of delays of each record if they are given. A previous evaluation of the
+    same algorithm on the same dataset and lead, with the same tolerance and matching, is replaced in the same
+    transaction.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param tolerance_ms: accepted time before and after an annotation to consider a detection as correct
+    :type tolerance_ms: int
+    :param perf_df: results of evaluation (criteria and scores), as given by EvaluationResult.get_performances
+    :type perf_df: DataFrame
+    :param distributions_df: histograms and statistics of delays, as given by EvaluationResult.get_delay_distributions
+    :type distributions_df: DataFrame
+    :param matching: method used to match annotations and detections
+    :type matching: str
+    :param lead: evaluated channel ('channel i') or 'fused' for consensus beats of channels
+    :type lead: str
+    :param metadata: metadata of the run among tolerance_frames, sampling_frequency, algorithm_version,
+    algorithm_params and options
+    :type metadata: dict
+    :param delays_dict: values of delays between annotations and their corresponding correct detections for each record
+    (not saved if None)
+    :type delays_dict: dict(str, list(list(int)))
+    :param db_path: path of the database
+    :type db_path: str
+    """
+    metadata = {} if metadata is None else metadata
+    perf_df = perf_df.drop(index='_____', errors='ignore')[list(perf_db_columns)].apply(pd.to_numeric)
+    performances = [[str(record)] + [None if pd.isna(value) else float(value) for value in values]
+                    for record, values in zip(perf_df.index, perf_df.to_numpy())]
+    distributions = [[str(record), int(first_delay), json.dumps([int(count) for count in histogram])] +
+                     [None if pd.isna(value) else value for value in statistics]
+                     for record, first_delay, histogram, statistics in zip(
+                         distributions_df.index, distributions_df['first_delay'], distributions_df['histogram'],
+                         distributions_df[delay_statistics_columns].astype(object).to_numpy())]
+    connection = connect_results(db_path)
+    try:
+        with connection:
+            connection.execute('DELETE FROM evaluations WHERE dataset = ? AND tolerance = ? AND algorithm = ? '
+                               'AND matching = ? AND lead = ?', (dataset, int(tolerance_ms), algorithm, matching, lead))
+            cursor = connection.execute(
+                'INSERT INTO evaluations (algorithm, dataset, tolerance, matching, lead, tolerance_frames, '
+                'sampling_frequency, algorithm_version, algorithm_params, options, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (algorithm, dataset, int(tolerance_ms), matching, lead, metadata.get('tolerance_frames'),
+                 metadata.get('sampling_frequency'), metadata.get('algorithm_version'),
+                 None if metadata.get('algorithm_params') is None
+                 else json.dumps(metadata['algorithm_params'], sort_keys=True),
+                 None if metadata.get('options') is None else json.dumps(metadata['options'], sort_keys=True),
+                 datetime.datetime.now().isoformat(timespec='seconds')))
+            evaluation_id = cursor.lastrowid
+            connection.executemany(f'INSERT INTO performances (evaluation_id, record, '
+                                   f'{", ".join(perf_db_columns.values())}) '
+                                   f'VALUES (?, ?{", ?" * len(perf_db_columns)})',
+                                   [[evaluation_id] + performance for performance in performances])
+            connection.executemany(f'INSERT INTO delay_histograms (evaluation_id, record, first_delay, histogram, '
+                                   f'{", ".join(delay_statistics_columns)}) '
+                                   f'VALUES (?, ?, ?, ?{", ?" * len(delay_statistics_columns)})',
+                                   [[evaluation_id] + distribution for distribution in distributions])
+            if delays_dict is not None:
+                connection.executemany('INSERT INTO delays (evaluation_id, record, delays) VALUES (?, ?, ?)',
+                                       [(evaluation_id, str(record), json.dumps(record_delays))
+                                        for record, record_delays in delays_dict.items()])
+    finally:
+        connection.close()
+
+
+def get_conditions(filters: Dict[str, Union[None, str, int, List]]) -> Tuple[str, List]:
+    """
+    build the WHERE clause of a query from filters on columns. A filter can be a value or a list of accepted values,
+    filters whose value is None are ignored.
+
+    :param filters: accepted values for each column
+    :type filters: dict(str, str or int or list)
+    :return: WHERE clause (empty without filters) and its parameters
+    :rtype: tuple(str, list)
+    """
+    conditions = []
+    parameters = []
+    for column, value in filters.items():
+        if value is None:
+            continue
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        # numpy scalars (as values selected in a DataFrame) are not handled by sqlite3
+        values = [value.item() if hasattr(value, 'item') else value for value in values]
+        if isinstance(value, (list, tuple)):
+            conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+        else:
+            conditions.append(f'{column} = ?')
+        parameters.extend(values)
+    return (' WHERE ' + ' AND '.join(conditions) if len(conditions) > 0 else ''), parameters
+
+
+def read_performances(algorithm: Union[None, str, List[str]] = None, dataset: Union[None, str, List[str]] = None,
+                      tolerance: Union[None, int, List[int]] = None, record: Union[None, str, List[str]] = None,
+                      matching: Union[None, str, List[str]] = 'window',
+                      lead: Union[None, str, List[str]] = default_lead, db_path: str = results_db_path) -> pd.DataFrame:
+    """
+    query criteria and scores of evaluations. Each filter can be a value or a list of values, None for any value.
+
+    :param algorithm: names of the algorithms
+    :type algorithm: str or list(str)
+    :param dataset: names of the datasets
+    :type dataset: str or list(str)
+    :param tolerance: tolerances of the evaluations (in ms)
+    :type tolerance: int or list(int)
+    :param record: IDs of the records ('global' for the entire dataset)
+    :type record: str or list(str)
+    :param matching: methods used to match annotations and detections
+    :type matching: str or list(str)
+    :param lead: evaluated channels ('channel i') or 'fused'
+    :type lead: str or list(str)
+    :param db_path: path of the database
+    :type db_path: str
+    :return: criteria and scores with the algorithm, dataset, tolerance, matching, lead and record of each line
+    :rtype: DataFrame
+    """
+    where, parameters = get_conditions({'algorithm': algorithm, 'dataset': dataset, 'tolerance': tolerance,
+                                        'record': record, 'matching': matching, 'lead': lead})
+    columns = ', '.join(f'{db_column} AS "{column}"' for column, db_column in perf_db_columns.items())
+    connection = connect_results(db_path)
+    try:
+        return pd.read_sql_query(f'SELECT algorithm, dataset, tolerance, matching, lead, record, {columns} '
+                                 f'FROM evaluations JOIN performances USING (evaluation_id){where} '
+                                 f'ORDER BY evaluation_id, performances.rowid', connection, params=parameters)
+    finally:
+        connection.close()
+
+
+def read_evaluations(algorithm: Union[None, str, List[str]] = None, dataset: Union[None, str, List[str]] = None,
+                     matching: Union[None, str, List[str]] = 'window', lead: Union[None, str, List[str]] = default_lead,
+                     db_path: str = results_db_path) -> pd.DataFrame:
+    """
+    query the evaluations saved in the database with the metadata of their runs.
+
+    :param algorithm: names of the algorithms
+    :type algorithm: str or list(str)
+    :param dataset: names of the datasets
+    :type dataset: str or list(str)
+    :param matching: methods used to match annotations and detections
+    :type matching: str or list(str)
+    :param lead: evaluated channels ('channel i') or 'fused'
+    :type lead: str or list(str)
+    :param db_path: path of the database
+    :type db_path: str
+    :return: one line per evaluation
+    :rtype: DataFrame
+    """
+    where, parameters = get_conditions({'algorithm': algorithm, 'dataset': dataset, 'matching': matching,
+                                        'lead': lead})
+    connection = connect_results(db_path)
+    try:
+        return pd.read_sql_query(f'SELECT * FROM evaluations{where} ORDER BY algorithm, dataset, tolerance',
+                                 connection, params=parameters)
+    finally:
+        connection.close()
+
+
+def read_delay_histograms(algorithm: Union[None, str, List[str]] = None, dataset: Union[None, str, List[str]] = None,
+                          tolerance: Union[None, int, List[int]] = None, record: Union[None, str, List[str]] = None,
+                          matching: Union[None, str, List[str]] = 'window',
+                          lead: Union[None, str, List[str]] = default_lead, db_path: str = results_db_path) \
+        -> pd.DataFrame:
+    """
+    query histograms and statistics of delays between annotations and their corresponding correct detections of
+    evaluations. Each filter can be a value or a list of values, None for any value.
+
+    :param algorithm: names of the algorithms
+    :type algorithm: str or list(str)
+    :param dataset: names of the datasets
+    :type dataset: str or list(str)
+    :param tolerance: tolerances of the evaluations (in ms)
+    :type tolerance: int or list(int)
+    :param record: IDs of the records ('global' for the entire dataset)
+    :type record: str or list(str)
+    :param matching: methods used to match annotations and detections
+    :type matching: str or list(str)
+    :param lead: evaluated channels ('channel i') or 'fused'
+    :type lead: str or list(str)
+    :param db_path: path of the database
+    :type db_path: str
+    :return: value of the first bin (in frames), histogram (number of delays of each value) and statistics of delays
+    with the algorithm, dataset, tolerance, matching, lead and record of each line
+    :rtype: DataFrame
+    """
+    where, parameters = get_conditions({'algorithm': algorithm, 'dataset': dataset, 'tolerance': tolerance,
+                                        'record': record, 'matching': matching, 'lead': lead})
+    connection = connect_results(db_path)
+    try:
+        distributions_df = pd.read_sql_query(
+            f'SELECT algorithm, dataset, tolerance, matching, lead, record, first_delay, histogram, '
+            f'{", ".join(delay_statistics_columns)} FROM evaluations JOIN delay_histograms USING (evaluation_id)'
+            f'{where} ORDER BY evaluation_id, delay_histograms.rowid', connection, params=parameters)
+    finally:
+        connection.close()
+    distributions_df['histogram'] = distributions_df['histogram'].map(json.loads)
+    return distributions_df
+
+
+def read_delays(algorithm: str, dataset: str, tolerance: int, record: Optional[str] = None, matching: str = 'window',
+                lead: str = default_lead, db_path: str = results_db_path) -> Dict[str, List[List[int]]]:
+    """
+    query delays between annotations and their corresponding correct detections of an evaluation, saved only for
+    evaluations run with raw delays (see read_delay_histograms otherwise).
+
+    :param algorithm: name of the algorithm
+    :type algorithm: str
+    :param dataset: name of the dataset
+    :type dataset: str
+    :param tolerance: tolerance of the evaluation (in ms)
+    :type tolerance: int
+    :param record: ID of the record (every record if None)
+    :type record: str
+    :param matching: method used to match annotations and detections
+    :type matching: str
+    :param lead: evaluated channel ('channel i') or 'fused'
+    :type lead: str
+    :param db_path: path of the database
+    :type db_path: str
+    :return: values of delays for each record
+    :rtype: dict(str, list(list(int)))
+    """
+    where, parameters = get_conditions({'algorithm': algorithm, 'dataset': dataset, 'tolerance': tolerance,
+                                        'record': record, 'matching': matching, 'lead': lead})
+    connection = connect_results(db_path)
+    try:
+        return {record_id: json.loads(record_delays) for record_id, record_delays in connection.execute(
+            f'SELECT record, delays FROM evaluations JOIN delays USING (evaluation_id){where} ORDER BY delays.rowid',
+            parameters)}
+    finally:
+        connection.close()
+
+
+def write_profiles(algorithm: str, dataset: str, profiles: List[Dict], algorithm_version: Optional[str] = None,
+                   db_path: str = results_db_path) -> None:
+    """
+    save measures of the detection of channels of a dataset by an algorithm in the database. Previous measures of the
+    same channels are replaced.
+
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param profiles: measures of the detection of each channel, with the keys of profile_columns
+    :type profiles: list(dict)
+    :param algorithm_version: version of the library of the algorithm
+    :type algorithm_version: str
+    :param db_path: path of the database
+    :type db_path: str
+    """
+    created_at = datetime.datetime.now().isoformat(timespec='seconds')
+    connection = connect_results(db_path)
+    try:
+        with connection:
+            connection.executemany(f'INSERT OR REPLACE INTO profiles (algorithm, dataset, '
+                                   f'{", ".join(profile_columns)}, algorithm_version, created_at) '
+                                   f'VALUES (?, ?{", ?" * len(profile_columns)}, ?, ?)',
+                                   [[algorithm, dataset] + [profile[column] for column in profile_columns] +
+                                    [algorithm_version, created_at] for profile in profiles])
+    finally:
+        connection.close()
+
+
+def read_profiles(algorithm: Union[None, str, List[str]] = None, dataset: Union[None, str, List[str]] = None,
+                  db_path: str = results_db_path) -> pd.DataFrame:
+    """
+    query measures of speed and memory of detections. Each filter can be a value or a list of values, None for any
+    value.
+
+    :param algorithm: names of the algorithms
+    :type algorithm: str or list(str)
+    :param dataset: names of the datasets
+    :type dataset: str or list(str)
+    :param db_path: path of the database
+    :type db_path: str
+    :return: measures of the detection of each channel of each record
+    :rtype: DataFrame
+    """
+    where, parameters = get_conditions({'algorithm': algorithm, 'dataset': dataset})
+    connection = connect_results(db_path)
+    try:
+        return pd.read_sql_query(f'SELECT * FROM profiles{where} ORDER BY rowid', connection, params=parameters)
+    finally:
+        connection.close()
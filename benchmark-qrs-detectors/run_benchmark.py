@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script runs in one invocation the whole matrix of evaluations for lists (or glob patterns) of algorithms,
+datasets and tolerances. Each record of a dataset is read once and its signals are given to every selected algorithm,
+then beat annotations of the dataset are recovered once and detections of every algorithm are evaluated for every
+tolerance, on every channel and on their fusion (or only on the first channel with --first-channel). The next records
+are read by a background thread while a record is processed (see prefetch_helper), in the dtype chosen with --dtype.
+Obtained results are saved in the same files as with perform_detection, get_annotations and get_perf."""
+
+import click
+from fnmatch import fnmatchcase
+from dataset_helper import *
+from algo_helper import *
+from storage_helper import storage_formats, write_detections, write_annotations
+from detection_cache_helper import run_algo_multichannel_cached
+from get_annotations import get_annotations_dataset
+from get_perf import evaluate_dataset, evaluate_dataset_channels, matching_methods
+from results_helper import write_profiles
+from prefetch_helper import default_prefetch_depth, default_prefetch_memory, prefetch
+
+
+def expand_patterns(patterns: List[str], choices: List[str]) -> List[str]:
+    """
+    select the elements of a list matching at least one of the given glob patterns (or names), in the order of the list.
+
+    :param patterns: names or glob patterns (for example 'mit-bih-noise-stress-test-*')
+    :type patterns: list(str)
+    :param choices: available names
+    :type choices: list(str)
+    :return: selected names
+    :rtype: list(str)
+    """
+    for pattern in patterns:
+        if not any(fnmatchcase(choice, pattern) for choice in choices):
+            raise click.BadParameter(f'{pattern} does not match any element of {choices}')
+    return [choice for choice in choices if any(fnmatchcase(choice, pattern) for pattern in patterns)]
+
+
+def detect_dataset(dataset: str, algorithms: List[str], record_ids: Optional[List[str]] = None,
+                   profiles: Optional[Dict[str, List[Dict]]] = None, trace_memory: bool = False,
+                   target_frequency: Optional[int] = None, prefetch_depth: int = default_prefetch_depth,
+                   prefetch_memory: float = default_prefetch_memory, dtype: str = 'float64') \
+        -> Dict[str, Dict[str, Dict[str, List[int]]]]:
+    """
+    perform QRS detection with several algorithms on every channel of every record of a dataset, reading each record
+    only once. Channels already processed by an algorithm are read from the cache of detections, unless the detection
+    is profiled. The next records are read in advance by a background thread, unless the detection is profiled.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param algorithms: names of the used methods for QRS detection
+    :type algorithms: list(str)
+    :param record_ids: IDs of the records to read (every record of the dataset if None)
+    :type record_ids: list(str)
+    :param profiles: lists where measures of the detection of each channel are added for each algorithm (no profiling
+    if None)
+    :type profiles: dict(str, list(dict))
+    :param trace_memory: also measure the peak of memory allocated during the detection when it is profiled
+    :type trace_memory: bool
+    :param target_frequency: value of sampling frequency at which signals are resampled before the detection (see
+    run_algo)
+    :type target_frequency: int
+    :param prefetch_depth: number of records read in advance (0 to read records one after the other)
+    :type prefetch_depth: int
+    :param prefetch_memory: maximal memory of the records read in advance (in MB)
+    :type prefetch_memory: float
+    :param dtype: dtype in which signals are read, among signal_dtypes
+    :type dtype: str
+    :return: results of QRS detections (localisations) of each algorithm for each record and each channel
+    :rtype: dict(str, dict(str, dict(str, list(int))))
+    """
+    records_ids = get_record_ids(dataset, record_ids)
+    detections_dicts = {algorithm: {} for algorithm in algorithms}
+    counter = 0
+    print(f'Detection with {len(algorithms)} algorithm(s) on dataset {dataset} is running....')
+    # records read in advance would be measured with the detection
+    with prefetch(iter_dataset_arrays(dataset, records_ids, dtype=dtype),
+                  0 if profiles is not None else prefetch_depth, prefetch_memory) as records_iterator:
+        for record_id, sig_names, p_signal in records_iterator:
+            calibration = get_record_calibration(dataset, record_id, sig_names) if dtype == 'digital' else None
+            for algorithm in algorithms:
+                detections_dicts[algorithm][record_id] = run_algo_multichannel_cached(algorithm, p_signal,
+                                                                                      sampling_frequency[dataset],
+                                                                                      record_id, sig_names,
+                                                                                      None if profiles is None
+                                                                                      else profiles[algorithm],
+                                                                                      trace_memory,
+                                                                                      target_frequency, calibration)
+            counter += 1
+            print(f'{counter}/{len(records_ids)}')
+    return detections_dicts
+
+
+# parse arguments
+@click.command()
+@click.option('--data', required=True, multiple=True,
+              help=f'dataset(s) or glob pattern(s) among {datasets_list}, option can be repeated')
+@click.option('--algo', required=True, multiple=True,
+              help=f'algorithm(s) or glob pattern(s) among {algorithms_list}, option can be repeated')
+@click.option('--tol', required=True, multiple=True, type=click.IntRange(0, 1000, clamp=True),
+              help='tolerance(s) of the evaluation (in ms), option can be repeated, type=int')
+@click.option('--record', multiple=True,
+              help='ID(s) or glob pattern(s) of records to evaluate (every record if omitted, otherwise saved results '
+                   'only contain these records), option can be repeated')
+@click.option('--format', 'storage_format', default='npy', type=click.Choice(storage_formats),
+              help='format of the saved detections and annotations (binary npy files with their index or json export)')
+@click.option('--matching', default='window', type=click.Choice(list(matching_methods)),
+              help='matching of annotations and detections: any detection in the interval of tolerance (window) or '
+                   'one detection per annotation (one-to-one)')
+@click.option('--channels/--first-channel', default=True,
+              help='evaluate every channel and the fusion of channels (default) or only the first channel of each '
+                   'record')
+@click.option('--fusion-window', default=100, type=click.IntRange(0, 1000),
+              help='maximal time between the first and the last detections of different channels merged in one beat '
+                   '(in ms), type=int')
+@click.option('--fusion-votes', default=0, type=click.IntRange(0, None),
+              help='minimal number of channels which detected a fused beat (0 for more than half, all channels if '
+                   'greater than their number), type=int')
+@click.option('--profile', is_flag=True,
+              help='measure wall time, CPU time, peak resident memory and throughput of the detection of every channel '
+                   '(cached detections are performed again), saved in the database of results')
+@click.option('--trace-memory', is_flag=True,
+              help='with --profile, also measure the peak of memory allocated during the detection, in a second run '
+                   'traced by tracemalloc (about ten times slower)')
+@click.option('--resample', type=click.IntRange(1, None),
+              help='sampling frequency (in Hz) at which signals are resampled before the detection, detections being '
+                   'mapped back to samples of the records (frequency of the dataset if omitted), type=int')
+@click.option('--prefetch', 'prefetch_depth', default=default_prefetch_depth, type=click.IntRange(0, None),
+              help='number of records read in advance by a background thread while a record is processed (0 to read '
+                   'records one after the other, always 0 with --profile), type=int')
+@click.option('--prefetch-memory', default=default_prefetch_memory, type=click.IntRange(1, None),
+              help='maximal memory of the records read in advance (in MB), type=int')
+@click.option('--dtype', default='float64', type=click.Choice(signal_dtypes),
+              help='dtype in which signals are read: physical values in float64 or float32, or digital samples with '
+                   'their calibration (converted to a dtype taken by each algorithm for the detection)')
+def main(data: Tuple[str], algo: Tuple[str], tol: Tuple[int], record: Tuple[str], storage_format: str,
+         matching: str, channels: bool, fusion_window: int, fusion_votes: int, profile: bool, trace_memory: bool,
+         resample: Optional[int], prefetch_depth: int, prefetch_memory: int, dtype: str) -> None:
+    datasets = expand_patterns(list(data), datasets_list)
+    algorithms = expand_patterns(list(algo), algorithms_list)
+    tolerances = sorted(set(tol))
+    print(f'Benchmark of {len(algorithms)} algorithm(s) on {len(datasets)} dataset(s) with tolerance(s) {tolerances} '
+          f'ms is running....')
+    for dataset in datasets:
+        record_ids = None
+        if len(record) > 0:
+            record_ids = [record_id for record_id in records[dataset]
+                          if any(fnmatchcase(record_id, pattern) for pattern in record)]
+            if len(record_ids) == 0:
+                continue
+        profiles = {algorithm: [] for algorithm in algorithms} if profile else None
+        detections_dicts = detect_dataset(dataset, algorithms, record_ids, profiles, trace_memory, resample,
+                                          prefetch_depth, prefetch_memory, dtype)
+        annotations_dict = get_annotations_dataset(dataset, record_ids)
+        write_annotations(dataset, annotations_dict, storage_format)
+        for algorithm in algorithms:
+            write_detections(dataset, algorithm, detections_dicts[algorithm], storage_format)
+            if profile:
+                write_profiles(algorithm, dataset, profiles[algorithm], get_algo_version(algorithm))
+            if channels:
+                evaluate_dataset_channels(algorithm, dataset, tolerances, detections_dicts[algorithm],
+                                          annotations_dict, fusion_window, fusion_votes, record_ids, matching)
+            else:
+                evaluate_dataset(algorithm, dataset, tolerances, detections_dicts[algorithm], annotations_dict,
+                                 record_ids, matching)
+    print('Benchmark was successful....')
+
+
+if __name__ == '__main__':
+    main()
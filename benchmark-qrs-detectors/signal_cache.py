@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script manages the cache of decoded signals of cache_helper: it can decode and save in advance every record of
+the chosen datasets (warm), or remove cached records (clear)."""
+
+import os
+import click
+from dataset_helper import *
+from cache_helper import cache_path, get_record_key, get_record_cache_dir, write_record_cache, clear_cache
+
+
+# parse arguments
+@click.group()
+def main() -> None:
+    pass
+
+
+@main.command()
+@click.option('--data', multiple=True, type=click.Choice(datasets_list, case_sensitive=False),
+              help='dataset (every dataset if omitted), option can be repeated')
+def warm(data: Tuple[str]) -> None:
+    datasets = list(data) if len(data) > 0 else datasets_list
+    for dataset in datasets:
+        database = database_folders[dataset]
+        records_dict = records[dataset]
+        print(f'Signals of dataset {dataset} are being cached....')
+        for counter, record_id in enumerate(records_dict.keys(), start=1):
+            key = get_record_key(database, record_id)
+            if not os.path.exists(f'{get_record_cache_dir(database, record_id, key)}/header.json'):
+                write_record_cache(database, record_id, key)
+            print(f'{counter}/{len(records_dict.keys())}')
+    print(f'Signals are cached in {cache_path}....')
+
+
+@main.command()
+@click.option('--data', multiple=True, type=click.Choice(datasets_list, case_sensitive=False),
+              help='dataset (every dataset if omitted), option can be repeated')
+def clear(data: Tuple[str]) -> None:
+    if len(data) == 0:
+        clear_cache()
+    else:
+        for database in sorted({database_folders[dataset] for dataset in data}):
+            clear_cache(database)
+    print('Cached signals were removed....')
+
+
+if __name__ == '__main__':
+    main()
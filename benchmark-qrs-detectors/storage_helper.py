@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""This script provides methods to save and load localisations of QRS detections and beat annotations. By default,
+localisations of every record (and channel) are concatenated in a single binary .npy file, with a small json index
+giving the position of each record (and channel) in it. The binary file is loaded by memory mapping, so that one record
+can be read without reading the others. Localisations can also be exported in json files."""
+
+import os
+import json
+import numpy
+from typing import Dict, List, Union
+
+# available formats to save localisations
+storage_formats = ['npy', 'json']
+
+
+def write_frames_store(path: str, frames_dict: Dict[str, Union[List[int], Dict[str, List[int]]]]) -> None:
+    """
+    write localisations for each record (and each channel) in a binary file path.npy with its index path.index.json.
+
+    :param path: path of the files without extension
+    :type path: str
+    :param frames_dict: localisations for each record, or for each record and each channel
+    :type frames_dict: dict(str, list(int)) or dict(str, dict(str, list(int)))
+    """
+    index = {}
+    arrays = []
+    offset = 0
+    for record_id, record_frames in frames_dict.items():
+        if isinstance(record_frames, dict):
+            index[str(record_id)] = {}
+            for sig_name, frames in record_frames.items():
+                index[str(record_id)][sig_name] = [offset, len(frames)]
+                arrays.append(numpy.asarray(frames, dtype=numpy.int64))
+                offset += len(frames)
+        else:
+            index[str(record_id)] = [offset, len(record_frames)]
+            arrays.append(numpy.asarray(record_frames, dtype=numpy.int64))
+            offset += len(record_frames)
+    all_frames = numpy.concatenate(arrays) if len(arrays) > 0 else numpy.zeros(0, dtype=numpy.int64)
+    # int32 halves the size of the file as long as every localisation fits in it
+    if len(all_frames) == 0 or (numpy.iinfo(numpy.int32).min <= all_frames.min()
+                                and all_frames.max() <= numpy.iinfo(numpy.int32).max):
+        all_frames = all_frames.astype(numpy.int32)
+    numpy.save(f'{path}.npy', all_frames)
+    with open(f'{path}.index.json', 'w') as outfile:
+        json.dump(index, outfile)
+
+
+def read_frames_store(path: str) -> Dict[str, Union[numpy.ndarray, Dict[str, numpy.ndarray]]]:
+    """
+    load localisations for each record (and each channel) from a binary file path.npy and its index path.index.json.
+    Localisations are views of the memory mapped file: they are read from the disk only when they are used.
+
+    :param path: path of the files without extension
+    :type path: str
+    :return: localisations for each record, or for each record and each channel
+    :rtype: dict(str, ndarray) or dict(str, dict(str, ndarray))
+    """
+    with open(f'{path}.index.json') as index_json:
+        index = json.load(index_json)
+    all_frames = numpy.load(f'{path}.npy', mmap_mode='r')
+    frames_dict = {}
+    for record_id, record_index in index.items():
+        if isinstance(record_index, dict):
+            frames_dict[record_id] = {sig_name: all_frames[offset:offset + length]
+                                      for sig_name, (offset, length) in record_index.items()}
+        else:
+            offset, length = record_index
+            frames_dict[record_id] = all_frames[offset:offset + length]
+    return frames_dict
+
+
+def write_detections_json(dataset: str, algorithm: str, dict_detections: Dict[str, Dict[str, List[int]]]) -> None:
+    """
+    write results of QRS detection from a dictionary in a json file.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dict_detections: results of QRS detections (localisations) for each record and each channel
+    :type dict_detections: dict(str, dict(str, list(int)))
+    """
+    os.makedirs(f'output/frames', exist_ok=True)
+    with open(f'output/frames/{algorithm}_{dataset}.json', 'w') as outfile:
+        json.dump({str(record_id): {sig_name: [int(frame) for frame in frames]
+                                    for sig_name, frames in record_detections.items()}
+                   for record_id, record_detections in dict_detections.items()}, outfile)
+
+
+def write_annotations_json(dataset: str, dict_annotations: Dict[str, List[int]]) -> None:
+    """
+    write localisations of beat annotations from a dictionary in a json file.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param dict_annotations: localisations of beat annotations for each record of the dataset
+    :type dict_annotations: dict(str, list(int)
+    """
+    os.makedirs(f'output/annotations', exist_ok=True)
+    with open(f'output/annotations/{dataset}.json', 'w') as outfile:
+        json.dump({str(record_id): [int(frame) for frame in frames]
+                   for record_id, frames in dict_annotations.items()}, outfile)
+
+
+def write_detections(dataset: str, algorithm: str, dict_detections: Dict[str, Dict[str, List[int]]],
+                     storage_format: str = 'npy') -> None:
+    """
+    write results of QRS detection in output/frames, in binary (npy) or json format.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :param dict_detections: results of QRS detections (localisations) for each record and each channel
+    :type dict_detections: dict(str, dict(str, list(int)))
+    :param storage_format: format of the saved file, among storage_formats
+    :type storage_format: str
+    """
+    if storage_format == 'json':
+        write_detections_json(dataset, algorithm, dict_detections)
+    else:
+        os.makedirs(f'output/frames', exist_ok=True)
+        write_frames_store(f'output/frames/{algorithm}_{dataset}', dict_detections)
+
+
+def write_annotations(dataset: str, dict_annotations: Dict[str, List[int]], storage_format: str = 'npy') -> None:
+    """
+    write localisations of beat annotations in output/annotations, in binary (npy) or json format.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param dict_annotations: localisations of beat annotations for each record of the dataset
+    :type dict_annotations: dict(str, list(int)
+    :param storage_format: format of the saved file, among storage_formats
+    :type storage_format: str
+    """
+    if storage_format == 'json':
+        write_annotations_json(dataset, dict_annotations)
+    else:
+        os.makedirs(f'output/annotations', exist_ok=True)
+        write_frames_store(f'output/annotations/{dataset}', dict_annotations)
+
+
+def is_binary_store_newest(path: str) -> bool:
+    """
+    check if localisations saved at path (without extension) should be read from the binary file: it exists and it is
+    not older than the json file.
+
+    :param path: path of the files without extension
+    :type path: str
+    :return: True if the binary file should be read, False for the json file
+    :rtype: bool
+    """
+    if not os.path.exists(f'{path}.index.json'):
+        return False
+    return not os.path.exists(f'{path}.json') or os.path.getmtime(f'{path}.npy') >= os.path.getmtime(f'{path}.json')
+
+
+def read_detections(dataset: str, algorithm: str) -> Dict[str, Dict[str, numpy.ndarray]]:
+    """
+    load results of QRS detection of an algorithm on a dataset, from the most recent of the binary and json files.
+    With the binary file, the localisations of a record are only read when they are used.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :param algorithm: name of the used method for QRS detection
+    :type algorithm: str
+    :return: results of QRS detections (localisations) for each record and each channel
+    :rtype: dict(str, dict(str, ndarray))
+    """
+    if is_binary_store_newest(f'output/frames/{algorithm}_{dataset}'):
+        return read_frames_store(f'output/frames/{algorithm}_{dataset}')
+    with open(f'output/frames/{algorithm}_{dataset}.json') as detections_json:
+        return json.load(detections_json)
+
+
+def read_annotations(dataset: str) -> Dict[str, numpy.ndarray]:
+    """
+    load localisations of beat annotations of a dataset, from the most recent of the binary and json files. With the
+    binary file, the localisations of a record are only read when they are used.
+
+    :param dataset: name of the studied dataset
+    :type dataset: str
+    :return: localisations of beat annotations for each record of the dataset
+    :rtype: dict(str, ndarray)
+    """
+    if is_binary_store_newest(f'output/annotations/{dataset}'):
+        return read_frames_store(f'output/annotations/{dataset}')
+    with open(f'output/annotations/{dataset}.json') as annotations_json:
+        return json.load(annotations_json)
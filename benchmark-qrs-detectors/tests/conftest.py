@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# scripts of benchmark-qrs-detectors import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import algo_helper  # noqa: E402
+from algo_helper import DetectorAdapter, register_detector  # noqa: E402
+
+
+class SpikeAdapter(DetectorAdapter):
+    """deterministic and local detector: every sample above 0.5 which is a maximum of its neighbours"""
+
+    def detect(self, sig):
+        sig = np.asarray(sig)
+        padded = np.concatenate([[-np.inf], sig, [-np.inf]])
+        return np.flatnonzero((sig > 0.5) & (sig >= padded[:-2]) & (sig > padded[2:]))
+
+
+@pytest.fixture
+def spike_detector():
+    register_detector('spike-test', SpikeAdapter, 'numpy')
+    yield 'spike-test'
+    algo_helper.algorithms_list.remove('spike-test')
+    for registry in [algo_helper.algorithms_libraries, algo_helper.detector_adapters, algo_helper.algorithms_params,
+                     algo_helper.algorithms_frequencies, algo_helper.algorithms_dtypes]:
+        registry.pop('spike-test', None)
+    algo_helper.get_detector.cache_clear()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from algo_helper import run_algo, run_algo_windowed, run_algo_windows
+
+
+def spikes(length, frames):
+    sig = np.zeros(length)
+    sig[frames] = 1
+    return sig
+
+
+def test_detection_in_overlap_kept_once(spike_detector):
+    # overlap 20, seam at 90: the first window keeps 85, the second one keeps 95
+    windows = [(0, spikes(100, [50, 85, 95])), (80, spikes(100, [5, 15, 60]))]
+    assert run_algo_windows(spike_detector, windows, 360, 20, 0) == [50, 85, 95, 140]
+
+
+def test_duplicate_within_merge_tolerance_removed(spike_detector):
+    # the same beat is detected at 88 by the first window and at 93 by the second one, after the seam
+    windows = [(0, spikes(100, [40, 88])), (80, spikes(100, [13, 60]))]
+    assert run_algo_windows(spike_detector, windows, 360, 20, 10) == [40, 88, 140]
+    assert run_algo_windows(spike_detector, windows, 360, 20, 4) == [40, 88, 93, 140]
+
+
+def test_last_window_shorter_than_half_overlap(spike_detector):
+    # the last window is contained in the previous one, whose detections after the seam are kept
+    windows = [(0, spikes(100, [30])), (80, spikes(100, [15, 95])), (160, spikes(5, [2]))]
+    assert run_algo_windows(spike_detector, windows, 360, 20, 0) == [30, 95, 175]
+
+
+def test_windows_without_detections(spike_detector):
+    windows = [(0, spikes(100, [])), (80, spikes(100, [15])), (160, spikes(100, [])), (240, spikes(100, [50]))]
+    assert run_algo_windows(spike_detector, windows, 360, 20, 0) == [95, 290]
+    assert run_algo_windows(spike_detector, [(0, spikes(100, [])), (80, spikes(100, []))], 360, 20, 0) == []
+
+
+@pytest.mark.parametrize('window_size, overlap', [(1000, 100), (777, 360), (5000, 0), (20000, 100)])
+def test_windowed_detection_equals_detection_on_whole_signal(spike_detector, window_size, overlap):
+    sig = spikes(12000, np.cumsum(np.random.default_rng(0).integers(150, 300, 36)))
+    expected = run_algo(spike_detector, sig, 360)
+    assert run_algo_windowed(spike_detector, sig, 360, window_size, overlap, 20) == expected
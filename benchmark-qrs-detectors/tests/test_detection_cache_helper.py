@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import algo_helper
+import detection_cache_helper
+from cache_helper import SignalCalibration
+from detection_cache_helper import get_detection_key, get_signal_hash, run_algo_multichannel_cached
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(detection_cache_helper, 'detection_cache_path', str(tmp_path / 'detections'))
+
+
+def key(algorithm='Hamilton-ecg-detector', signal_hash='hash', **kwargs):
+    return get_detection_key(algorithm, 360, '100', 'MLII', signal_hash, **kwargs)
+
+
+def test_key_changes_with_params(monkeypatch):
+    default_key = key()
+    monkeypatch.setitem(algo_helper.algorithms_params, 'Hamilton-ecg-detector', {'threshold': 0.5})
+    assert key() != default_key
+
+
+def test_key_changes_with_library_version(monkeypatch):
+    default_key = key()
+    monkeypatch.setattr(detection_cache_helper, 'get_algo_version', lambda algorithm: 'py-ecg-detectors==0.0.1')
+    assert key() != default_key
+
+
+def test_key_changes_with_signal_values_and_dtype():
+    sig = np.linspace(-1, 1, 1000)
+    changed_sig = sig.copy()
+    changed_sig[500] += 1e-6
+    hashes = {get_signal_hash(sig), get_signal_hash(changed_sig), get_signal_hash(sig.astype(np.float32)),
+              get_signal_hash(np.zeros(10)), get_signal_hash(np.zeros(10, dtype=np.int64))}
+    assert len(hashes) == 5
+    # a view of a column hashes as its values
+    assert get_signal_hash(np.column_stack([sig, sig])[:, 1]) == get_signal_hash(sig)
+
+
+def test_key_changes_with_target_frequency():
+    assert key(target_frequency=360) == key()
+    assert key(target_frequency=250) != key()
+
+
+def test_key_changes_with_calibration():
+    calibration = SignalCalibration([200.0], [1024], ['212'])
+    assert key(calibration=calibration) != key()
+    assert key(calibration=calibration) != key(calibration=SignalCalibration([100.0], [1024], ['212']))
+    assert key(calibration=calibration) != key(calibration=SignalCalibration([200.0], [0], ['212']))
+
+
+def test_only_missing_channels_are_detected(spike_detector, monkeypatch):
+    detected_columns = []
+
+    def run_algo_multichannel(algorithm, sigs, *args):
+        detected_columns.append(sigs.shape[1])
+        return algo_helper.run_algo_multichannel(algorithm, sigs, *args)
+
+    monkeypatch.setattr(detection_cache_helper, 'run_algo_multichannel', run_algo_multichannel)
+    sigs = np.zeros((1000, 2))
+    sigs[[100, 400], 0] = 1
+    sigs[[200, 700], 1] = 1
+    expected = {'MLII': [100, 400], 'V5': [200, 700]}
+    assert run_algo_multichannel_cached(spike_detector, sigs, 360, '100', ['MLII', 'V5']) == expected
+    assert run_algo_multichannel_cached(spike_detector, sigs, 360, '100', ['MLII', 'V5']) == expected
+    assert detected_columns == [2]
+    # only the changed channel is detected again
+    sigs[900, 1] = 1
+    assert run_algo_multichannel_cached(spike_detector, sigs, 360, '100', ['MLII', 'V5']) == \
+        {'MLII': [100, 400], 'V5': [200, 700, 900]}
+    assert detected_columns == [2, 1]
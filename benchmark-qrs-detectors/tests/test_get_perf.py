@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from get_perf import compute_one_to_one_confusion_matrices_and_delays, fuse_detections, get_perf_channels_dataset, \
+    sweep_tolerances
+
+
+def greedy_one_to_one(detections, annotations, tolerance_frames):
+    """reference matching: one pass over sorted annotations, each taking the nearest free detection (first if equal)"""
+    detections = sorted(detections)
+    taken = set()
+    delays = []
+    for annotation in sorted(annotations):
+        candidates = [(abs(detection - annotation), id_detection) for id_detection, detection in enumerate(detections)
+                      if abs(detection - annotation) <= tolerance_frames and id_detection not in taken]
+        if len(candidates) > 0:
+            _, id_detection = min(candidates)
+            taken.add(id_detection)
+            delays.append(detections[id_detection] - annotation)
+    return [len(delays), len(detections) - len(delays), len(annotations) - len(delays)], delays
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_one_to_one_matches_greedy_pass_and_invariants(seed):
+    rng = np.random.default_rng(seed)
+    # close beats and detections so that intervals of tolerance share detections
+    annotations = np.cumsum(rng.integers(1, 30, 200)).tolist()
+    detections = rng.integers(0, annotations[-1] + 20, 220).tolist()
+    tolerances = [0, 3, 10, 25]
+    results = compute_one_to_one_confusion_matrices_and_delays(detections, annotations, tolerances)
+    for tolerance_frames, (confusion_matrix, [delays]) in zip(tolerances, results):
+        true_pos, false_pos, false_neg = confusion_matrix
+        assert (confusion_matrix, delays) == greedy_one_to_one(detections, annotations, tolerance_frames)
+        assert true_pos <= min(len(detections), len(annotations))
+        assert false_pos >= 0 and false_neg >= 0
+        assert true_pos + false_neg == len(annotations) and true_pos + false_pos == len(detections)
+        assert len(delays) == true_pos and all(abs(delay) <= tolerance_frames for delay in delays)
+    # delays do not depend on the order of the inputs
+    shuffled = compute_one_to_one_confusion_matrices_and_delays(rng.permutation(detections).tolist(),
+                                                               rng.permutation(annotations).tolist(), tolerances)
+    assert shuffled == results
+
+
+def test_one_to_one_detection_counted_once():
+    # one detection between two close annotations only matches the nearest one
+    assert compute_one_to_one_confusion_matrices_and_delays([102], [100, 106], [10]) == [([1, 0, 1], [[2]])]
+
+
+def test_one_to_one_empty_inputs():
+    assert compute_one_to_one_confusion_matrices_and_delays([], [100, 200], [10]) == [([0, 0, 2], [[]])]
+    assert compute_one_to_one_confusion_matrices_and_delays([100, 200], [], [10]) == [([0, 2, 0], [[]])]
+
+
+def fused_confusion_matrix(channels_detections, fusion_votes):
+    records_dict = {'100': [f'channel {i}' for i in range(len(channels_detections))]}
+    detections_dict = {'100': dict(zip(records_dict['100'], channels_detections))}
+    [(_, _, confusion_matrices)] = get_perf_channels_dataset(records_dict, detections_dict, {'100': [100, 400, 700]},
+                                                             [10], 36, fusion_votes)
+    return confusion_matrices[-1][0][0]
+
+
+def test_fusion_requires_both_leads_of_two_lead_records():
+    assert fused_confusion_matrix([[100, 400], [102, 700]], 0) == [1, 0, 2]
+    assert fused_confusion_matrix([[100, 400], [102, 700]], 1) == [3, 0, 0]
+
+
+def test_fusion_votes_limited_to_number_of_channels():
+    assert fused_confusion_matrix([[100, 400], [102, 700]], 5) == [1, 0, 2]
+
+
+def test_fusion_robust_to_a_noisy_lead():
+    beats = list(range(300, 9300, 300))
+    noisy = list(range(0, 9300, 30))
+    fused = fuse_detections([beats, beats, noisy], 36, 2)
+    assert len(fused) == len(beats)
+    assert all(abs(fused_beat - beat) <= 36 for fused_beat, beat in zip(fused, beats))
+
+
+def test_fusion_beats_anchored_on_their_first_detection():
+    assert fuse_detections([[100, 130, 160]], 36, 1) == [115, 160]
+    assert fuse_detections([[100], [102], [400]], 36, 2) == [101]
+
+
+@pytest.mark.parametrize('matching, expected_criteria, expected_scores', [
+    ('window', [2, 0, 0], [100, 100, 100]),
+    ('one-to-one', [1, 0, 1], [100, 50, 66.67])])
+def test_sweep_counts_no_negative_false_detection(matching, expected_criteria, expected_scores):
+    # one detection between two close annotations, in both of their intervals of tolerance at 150 ms
+    sweep_df = sweep_tolerances({'100': ['MLII']}, {'100': {'MLII': [150]}}, {'100': [100, 200]}, 360, [0, 150],
+                                matching)
+    assert sweep_df[['TP', 'FP', 'FN']].values.tolist() == [[0, 1, 2], expected_criteria]
+    assert sweep_df.loc[1, ['P+(%)', 'Se(%)', 'F1(%)']].tolist() == expected_scores
+
+
+def test_sweep_one_to_one_matches_evaluation():
+    rng = np.random.default_rng(0)
+    annotations = np.cumsum(rng.integers(50, 400, 500)).tolist()
+    detections = (np.array(annotations) + rng.integers(-60, 60, 500)).tolist() + rng.integers(0, 1000, 20).tolist()
+    sweep_df = sweep_tolerances({'100': ['MLII']}, {'100': {'MLII': detections}}, {'100': annotations}, 1000,
+                                list(range(0, 151, 10)), 'one-to-one')
+    expected = [confusion_matrix for confusion_matrix, _ in
+                compute_one_to_one_confusion_matrices_and_delays(detections, annotations, list(range(0, 151, 10)))]
+    assert sweep_df[['TP', 'FP', 'FN']].values.tolist() == expected
+    assert (sweep_df[['FP', 'FN']] >= 0).all().all() and (sweep_df['F1(%)'] <= 100).all()
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import time
+
+import click
+import pytest
+
+import perform_detection
+from dataset_helper import records
+
+# units are replaced in worker processes by monkeypatching, which they only inherit when forked
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='workers are not forked')
+
+
+def fake_unit(algorithm, dataset, record_id, sig_name, *args):
+    # detections depend on the unit, record 'slow' never ends in time and record 'crash' kills its worker
+    if record_id == 'slow':
+        time.sleep(60)
+    if record_id == 'crash':
+        os._exit(1)
+    if record_id == 'error':
+        raise ValueError('unreadable channel')
+    return record_id, sig_name, [int(record_id), len(sig_name)], []
+
+
+@pytest.fixture
+def fake_dataset(monkeypatch):
+    monkeypatch.setattr(perform_detection, 'detect_record_channel', fake_unit)
+
+    def set_records(records_dict):
+        monkeypatch.setitem(records, 'test-ds', records_dict)
+    return set_records
+
+
+def test_results_in_order_of_records(fake_dataset):
+    fake_dataset({'3': ['MLII', 'V1'], '1': ['V5'], '2': ['MLII']})
+    detections = perform_detection.parallel_detection('test-ds', 'fake', 2, 0)
+    assert list(detections) == ['3', '1', '2']
+    assert detections == {'3': {'MLII': [3, 4], 'V1': [3, 2]}, '1': {'V5': [1, 2]}, '2': {'MLII': [2, 4]}}
+
+
+def test_timeout_kills_unit_stuck_in_worker(fake_dataset):
+    fake_dataset({'1': ['MLII'], 'slow': ['MLII'], '2': ['MLII', 'V1']})
+    start = time.monotonic()
+    with pytest.raises(click.ClickException) as error:
+        perform_detection.parallel_detection('test-ds', 'fake', 2, 1)
+    assert time.monotonic() - start < 10
+    assert 'slow/MLII (TimeoutError' in error.value.message
+    assert '1/MLII' not in error.value.message and '2/' not in error.value.message
+
+
+def test_crashed_and_failing_units_do_not_stop_others(fake_dataset):
+    fake_dataset({'crash': ['MLII'], '1': ['MLII'], 'error': ['V1'], '2': ['MLII']})
+    with pytest.raises(click.ClickException) as error:
+        perform_detection.parallel_detection('test-ds', 'fake', 1, 0)
+    assert 'crash/MLII (worker process exited with code 1)' in error.value.message
+    assert 'error/V1 (ValueError: unreadable channel)' in error.value.message
+    assert '1/MLII' not in error.value.message and '2/MLII' not in error.value.message
@@ -0,0 +1,73 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from prefetch_helper import Prefetcher, prefetch
+
+
+def counted_records(produced, size=2 ** 20, count=None):
+    # records of size bytes, produced counting the records read by the background thread
+    for id_record in itertools.count() if count is None else range(count):
+        produced.append(id_record)
+        yield str(id_record), np.zeros(size, dtype=np.uint8)
+
+
+def wait_for_producer(produced, timeout=2.0):
+    # wait until the background thread stops reading records in advance
+    last_count, deadline = -1, time.monotonic() + timeout
+    while len(produced) != last_count and time.monotonic() < deadline:
+        last_count = len(produced)
+        time.sleep(0.1)
+    return len(produced)
+
+
+@pytest.mark.parametrize('depth', [0, 1, 3])
+def test_items_in_order(depth):
+    with prefetch(range(100), depth) as items:
+        assert list(items) == list(range(100))
+
+
+def test_error_raised_after_items_read_before_it():
+    def failing_records():
+        yield from range(3)
+        raise ValueError('corrupted record')
+
+    with Prefetcher(failing_records(), depth=2) as items:
+        assert [next(items) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(ValueError, match='corrupted record'):
+            next(items)
+        with pytest.raises(StopIteration):
+            next(items)
+
+
+@pytest.mark.parametrize('depth, max_memory, read_in_advance', [(3, None, 4), (3, 0.1, 2), (3, 2.5, 3)])
+def test_records_read_in_advance_are_bounded(depth, max_memory, read_in_advance):
+    produced = []
+    with Prefetcher(counted_records(produced), depth, max_memory) as records:
+        # queued records (at least one, even larger than max_memory) and the record held by the thread
+        assert wait_for_producer(produced) == read_in_advance
+        record_id, _ = next(records)
+        assert record_id == '0'
+        assert wait_for_producer(produced) == read_in_advance + 1
+
+
+def test_close_stops_thread_mid_stream():
+    produced = []
+    records = Prefetcher(counted_records(produced), depth=2)
+    next(records)
+    records.close()
+    records.thread.join(timeout=2)
+    assert not records.thread.is_alive()
+    assert len(records.items) == 0 and records.queued_bytes == 0
+
+
+def test_thread_stopped_when_leaving_with_block_on_error():
+    produced = []
+    with pytest.raises(RuntimeError):
+        with prefetch(counted_records(produced), depth=2) as records:
+            next(records)
+            raise RuntimeError('detector failed')
+    records.thread.join(timeout=2)
+    assert not records.thread.is_alive()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import algo_helper
+from algo_helper import get_detection_frequency, run_algo, run_algo_multichannel
+from resampling_helper import frames_to_original, get_resampling_ratio, resample_signals
+
+
+def test_resampling_ratio_is_irreducible():
+    assert get_resampling_ratio(360, 250) == (25, 36)
+    assert get_resampling_ratio(128, 256) == (2, 1)
+
+
+@pytest.mark.parametrize('freq_sampling, target_frequency, expected', [
+    (128, None, 250), (250, None, 250), (360, None, 360), (500, None, 360), (128, 360, 360), (360, 128, 250)])
+def test_matched_filter_runs_at_its_nearest_frequency(freq_sampling, target_frequency, expected):
+    assert get_detection_frequency('Matched-filter-ecg-detector', freq_sampling, target_frequency) == expected
+
+
+@pytest.mark.parametrize('freq_sampling, target_frequency, expected', [(128, None, 128), (360, 128, 128)])
+def test_other_detectors_run_at_any_frequency(freq_sampling, target_frequency, expected):
+    assert get_detection_frequency('Hamilton-ecg-detector', freq_sampling, target_frequency) == expected
+
+
+def test_frames_mapped_to_nearest_original_samples():
+    assert frames_to_original([0, 250, 251, 500], 250, 360, 1000) == [0, 360, 361, 720]
+
+
+def test_frames_clipped_and_deduplicated_at_last_sample():
+    # frames 999 and 1000 at 250 Hz map to 511 and 512 at 128 Hz, beyond the 500 samples of the record
+    assert frames_to_original([10, 999, 1000], 250, 128, 500) == [5, 499]
+    # close frames at 360 Hz map to the same sample at 128 Hz, given once and sorted
+    assert frames_to_original([101, 100, 102], 360, 128, 1000) == [36]
+    assert frames_to_original([], 360, 128, 1000) == []
+
+
+def gaussian_beats(length, frames, width):
+    time = np.arange(length)[:, None]
+    return np.exp(-(time - np.asarray(frames)[None, :]) ** 2 / (2 * width ** 2)).sum(axis=1)
+
+
+def test_resampling_keeps_times_of_beats():
+    beats = [200, 555, 900]
+    resampled = resample_signals(gaussian_beats(1100, beats, 4), 360, 250)
+    assert len(resampled) == int(np.ceil(1100 * 250 / 360))
+    peaks = [int(np.argmax(resampled[round(beat * 250 / 360) - 10:round(beat * 250 / 360) + 10]))
+             + round(beat * 250 / 360) - 10 for beat in beats]
+    assert np.abs(np.array(peaks) * 360 / 250 - beats).max() <= 1.5
+    sigs = np.column_stack([gaussian_beats(1100, beats, 4), np.zeros(1100)])
+    assert resample_signals(sigs, 360, 360) is sigs
+    np.testing.assert_allclose(resample_signals(sigs, 360, 250)[:, 0], resampled)
+
+
+def test_detections_of_resampled_signals_mapped_back(spike_detector, monkeypatch):
+    monkeypatch.setitem(algo_helper.algorithms_frequencies, spike_detector, [250])
+    beats = [100, 460, 821, 1195]
+    sig = gaussian_beats(1200, beats, 4)
+    detections = run_algo(spike_detector, sig, 360)
+    assert np.abs(np.array(detections) - beats).max() <= 1
+    assert run_algo_multichannel(spike_detector, np.column_stack([sig, sig]), 360) == [detections, detections]
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from storage_helper import read_annotations, read_detections, read_frames_store, write_annotations, \
+    write_detections, write_frames_store
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    # localisations are saved in output/ of the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def to_lists(frames_dict):
+    return {record_id: to_lists(frames) if isinstance(frames, dict) else np.asarray(frames).tolist()
+            for record_id, frames in frames_dict.items()}
+
+
+def test_detections_round_trip_with_empty_channels():
+    detections = {'100': {'MLII': [10, 370, 730], 'V5': []}, '101': {'MLII': [], 'V1': [5]}, 102: {'MLII': [1]}}
+    write_detections('mit-bih-arrhythmia', 'Hamilton-ecg-detector', detections)
+    frames_dict = read_detections('mit-bih-arrhythmia', 'Hamilton-ecg-detector')
+    assert to_lists(frames_dict) == {'100': {'MLII': [10, 370, 730], 'V5': []}, '101': {'MLII': [], 'V1': [5]},
+                                     '102': {'MLII': [1]}}
+    # localisations are read from the memory mapped file, in int32 as they fit in it
+    assert isinstance(frames_dict['100']['MLII'], np.memmap) and frames_dict['100']['MLII'].dtype == np.int32
+
+
+def test_annotations_round_trip():
+    write_annotations('european-stt', {'e0103': [100, 200], 'e0104': []})
+    assert to_lists(read_annotations('european-stt')) == {'e0103': [100, 200], 'e0104': []}
+
+
+def test_empty_store():
+    write_frames_store('store', {})
+    assert read_frames_store('store') == {}
+
+
+@pytest.mark.parametrize('frames', [[0, 2 ** 31 - 1], [0, 2 ** 31], [2 ** 40], [-2 ** 31 - 1, 5]])
+def test_values_out_of_int32_are_kept(frames):
+    write_frames_store('store', {'100': frames})
+    assert read_frames_store('store')['100'].tolist() == frames
+
+
+@pytest.mark.parametrize('newest_format', ['npy', 'json'])
+def test_newest_of_json_and_npy_files_is_read(newest_format):
+    formats = ['json', 'npy'] if newest_format == 'npy' else ['npy', 'json']
+    for age, storage_format in zip([100, 0], formats):
+        write_annotations('european-stt', {'e0103': [100 if storage_format == 'npy' else 200]}, storage_format)
+        write_detections('european-stt', 'xqrs-wfdb', {'e0103': {'V4': [100 if storage_format == 'npy' else 200]}},
+                         storage_format)
+        for path in [f'output/annotations/european-stt.{storage_format}',
+                     f'output/frames/xqrs-wfdb_european-stt.{storage_format}']:
+            os.utime(path, (os.path.getmtime(path) - age, os.path.getmtime(path) - age))
+    expected = 100 if newest_format == 'npy' else 200
+    assert to_lists(read_annotations('european-stt')) == {'e0103': [expected]}
+    assert to_lists(read_detections('european-stt', 'xqrs-wfdb')) == {'e0103': {'V4': [expected]}}
+
+
+def test_json_is_read_without_binary_file():
+    write_annotations('european-stt', {'e0103': [100]}, 'json')
+    assert read_annotations('european-stt') == {'e0103': [100]}